@@ -0,0 +1,280 @@
+import random
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from inventory_aggregates import remove_units
+
+RETRYABLE_ERRORS = (errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT)
+MAX_RETRIES = 3
+LOCK_BATCH = 8
+
+
+class AllocationError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class InsufficientStockError(AllocationError):
+    """
+    `contended` is set when enough stock exists but part of it is locked
+    by concurrent fulfills, so the caller may retry.
+    """
+
+    def __init__(self, needed, available, contended=False):
+        super().__init__("Insufficient blood stock")
+        self.needed = needed
+        self.available = available
+        self.contended = contended
+
+
+# Process-wide counters, exported on /metrics. lock_conflicts counts
+# deadlocks and lock wait timeouts; stock_contention counts retries because
+# enough stock existed but was locked by other fulfills.
+_totals_lock = threading.Lock()
+_totals = {
+    "transactions": 0, "retries": 0, "lock_conflicts": 0,
+    "stock_contention": 0, "failed": 0
+}
+
+
+def allocation_stats():
+    with _totals_lock:
+        return dict(_totals)
+
+
+def _record(**counts):
+    with _totals_lock:
+        for name, value in counts.items():
+            _totals[name] += value
+
+
+# ---------------- FEFO ALLOCATION ----------------
+def allocate_fefo(cursor, blood_group, units_needed):
+    """
+    Split `units_needed` across usable lots, earliest expiry first, and
+    deduct them in one UPDATE. Lots are locked a few at a time with
+    SKIP LOCKED, so concurrent fulfills take the next lots instead of
+    queueing behind each other. Runs inside the caller's transaction.
+    """
+    allocation = []
+    remaining = units_needed
+    after = None
+
+    while remaining > 0:
+        keyset = ""
+        params = [blood_group]
+        if after is not None:
+            keyset = "AND (expiry_date > %s OR (expiry_date = %s AND inventory_id > %s))"
+            params += [after[0], after[0], after[1]]
+
+        cursor.execute(f"""
+            SELECT inventory_id, blood_bank_id, units_available, expiry_date
+            FROM blood_inventory
+            WHERE blood_group = %s
+              AND status = 'available'
+              AND expiry_date >= CURDATE()
+              AND units_available > 0
+              {keyset}
+            ORDER BY expiry_date ASC, inventory_id ASC
+            LIMIT {LOCK_BATCH}
+            FOR UPDATE SKIP LOCKED
+        """, params)
+        lots = cursor.fetchall()
+
+        for lot in lots:
+            take = min(remaining, lot["units_available"])
+            allocation.append({
+                "inventory_id": lot["inventory_id"],
+                "blood_bank_id": lot["blood_bank_id"],
+                "blood_group": blood_group,
+                "units": take,
+                "expiry_date": lot["expiry_date"]
+            })
+            remaining -= take
+            if remaining == 0:
+                break
+
+        if len(lots) < LOCK_BATCH:
+            break
+        after = (lots[-1]["expiry_date"], lots[-1]["inventory_id"])
+
+    if remaining > 0:
+        # Tell real shortage apart from stock that other workers hold locked
+        cursor.execute("""
+            SELECT COALESCE(SUM(units_available), 0) AS total_units
+            FROM blood_inventory
+            WHERE blood_group = %s
+              AND status = 'available'
+              AND expiry_date >= CURDATE()
+        """, (blood_group,))
+        available = int(cursor.fetchone()["total_units"])
+        raise InsufficientStockError(
+            units_needed, available, contended=available >= units_needed
+        )
+
+    deduct_lots(cursor, allocation)
+    return allocation
+
+
+def deduct_lots(cursor, allocation):
+    """Deduct allocated units from their lots and from the aggregates."""
+    if not allocation:
+        return
+    cases = " ".join("WHEN %s THEN %s" for _ in allocation)
+    placeholders = ", ".join("%s" for _ in allocation)
+    params = []
+    for lot in allocation:
+        params += [lot["inventory_id"], lot["units"]]
+    params += [lot["inventory_id"] for lot in allocation]
+
+    cursor.execute(f"""
+        UPDATE blood_inventory
+        SET units_available = units_available - CASE inventory_id {cases} END
+        WHERE inventory_id IN ({placeholders})
+    """, params)
+
+    remove_units(cursor, allocation, include_total=True)
+
+
+def record_lines(cursor, fulfilled_at, lines):
+    """
+    Log the lots fulfilled requests drew from (fulfillment_lines), so
+    units_out can be rolled up per blood bank. `lines` carry request_id,
+    inventory_id, blood_bank_id, blood_group and units.
+    """
+    if not lines:
+        return
+    cursor.executemany("""
+        INSERT INTO fulfillment_lines
+        (request_id, inventory_id, blood_bank_id, blood_group, units, fulfilled_at)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, [
+        (line["request_id"], line["inventory_id"], line["blood_bank_id"],
+         line["blood_group"], line["units"], fulfilled_at)
+        for line in lines
+    ])
+
+
+# ---------------- BATCH ALLOCATION ----------------
+def plan_batch(requests, lots):
+    """
+    Allocate `lots` (already in FEFO order) to `requests` in memory,
+    emergencies first, then oldest first. A request is either covered in
+    full or skipped, so a large one cannot starve smaller ones behind it.
+    Returns (outcomes, deductions) where deductions feed deduct_lots().
+    """
+    pools = {}
+    totals = {}
+    for lot in lots:
+        pools.setdefault(lot["blood_group"], deque()).append(
+            [lot["inventory_id"], lot["units_available"], lot["blood_bank_id"]]
+        )
+        totals[lot["blood_group"]] = (
+            totals.get(lot["blood_group"], 0) + lot["units_available"]
+        )
+
+    ordered = sorted(
+        requests,
+        key=lambda r: (r["urgency"] != "emergency", r["request_date"], r["request_id"])
+    )
+
+    outcomes = []
+    used = {}
+    banks = {}
+    for req in ordered:
+        group = req["blood_group"]
+        needed = req["quantity_units"]
+
+        if totals.get(group, 0) < needed:
+            outcomes.append({
+                "request_id": req["request_id"],
+                "status": "insufficient_stock",
+                "blood_group": group,
+                "units_requested": needed
+            })
+            continue
+
+        pool = pools[group]
+        lots_used = []
+        remaining = needed
+        while remaining > 0:
+            lot = pool[0]
+            take = min(remaining, lot[1])
+            lot[1] -= take
+            remaining -= take
+            used[lot[0]] = used.get(lot[0], 0) + take
+            banks[lot[0]] = (lot[2], group)
+            lots_used.append({
+                "inventory_id": lot[0],
+                "blood_bank_id": lot[2],
+                "units": take
+            })
+            if lot[1] == 0:
+                pool.popleft()
+        totals[group] -= needed
+
+        outcomes.append({
+            "request_id": req["request_id"],
+            "status": "fulfilled",
+            "blood_group": group,
+            "units_requested": needed,
+            "allocation": lots_used
+        })
+
+    deductions = [
+        {
+            "inventory_id": inventory_id,
+            "blood_bank_id": banks[inventory_id][0],
+            "blood_group": banks[inventory_id][1],
+            "units": units
+        }
+        for inventory_id, units in used.items()
+    ]
+    return outcomes, deductions
+
+
+# ---------------- TRANSACTIONS ----------------
+def run_with_retries(conn, work, max_retries=MAX_RETRIES):
+    """
+    Run work(cursor) and commit, retrying on deadlocks, lock wait
+    timeouts and contended stock. Returns (result, stats).
+    """
+    stats = {"attempts": 0, "retries": 0, "lock_conflicts": 0, "stock_contention": 0}
+
+    while True:
+        stats["attempts"] += 1
+        cursor = conn.cursor(dictionary=True)
+        try:
+            result = work(cursor)
+            conn.commit()
+            _record(transactions=1)
+            return result, stats
+        except mysql.connector.Error as e:
+            conn.rollback()
+            if e.errno not in RETRYABLE_ERRORS or stats["retries"] >= max_retries:
+                _record(failed=1)
+                raise
+            reason = "lock_conflicts"
+        except InsufficientStockError as e:
+            conn.rollback()
+            if not e.contended or stats["retries"] >= max_retries:
+                _record(failed=1)
+                raise
+            reason = "stock_contention"
+        except Exception:
+            conn.rollback()
+            _record(failed=1)
+            raise
+        finally:
+            cursor.close()
+
+        stats["retries"] += 1
+        stats[reason] += 1
+        _record(retries=1, **{reason: 1})
+        time.sleep(random.uniform(0, 0.02 * 2 ** stats["retries"]))
@@ -1,14 +1,55 @@
 
 
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-import bcrypt
 import jwt
 import datetime
 import os
-from db import get_db_connection
+import config
+from db import get_db_connection, init_app, pool_stats, PoolTimeoutError
+import metrics
+import query_log
+from metrics import request_metrics
+from query_log import slow_query_log, trace_store
 from functools import wraps
+from cache import response_cache
+from idempotency import idempotency_store, idempotent
+from passwords import HasherBusyError, password_hasher
+from rewards import badge_for, donation_points
+from tokens import AuthError, authenticate, token_cache, token_denylist
+from scheduler import scheduler
+import jobs  # noqa: F401  registers scheduled jobs
+from dashboard import build_snapshot
+from donation_ingest import MAX_BATCH_ROWS, ingest_donations, parse_batch
+from donor_index import DONOR_COLUMNS, donor_index
+from donor_scores import ScoreQueryError, parse_rank_query
+from geo_index import GeoQueryError, geo_center, location_from, parse_geo_query
+from eligibility import (
+    ELIGIBILITY_DAYS, ELIGIBLE_NOW, ensure_eligibility_refreshed, refresh_eligibility
+)
+from inventory_aggregates import (
+    add_units, ensure_expired, read_bank_inventory, read_summary, reconcile
+)
+from match_stream import match_hub, stream_matches
+from stock_alerts import (
+    ThresholdError, active_alerts, evaluate as evaluate_alerts, parse_threshold,
+    set_threshold
+)
+from streaming import UnsupportedFormatError, stream_query
+from pagination import InvalidCursorError, page_response
+from rollups import (
+    RollupQueryError, donation_event, fulfilled_event, parse_range_query, query_series,
+    record as record_rollups, request_event, units_out_event
+)
+from queries import (
+    BANK_LOCATION_SQL, MATCH_REQUEST_SQL, blood_banks_page, blood_requests_page,
+    donations_page
+)
+from allocation import (
+    AllocationError, allocate_fefo, allocation_stats, deduct_lots, plan_batch,
+    record_lines, run_with_retries
+)
 
 # ---------------- APP SETUP ----------------
 app = Flask(__name__)
@@ -16,30 +57,65 @@ app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret-key")
 
 
 
-CORS(app)
+CORS(app, expose_headers=["X-Next-Cursor", "Idempotent-Replayed"])
+init_app(app)
+metrics.init_app(app)
+query_log.init_app(app)
+
+
+@app.errorhandler(InvalidCursorError)
+def handle_invalid_cursor(e):
+    return jsonify({"error": str(e)}), 400
+
+
+@app.errorhandler(GeoQueryError)
+def handle_geo_query(e):
+    return jsonify({"error": str(e)}), 400
+
+
+@app.errorhandler(ScoreQueryError)
+def handle_score_query(e):
+    return jsonify({"error": str(e)}), 400
+
+
+@app.errorhandler(RollupQueryError)
+def handle_rollup_query(e):
+    return jsonify({"error": str(e)}), 400
+
+
+@app.errorhandler(ThresholdError)
+def handle_threshold(e):
+    return jsonify({"error": str(e)}), 400
+
+
+@app.errorhandler(UnsupportedFormatError)
+def handle_unsupported_format(e):
+    return jsonify({"error": str(e)}), 400
+
+
+@app.errorhandler(HasherBusyError)
+def handle_hasher_busy(e):
+    return jsonify({"error": "Server busy, please retry"}), 503, {"Retry-After": "1"}
+
+
+@app.errorhandler(PoolTimeoutError)
+def handle_pool_timeout(e):
+    return jsonify({"error": "Database busy, please retry"}), 503, {"Retry-After": "1"}
 
 # ---------------- JWT AUTH DECORATOR ----------------
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        auth_header = request.headers.get("Authorization")
-
-        if not auth_header or not auth_header.startswith("Bearer "):
-            return jsonify({"error": "Authorization header missing or invalid"}), 401
-
-        token = auth_header.split(" ")[1]
-
         try:
-            data = jwt.decode(
-                token,
-                app.config["SECRET_KEY"],
-                algorithms=["HS256"]
+            data, digest = authenticate(
+                request.headers.get("Authorization"),
+                app.config["SECRET_KEY"]
             )
-            request.user = data
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token expired"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token"}), 401
+        except AuthError as e:
+            return jsonify({"error": e.message}), 401
+
+        request.user = data
+        request.token_digest = digest
 
         return f(*args, **kwargs)
     return decorated
@@ -74,13 +150,12 @@ def home():
 @app.route("/test-db")
 def test_db():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users")
-        users = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(users)
+        return stream_query(
+            "SELECT * FROM users",
+            fmt=request.args.get("format", "json")
+        )
+    except (UnsupportedFormatError, PoolTimeoutError):
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -95,10 +170,8 @@ def create_user():
         if field not in data:
             return jsonify({"error": f"{field} is required"}), 400
 
-    hashed_password = bcrypt.hashpw(
-        data["password"].encode("utf-8"),
-        bcrypt.gensalt()
-    )
+    latitude, longitude = location_from(data)
+    hashed_password = password_hasher.hash(data["password"])
 
     try:
         conn = get_db_connection()
@@ -106,16 +179,19 @@ def create_user():
 
         cursor.execute(
             """
-            INSERT INTO users (full_name, email, password_hash, role, phone, city)
-            VALUES (%s, %s, %s, %s, %s, %s)
+            INSERT INTO users
+            (full_name, email, password_hash, role, phone, city, latitude, longitude)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             """,
             (
                 data["full_name"],
                 data["email"],
-                hashed_password.decode("utf-8"),
+                hashed_password,
                 data["role"],
                 data.get("phone"),
-                data.get("city")
+                data.get("city"),
+                latitude,
+                longitude
             )
         )
 
@@ -125,6 +201,8 @@ def create_user():
 
         return jsonify({"message": "User created successfully"}), 201
 
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -152,12 +230,13 @@ def login():
         if not user:
             return jsonify({"error": "Invalid email or password"}), 401
 
-        if not bcrypt.checkpw(
-            data["password"].encode("utf-8"),
-            user["password_hash"].encode("utf-8")
-        ):
+        if not password_hasher.verify(data["password"], user["password_hash"]):
             return jsonify({"error": "Invalid email or password"}), 401
 
+        # Cost factor changed since this hash was made
+        if password_hasher.needs_rehash(user["password_hash"]):
+            password_hasher.rehash_in_background(user["user_id"], data["password"])
+
         token = jwt.encode(
             {
                 "user_id": user["user_id"],
@@ -174,13 +253,27 @@ def login():
             "token": token
         }), 200
 
+    except HasherBusyError:
+        raise
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+# ---------------- LOGOUT ----------------
+@app.route("/logout", methods=["POST"])
+@token_required
+def logout():
+    token_denylist.revoke(request.token_digest, request.user["exp"])
+    token_cache.discard(request.token_digest)
+    return jsonify({"message": "Logged out"}), 200
+
+
 # ---------------- GET CURRENT USER ----------------
 @app.route("/me", methods=["GET"])
 @token_required
+@response_cache.cached("users", ttl=300, per_user=True)
 def get_my_profile():
     user_id = request.user["user_id"]
 
@@ -189,7 +282,8 @@ def get_my_profile():
         cursor = conn.cursor(dictionary=True)
 
         cursor.execute("""
-            SELECT user_id, full_name, email, role, phone, city, created_at
+            SELECT user_id, full_name, email, role, phone, city,
+                   latitude, longitude, created_at
             FROM users
             WHERE user_id = %s
         """, (user_id,))
@@ -203,6 +297,52 @@ def get_my_profile():
 
         return jsonify(user), 200
 
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ---------------- UPDATE LOCATION ----------------
+@app.route("/me/location", methods=["PUT"])
+@token_required
+def update_my_location():
+    data = request.json or {}
+    # Both null clears the location: the user is matched by city again
+    latitude, longitude = location_from(data)
+    user_id = request.user["user_id"]
+
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        cursor.execute("""
+            UPDATE users
+            SET latitude = %s, longitude = %s
+            WHERE user_id = %s
+        """, (latitude, longitude, user_id))
+
+        cursor.execute(f"""
+            SELECT {DONOR_COLUMNS}
+            FROM donors d
+            JOIN users u ON d.user_id = u.user_id
+            WHERE d.user_id = %s AND {ELIGIBLE_NOW}
+        """, (user_id,))
+        donor = cursor.fetchone()
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        response_cache.invalidate("users")
+        if donor:
+            # Moves the donor in the spatial index
+            donor_index.add(donor)
+
+        return jsonify({"message": "Location updated"}), 200
+
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -211,8 +351,121 @@ def get_my_profile():
 @app.route("/admin/dashboard")
 @token_required
 @role_required("admin")
+@response_cache.cached("dashboard", ttl=config.DASHBOARD_TTL)
 def admin_dashboard():
-    return jsonify({"message": "Welcome Admin"})
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        snapshot = build_snapshot(cursor)
+
+        cursor.close()
+        conn.close()
+
+        return jsonify(snapshot), 200
+
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ---------------- DB POOL STATS ----------------
+@app.route("/admin/db-pool", methods=["GET"])
+@token_required
+@role_required("admin")
+def db_pool_stats():
+    return jsonify(pool_stats()), 200
+
+
+# ---------------- CACHE STATS ----------------
+@app.route("/admin/cache-stats", methods=["GET"])
+@token_required
+@role_required("admin")
+def cache_stats():
+    return jsonify(response_cache.stats()), 200
+
+
+# ---------------- PASSWORD HASHER STATS ----------------
+@app.route("/admin/hasher-stats", methods=["GET"])
+@token_required
+@role_required("admin")
+def hasher_stats():
+    return jsonify(password_hasher.stats()), 200
+
+
+# ---------------- TOKEN CACHE STATS ----------------
+@app.route("/admin/token-cache", methods=["GET"])
+@token_required
+@role_required("admin")
+def token_cache_stats():
+    return jsonify(token_cache.stats()), 200
+
+
+# ---------------- IDEMPOTENCY STATS ----------------
+@app.route("/admin/idempotency", methods=["GET"])
+@token_required
+@role_required("admin")
+def idempotency_stats():
+    return jsonify(idempotency_store.stats()), 200
+
+
+# ---------------- SCHEDULER STATUS ----------------
+@app.route("/admin/scheduler", methods=["GET"])
+@token_required
+@role_required("admin")
+def scheduler_status():
+    return jsonify(scheduler.status()), 200
+
+
+# ---------------- METRICS ----------------
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    # Scraped by Prometheus, not users; optionally guarded by a static token
+    if config.METRICS_TOKEN and (
+        request.headers.get("Authorization") != f"Bearer {config.METRICS_TOKEN}"
+    ):
+        return jsonify({"error": "Invalid metrics token"}), 401
+
+    pool = pool_stats()
+    allocation = allocation_stats()
+    body = request_metrics.render({
+        "bloodlink_db_pool_in_use": ("Pooled connections checked out", pool["in_use"]),
+        "bloodlink_db_pool_idle": ("Pooled connections idle", pool["idle"]),
+        "bloodlink_db_pool_waiting": ("Requests waiting for a connection", pool["waiting"]),
+        "bloodlink_db_pool_timeouts": ("Pool checkouts that timed out", pool["timeouts"]),
+    }, {
+        "bloodlink_allocation_transactions_total":
+            ("Fulfillment transactions committed", allocation["transactions"]),
+        "bloodlink_allocation_retries_total":
+            ("Fulfillment transactions retried", allocation["retries"]),
+        "bloodlink_allocation_lock_conflicts_total":
+            ("Retries after a deadlock or lock wait timeout", allocation["lock_conflicts"]),
+        "bloodlink_allocation_stock_contention_total":
+            ("Retries because free stock was locked by other fulfills",
+             allocation["stock_contention"]),
+        "bloodlink_allocation_failed_total":
+            ("Fulfillment transactions given up", allocation["failed"]),
+    })
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
+# ---------------- QUERY PROFILING ----------------
+@app.route("/admin/slow-queries", methods=["GET"])
+@token_required
+@role_required("admin")
+def slow_queries():
+    return jsonify(slow_query_log.stats()), 200
+
+
+@app.route("/admin/query-traces/<trace_id>", methods=["GET"])
+@token_required
+@role_required("admin")
+def query_trace(trace_id):
+    trace = trace_store.get(trace_id)
+    if trace is None:
+        return jsonify({"error": "Trace not found or expired"}), 404
+    return jsonify(trace), 200
 
 
 # ---------------- DONOR DASHBOARD ----------------
@@ -235,21 +488,26 @@ def create_blood_bank():
         if field not in data:
             return jsonify({"error": f"{field} is required"}), 400
 
+    latitude, longitude = location_from(data)
+
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
 
         cursor.execute(
             """
-            INSERT INTO blood_banks (name, city, address, contact_number, admin_user_id)
-            VALUES (%s, %s, %s, %s, %s)
+            INSERT INTO blood_banks
+            (name, city, address, contact_number, admin_user_id, latitude, longitude)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
             """,
             (
                 data["name"],
                 data["city"],
                 data["address"],
                 data["contact_number"],
-                request.user["user_id"]
+                request.user["user_id"],
+                latitude,
+                longitude
             )
         )
 
@@ -257,8 +515,12 @@ def create_blood_bank():
         cursor.close()
         conn.close()
 
+        response_cache.invalidate("blood_banks")
+
         return jsonify({"message": "Blood bank created successfully"}), 201
 
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -266,28 +528,30 @@ def create_blood_bank():
 @app.route("/admin/blood-banks", methods=["GET"])
 @token_required
 @role_required("admin")
+@response_cache.cached("blood_banks", ttl=300)
 def get_blood_banks():
+    page = blood_banks_page()
+
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
-        cursor.execute("""
-            SELECT bb.*, u.full_name AS admin_name
-            FROM blood_banks bb
-            JOIN users u ON bb.admin_user_id = u.user_id
-        """)
+        cursor.execute(page.sql, page.params)
 
         banks = cursor.fetchall()
         cursor.close()
         conn.close()
 
-        return jsonify(banks), 200
+        return page_response(banks, page), 200
 
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route("/blood-banks", methods=["GET"])
 @token_required
+@response_cache.cached("blood_banks", ttl=300)
 def list_blood_banks():
     try:
         conn = get_db_connection()
@@ -303,6 +567,8 @@ def list_blood_banks():
         conn.close()
 
         return jsonify(banks), 200
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -328,28 +594,26 @@ def delete_blood_bank(bank_id):
         cursor.close()
         conn.close()
 
+        response_cache.invalidate("blood_banks", "inventory")
+
         return jsonify({"message": "Blood bank deleted"}), 200
 
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 #-----------------bllood inventory------------
 @app.route("/inventory/<int:blood_bank_id>", methods=["GET"])
+@response_cache.cached("inventory", ttl=30)
 def get_inventory(blood_bank_id):
     try:
+        ensure_expired()
+
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
-        cursor.execute("""
-            SELECT blood_group, SUM(units_available) AS total_units
-            FROM blood_inventory
-            WHERE blood_bank_id = %s
-              AND status = 'available'
-              AND expiry_date >= CURDATE()
-            GROUP BY blood_group
-        """, (blood_bank_id,))
-
-        inventory = cursor.fetchall()
+        inventory = read_bank_inventory(cursor, blood_bank_id)
 
         cursor.close()
         conn.close()
@@ -359,6 +623,8 @@ def get_inventory(blood_bank_id):
             "inventory": inventory
         }), 200
 
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -392,13 +658,28 @@ def register_donor():
             INSERT INTO donors (user_id, blood_group, eligible)
             VALUES (%s, %s, 1)
         """, (user_id, blood_group))
+        donor_id = cursor.lastrowid
+
+        cursor.execute(
+            "SELECT full_name, phone, city, latitude, longitude FROM users WHERE user_id = %s",
+            (user_id,)
+        )
+        user = cursor.fetchone()
 
         conn.commit()
         cursor.close()
         conn.close()
 
+        donor_index.add({
+            "donor_id": donor_id,
+            "blood_group": blood_group,
+            **user
+        })
+
         return jsonify({"message": "Donor registered successfully"}), 201
 
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -412,10 +693,12 @@ def get_my_donor_profile():
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT donor_id, user_id, blood_group,
-                   last_donation_date, eligible
-            FROM donors
+                   last_donation_date, eligible_from,
+                   total_donations, points,
+                   {ELIGIBLE_NOW} AS eligible
+            FROM donors d
             WHERE user_id = %s
         """, (user_id,))
 
@@ -431,6 +714,8 @@ def get_my_donor_profile():
 
         return jsonify(donor), 200
 
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -438,6 +723,7 @@ def get_my_donor_profile():
 
 @app.route("/donations", methods=["POST"])
 @token_required
+@idempotent
 def donate_blood():
     user_id = request.user["user_id"]
     data = request.json
@@ -449,14 +735,15 @@ def donate_blood():
     if not blood_bank_id or not quantity_units:
         return jsonify({"error": "blood_bank_id and quantity_units required"}), 400
 
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
         # 1️⃣ Get donor
-        cursor.execute("""
-            SELECT donor_id, blood_group, eligible, total_donations
-            FROM donors
+        cursor.execute(f"""
+            SELECT donor_id, blood_group, total_donations,
+                   {ELIGIBLE_NOW} AS eligible
+            FROM donors d
             WHERE user_id = %s
         """, (user_id,))
         donor = cursor.fetchone()
@@ -485,11 +772,10 @@ def donate_blood():
             VALUES (%s, %s, %s, CURDATE(),
                     DATE_ADD(CURDATE(), INTERVAL 42 DAY), 'available')
         """, (blood_bank_id, blood_group, quantity_units))
+        add_units(cursor, blood_bank_id, blood_group, quantity_units)
 
         # 4️⃣ Reward calculation
-        points = 100
-        if emergency:
-            points += 100
+        points = donation_points(emergency)
 
         total_donations = donor["total_donations"] + 1
 
@@ -497,20 +783,16 @@ def donate_blood():
         cursor.execute("""
             UPDATE donors
             SET last_donation_date = CURDATE(),
+                eligible_from = DATE_ADD(CURDATE(), INTERVAL %s DAY),
                 eligible = 0,
                 points = points + %s,
-                total_donations = total_donations + 1
+                total_donations = total_donations + 1,
+                emergency_donations = emergency_donations + %s
             WHERE donor_id = %s
-        """, (points, donor_id))
+        """, (ELIGIBILITY_DAYS, points, int(bool(emergency)), donor_id))
 
         # 6️⃣ Badge logic
-        badge = None
-        if total_donations == 1:
-            badge = "First Drop"
-        elif total_donations == 3:
-            badge = "Lifesaver"
-        elif total_donations == 10:
-            badge = "Elite Donor"
+        badge = badge_for(total_donations)
 
         if badge:
             cursor.execute("""
@@ -518,10 +800,18 @@ def donate_blood():
                 VALUES (%s, %s)
             """, (donor_id, badge))
 
+        # 7️⃣ Rollups last, so their shared rows are locked only until commit
+        record_rollups(cursor, [donation_event(
+            datetime.datetime.now(), blood_bank_id, blood_group, int(quantity_units)
+        )])
+
         conn.commit()
         cursor.close()
         conn.close()
 
+        donor_index.remove(donor_id)
+        response_cache.invalidate("inventory")
+
         return jsonify({
             "message": "Donation successful",
             "points_awarded": points,
@@ -532,27 +822,82 @@ def donate_blood():
         conn.rollback()
         return jsonify({"error": str(e)}), 500
 
+#----------------bulk donation ingestion (blood drives)-------------
+@app.route("/donations/bulk", methods=["POST"])
+@token_required
+@role_required("admin")
+def ingest_donation_batch():
+    try:
+        raw_rows = parse_batch(
+            request.content_type,
+            request.get_data(as_text=True),
+            request.get_json(silent=True)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if len(raw_rows) > MAX_BATCH_ROWS:
+        return jsonify({"error": f"At most {MAX_BATCH_ROWS} donations per batch"}), 400
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+
+        accepted, errors = ingest_donations(cursor, raw_rows)
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        for row in accepted:
+            if row["eligible"]:
+                # Back-dated past the waiting period: refresh the score
+                donor_index.add(row["donor"])
+            else:
+                donor_index.remove(row["donor_id"])
+        if accepted:
+            response_cache.invalidate("inventory")
+
+        return jsonify({
+            "message": "Batch processed",
+            "received": len(raw_rows),
+            "recorded": len(accepted),
+            "failed": len(errors),
+            "errors": errors
+        }), 201 if accepted else 200
+
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 500
+
 #-------------create blood request=============
 @app.route("/blood-requests", methods=["POST"])
 @token_required
+@idempotent
 def create_blood_request():
     data = request.get_json()
     user_id = request.user["user_id"]
 
     conn = get_db_connection()
-    cursor = conn.cursor()
+    cursor = conn.cursor(dictionary=True)
 
+    # request_date is set here so the rollup lands in the same bucket
+    requested_at = datetime.datetime.now().replace(microsecond=0)
     cursor.execute("""
         INSERT INTO blood_requests
-        (user_id, blood_group, quantity_units, urgency, city)
-        VALUES (%s, %s, %s, %s, %s)
+        (user_id, blood_group, quantity_units, urgency, city, request_date)
+        VALUES (%s, %s, %s, %s, %s, %s)
     """, (
         user_id,
         data["blood_group"],
         data["quantity_units"],
         data.get("urgency", "normal"),
-        data.get("city")
+        data.get("city"),
+        requested_at
     ))
+    record_rollups(cursor, [request_event(
+        requested_at, data.get("city"), data["blood_group"], data.get("urgency", "normal")
+    )])
 
     conn.commit()
     cursor.close()
@@ -567,31 +912,23 @@ def create_blood_request():
 @role_required("admin", "hospital")
 
 def view_blood_requests():
+    page = blood_requests_page()
+
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
-        cursor.execute("""
-            SELECT 
-                request_id,
-                user_id,
-                blood_group,
-                quantity_units,
-                urgency,
-                city,
-                status,
-                request_date
-            FROM blood_requests
-            ORDER BY request_date DESC
-        """)
+        cursor.execute(page.sql, page.params)
 
         requests = cursor.fetchall()
 
         cursor.close()
         conn.close()
 
-        return jsonify(requests), 200
+        return page_response(requests, page), 200
 
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 #---------------------approve and reject blood request-------------
@@ -622,8 +959,12 @@ def update_blood_request_status(request_id):
         cursor.close()
         conn.close()
 
+        match_hub.request_changed(request_id, new_status)
+
         return jsonify({"message": f"Request {new_status}"}), 200
 
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -636,68 +977,168 @@ def update_blood_request_status(request_id):
 @token_required
 @role_required("admin")
 def fulfill_blood_request(request_id):
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        # 1. Get request
+    def fulfill(cursor):
+        # 1. Get request, locked so it cannot be fulfilled twice
         cursor.execute("""
-            SELECT blood_group, quantity_units, status
+            SELECT blood_group, quantity_units, status, city, request_date
             FROM blood_requests
             WHERE request_id = %s
+            FOR UPDATE
         """, (request_id,))
         request_data = cursor.fetchone()
 
         if not request_data:
-            return jsonify({"error": "Request not found"}), 404
+            raise AllocationError("Request not found", 404)
 
         if request_data["status"] != "approved":
-            return jsonify({"error": "Request must be approved first"}), 400
+            raise AllocationError("Request must be approved first")
 
-        blood_group = request_data["blood_group"]
-        needed_units = request_data["quantity_units"]
+        # 2. Allocate across lots (FEFO) and deduct units
+        lots = allocate_fefo(
+            cursor,
+            request_data["blood_group"],
+            request_data["quantity_units"]
+        )
 
-        # 2. Check inventory
+        # 3. Mark request fulfilled
+        fulfilled_at = datetime.datetime.now().replace(microsecond=0)
         cursor.execute("""
-            SELECT inventory_id, units_available
-            FROM blood_inventory
-            WHERE blood_group = %s
-              AND status = 'available'
-              AND expiry_date >= CURDATE()
-            ORDER BY expiry_date ASC
-            LIMIT 1
-        """, (blood_group,))
+            UPDATE blood_requests
+            SET status = 'fulfilled', fulfilled_at = %s
+            WHERE request_id = %s
+        """, (fulfilled_at, request_id))
+        lines = [dict(lot, request_id=request_id) for lot in lots]
+        record_lines(cursor, fulfilled_at, lines)
+        record_rollups(cursor, [fulfilled_event(fulfilled_at, request_data)] + [
+            units_out_event(fulfilled_at, line) for line in lines
+        ])
 
-        inventory = cursor.fetchone()
+        return lots
 
-        if not inventory or inventory["units_available"] < needed_units:
-            return jsonify({"error": "Insufficient blood stock"}), 400
+    try:
+        conn = get_db_connection()
+        lots, stats = run_with_retries(conn, fulfill)
+        conn.close()
 
-        # 3. Deduct units
-        cursor.execute("""
-            UPDATE blood_inventory
-            SET units_available = units_available - %s
-            WHERE inventory_id = %s
-        """, (needed_units, inventory["inventory_id"]))
+        match_hub.request_changed(request_id, "fulfilled")
+        response_cache.invalidate("inventory")
 
-        # 4. Mark request fulfilled
-        cursor.execute("""
-            UPDATE blood_requests
-            SET status = 'fulfilled'
-            WHERE request_id = %s
-        """, (request_id,))
+        return jsonify({
+            "message": "Blood request fulfilled successfully",
+            "request_id": request_id,
+            "allocation": lots,
+            "retries": stats["retries"],
+            "lock_conflicts": stats["lock_conflicts"]
+        }), 200
 
-        conn.commit()
-        cursor.close()
+    except AllocationError as e:
+        return jsonify({"error": e.message}), e.status_code
+
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+#------------------------bulk fulfill blood requests---------------
+@app.route("/blood-requests/fulfill-batch", methods=["POST"])
+@token_required
+@role_required("admin")
+def fulfill_blood_requests_batch():
+    data = request.get_json(silent=True) or {}
+    request_ids = data.get("request_ids")
+
+    # Omitting request_ids fulfills every approved request; an empty list
+    # is rejected rather than read as "all". bool is an int subclass.
+    if request_ids is not None and (
+        not isinstance(request_ids, list)
+        or not request_ids
+        or not all(isinstance(r, int) and not isinstance(r, bool) for r in request_ids)
+    ):
+        return jsonify({"error": "request_ids must be a non-empty list of integers"}), 400
+
+    def fulfill_all(cursor):
+        # 1. Approved requests; rows held by single fulfills are skipped
+        query = """
+            SELECT request_id, blood_group, quantity_units, urgency, city, request_date
+            FROM blood_requests
+            WHERE status = 'approved'
+        """
+        params = []
+        if request_ids is not None:
+            query += f" AND request_id IN ({', '.join(['%s'] * len(request_ids))})"
+            params = request_ids
+        cursor.execute(query + " FOR UPDATE SKIP LOCKED", params)
+        pending = cursor.fetchall()
+
+        if not pending:
+            return [], []
+
+        # 2. Usable lots for the groups involved, in FEFO order
+        groups = sorted({r["blood_group"] for r in pending})
+        cursor.execute(f"""
+            SELECT inventory_id, blood_bank_id, blood_group, units_available
+            FROM blood_inventory
+            WHERE blood_group IN ({', '.join(['%s'] * len(groups))})
+              AND status = 'available'
+              AND expiry_date >= CURDATE()
+              AND units_available > 0
+            ORDER BY expiry_date ASC, inventory_id ASC
+            FOR UPDATE SKIP LOCKED
+        """, groups)
+        lots = cursor.fetchall()
+
+        # 3. Allocate in memory, then apply in two statements
+        outcomes, deductions = plan_batch(pending, lots)
+        deduct_lots(cursor, deductions)
+
+        fulfilled = [o["request_id"] for o in outcomes if o["status"] == "fulfilled"]
+        if fulfilled:
+            fulfilled_at = datetime.datetime.now().replace(microsecond=0)
+            cursor.execute(f"""
+                UPDATE blood_requests
+                SET status = 'fulfilled', fulfilled_at = %s
+                WHERE request_id IN ({', '.join(['%s'] * len(fulfilled))})
+            """, [fulfilled_at] + fulfilled)
+            lines = [
+                dict(lot, request_id=o["request_id"], blood_group=o["blood_group"])
+                for o in outcomes if o["status"] == "fulfilled"
+                for lot in o["allocation"]
+            ]
+            record_lines(cursor, fulfilled_at, lines)
+            by_id = {r["request_id"]: r for r in pending}
+            record_rollups(cursor, [
+                fulfilled_event(fulfilled_at, by_id[request_id]) for request_id in fulfilled
+            ] + [units_out_event(fulfilled_at, line) for line in lines])
+
+        return outcomes, deductions
+
+    try:
+        conn = get_db_connection()
+        (outcomes, deductions), stats = run_with_retries(conn, fulfill_all)
         conn.close()
 
+        fulfilled = [o for o in outcomes if o["status"] == "fulfilled"]
+        for outcome in fulfilled:
+            match_hub.request_changed(outcome["request_id"], "fulfilled")
+        if fulfilled:
+            response_cache.invalidate("inventory")
+
         return jsonify({
-            "message": "Blood request fulfilled successfully",
-            "request_id": request_id
+            "results": outcomes,
+            "summary": {
+                "considered": len(outcomes),
+                "fulfilled": len(fulfilled),
+                "insufficient_stock": len(outcomes) - len(fulfilled),
+                "units_allocated": sum(d["units"] for d in deductions),
+                "lots_touched": len(deductions),
+                "retries": stats["retries"]
+            }
         }), 200
 
+    except PoolTimeoutError:
+        raise
     except Exception as e:
-        conn.rollback()
         return jsonify({"error": str(e)}), 500
 
 
@@ -706,16 +1147,17 @@ def fulfill_blood_request(request_id):
 @token_required
 @role_required("admin", "hospital")
 def match_donors(request_id):
+    # ?radius_km= / ?nearest= switch from city matching to distance;
+    # ?limit= / ?min_score= bound the ranked result
+    geo = parse_geo_query(request.args)
+    limit, min_score = parse_rank_query(request.args, geo.nearest)
+
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
         # Get request details
-        cursor.execute("""
-            SELECT blood_group, city, urgency
-            FROM blood_requests
-            WHERE request_id = %s
-        """, (request_id,))
+        cursor.execute(MATCH_REQUEST_SQL, (request_id,))
         request_data = cursor.fetchone()
 
         if not request_data:
@@ -724,28 +1166,80 @@ def match_donors(request_id):
         if request_data["urgency"] != "emergency":
             return jsonify({"message": "Matching only for emergency requests"}), 200
 
-        # Find matching donors
-        cursor.execute("""
-            SELECT d.donor_id, u.full_name, u.phone
-            FROM donors d
-            JOIN users u ON d.user_id = u.user_id
-            WHERE d.blood_group = %s
-              AND u.city = %s
-              AND d.eligible = 1
-        """, (request_data["blood_group"], request_data["city"]))
-
-        donors = cursor.fetchall()
+        bank = None
+        if geo.active and geo.blood_bank_id is not None:
+            cursor.execute(BANK_LOCATION_SQL, (geo.blood_bank_id,))
+            bank = cursor.fetchone()
 
         cursor.close()
         conn.close()
 
+        # Find compatible donors from the in-memory index
+        ensure_eligibility_refreshed()
+        donor_index.ensure_fresh()
+        if geo.active:
+            lat, lon = geo_center(geo, request_data, bank)
+            donors = donor_index.match_nearby(
+                lat, lon, request_data["blood_group"], geo.radius_km, geo.nearest,
+                limit, min_score
+            )
+        else:
+            donors = donor_index.top(
+                request_data["city"], request_data["blood_group"], limit, min_score
+            )
+
         return jsonify({
             "matched_donors": donors
         }), 200
 
+    except GeoQueryError:
+        raise
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/blood-requests/<int:request_id>/match-stream", methods=["GET"])
+@token_required
+@role_required("admin", "hospital")
+def match_donors_stream(request_id):
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        cursor.execute(MATCH_REQUEST_SQL, (request_id,))
+        request_data = cursor.fetchone()
+
+        cursor.close()
+        conn.close()
+
+        if not request_data:
+            return jsonify({"error": "Request not found"}), 404
+
+        if request_data["urgency"] != "emergency":
+            return jsonify({"message": "Matching only for emergency requests"}), 200
+
+        ensure_eligibility_refreshed()
+        donor_index.ensure_fresh()
+        channel = match_hub.subscribe(
+            request_id,
+            request_data["blood_group"],
+            request_data["city"],
+            request_data["status"]
+        )
+
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    return Response(
+        stream_with_context(stream_matches(match_hub, channel)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 # ---------------- DONATION HISTORY (DONOR) ----------------
 @app.route("/donations/me", methods=["GET"])
@@ -753,30 +1247,22 @@ def match_donors(request_id):
 @role_required("donor")
 def get_my_donations():
     user_id = request.user["user_id"]
+    page = donations_page(user_id)
 
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
-        cursor.execute("""
-            SELECT 
-                dh.donation_date,
-                dh.quantity_units,
-                bb.name AS blood_bank_name,
-                bb.city
-            FROM donation_history dh
-            JOIN donors d ON dh.donor_id = d.donor_id
-            JOIN blood_banks bb ON dh.blood_bank_id = bb.blood_bank_id
-            WHERE d.user_id = %s
-            ORDER BY dh.donation_date DESC
-        """, (user_id,))
+        cursor.execute(page.sql, page.params)
 
         history = cursor.fetchall()
         cursor.close()
         conn.close()
 
-        return jsonify(history), 200
+        return page_response(history, page), 200
 
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -785,23 +1271,18 @@ def get_my_donations():
 @token_required
 def my_blood_requests():
     user_id = request.user["user_id"]
+    page = blood_requests_page(user_id=user_id)
 
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
 
-    cursor.execute("""
-        SELECT request_id, blood_group, quantity_units,
-               urgency, city, status, request_date
-        FROM blood_requests
-        WHERE user_id = %s
-        ORDER BY request_date DESC
-    """, (user_id,))
+    cursor.execute(page.sql, page.params)
 
     requests = cursor.fetchall()
     cursor.close()
     conn.close()
 
-    return jsonify(requests), 200
+    return page_response(requests, page), 200
 
 
 #----------------inventory summary--------------
@@ -813,44 +1294,192 @@ def inventory_summary():
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
-        cursor.execute("""
-            SELECT blood_group, SUM(units_available) AS total_units
-            FROM blood_inventory
-            GROUP BY blood_group
-        """)
-
-        data = cursor.fetchall()
+        data = read_summary(cursor)
 
         cursor.close()
         conn.close()
 
         return jsonify(data), 200
 
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/admin/inventory/reconcile", methods=["POST"])
+@token_required
+@role_required("admin")
+def reconcile_inventory_aggregates():
+    repair = request.args.get("dry_run") != "1"
+
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        drift = reconcile(cursor, repair=repair)
+        if repair:
+            evaluate_alerts(cursor)
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        if repair and drift:
+            response_cache.invalidate("inventory")
+
+        return jsonify({
+            "repaired": repair,
+            "drift": drift
+        }), 200
+
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# ---------------- STOCK ALERTS ----------------
+@app.route("/admin/alerts", methods=["GET"])
+@token_required
+@role_required("admin")
+def list_stock_alerts():
+    blood_bank_id = request.args.get("blood_bank_id", type=int)
+
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        alerts = active_alerts(cursor, blood_bank_id, request.args.get("blood_group"))
+
+        cursor.close()
+        conn.close()
+
+        return jsonify({"alerts": alerts}), 200
+
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/admin/alerts/thresholds", methods=["PUT"])
+@token_required
+@role_required("admin")
+def update_stock_threshold():
+    blood_bank_id, blood_group, low_water, high_water = parse_threshold(
+        request.get_json(silent=True) or {}
+    )
+
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        set_threshold(cursor, blood_bank_id, blood_group, low_water, high_water)
+        alerts = active_alerts(cursor, blood_bank_id, blood_group)
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        return jsonify({
+            "message": "Threshold updated",
+            "blood_bank_id": blood_bank_id,
+            "blood_group": blood_group,
+            "low_water": low_water,
+            "high_water": high_water,
+            "alert": alerts[0] if alerts else None
+        }), 200
+
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# ---------------- ANALYTICS ----------------
+@app.route("/admin/analytics", methods=["GET"])
+@token_required
+@role_required("admin")
+@response_cache.cached("analytics", ttl=60)
+def analytics_series():
+    query = parse_range_query(request.args)
+
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        series = query_series(cursor, query)
+
+        cursor.close()
+        conn.close()
+
+        return jsonify({
+            "granularity": query["granularity"],
+            "from": query["from"].isoformat(),
+            "to": query["to"].isoformat(),
+            "blood_bank_id": query["blood_bank_id"] or None,
+            "city": query["city"] or None,
+            "blood_group": query["blood_group"],
+            "series": series
+        }), 200
+
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# ---------------- ADMIN EXPORTS ----------------
+@app.route("/admin/exports/donations", methods=["GET"])
+@token_required
+@role_required("admin")
+def export_donations():
+    return stream_query(
+        """
+        SELECT dh.donation_id, dh.donor_id, d.blood_group,
+               dh.blood_bank_id, dh.donation_date, dh.quantity_units
+        FROM donation_history dh
+        JOIN donors d ON dh.donor_id = d.donor_id
+        ORDER BY dh.donation_id
+        """,
+        fmt=request.args.get("format", "json"),
+        filename="donation_history"
+    )
+
+
+@app.route("/admin/exports/blood-requests", methods=["GET"])
+@token_required
+@role_required("admin")
+def export_blood_requests():
+    return stream_query(
+        """
+        SELECT request_id, user_id, blood_group, quantity_units,
+               urgency, city, status, request_date
+        FROM blood_requests
+        ORDER BY request_id
+        """,
+        fmt=request.args.get("format", "json"),
+        filename="blood_requests"
+    )
 
 
 @app.route("/donors/reset-eligibility", methods=["POST"])
+@token_required
+@role_required("admin")
 def reset_eligibility():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    # Incremental: only donors whose waiting period ended are touched
+    refreshed = refresh_eligibility()
 
-    cursor.execute("""
-        UPDATE donors
-        SET eligible = 1
-        WHERE last_donation_date <= DATE_SUB(CURDATE(), INTERVAL 42 DAY)
-    """)
+    return jsonify({"message": "Eligibility reset", "donors_refreshed": refreshed}), 200
 
-    conn.commit()
-    cursor.close()
-    conn.close()
 
-    return jsonify({"message": "Eligibility reset"}), 200
 
 
+# ---------------- BACKGROUND JOBS ----------------
+# Every worker starts one; leader election lets only one of them run jobs
+if config.SCHEDULER_ENABLED:
+    scheduler.start()
 
 
 # ---------------- RUN SERVER ----------------
 if __name__ == "__main__":
+    donor_index.rebuild()
     app.run(debug=True)
@@ -0,0 +1,321 @@
+"""
+Async serving mode:  uvicorn asgi:app --workers 4
+
+The I/O-bound read endpoints below are served natively on the event loop
+from an aiomysql pool, through the same response cache as on Flask. Every
+other route is the unchanged Flask app behind a2wsgi, which runs each
+request on a pool of ASGI_WSGI_THREADS threads, so bcrypt and the write
+paths never block the loop and do not queue behind each other.
+
+Needs the packages in requirements-async.txt.
+"""
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+from starlette.routing import Match, Route
+import aiomysql
+import contextlib
+import contextvars
+import os
+import time
+
+import config
+from app import app as flask_app
+from cache import RedisCache, response_cache
+from db import PoolTimeoutError
+from donor_index import donor_index
+from donor_scores import ScoreQueryError, parse_rank_query
+from geo_index import GeoQueryError, geo_center, parse_geo_query
+from eligibility import ensure_eligibility_refreshed
+from inventory_aggregates import BANK_INVENTORY_SQL, ensure_expired
+from metrics import QueryStats, request_metrics
+from pagination import InvalidCursorError, split_page
+from queries import (
+    BANK_LOCATION_SQL, MATCH_REQUEST_SQL, blood_banks_page, blood_requests_page,
+    donations_page
+)
+from tokens import AuthError, authenticate
+
+db_pool = None
+query_stats = contextvars.ContextVar("query_stats", default=None)
+
+
+# ---------------- DB ----------------
+async def fetch_all(sql, params=()):
+    stats = query_stats.get()
+    started = time.perf_counter()
+    async with db_pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(sql, params)
+            rows = await cursor.fetchall()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+        stats.rows += len(rows)
+    return rows
+
+
+async def fetch_one(sql, params=()):
+    rows = await fetch_all(sql, params)
+    return rows[0] if rows else None
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    global db_pool
+    db_pool = await aiomysql.create_pool(
+        host=os.getenv("host"),
+        port=int(os.getenv("port")),
+        db=os.getenv("database"),
+        user=os.getenv("user"),
+        password=os.getenv("password"),
+        minsize=1,
+        maxsize=config.DB_POOL_SIZE + config.DB_POOL_MAX_OVERFLOW,
+        pool_recycle=config.DB_POOL_RECYCLE,
+        # Without autocommit a pooled connection keeps its first snapshot
+        autocommit=True
+    )
+    try:
+        yield
+    finally:
+        db_pool.close()
+        await db_pool.wait_closed()
+
+
+# ---------------- HELPERS ----------------
+def json_response(payload, status=200, headers=None):
+    # Flask's JSON provider, so dates and decimals serialize exactly as on WSGI
+    return Response(
+        flask_app.json.dumps(payload),
+        status_code=status,
+        headers=headers,
+        media_type="application/json"
+    )
+
+
+async def _cache_call(fn, *args):
+    # Redis round trips would block the loop; the in-memory cache does not
+    if isinstance(response_cache.backend, RedisCache):
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+
+async def authorize(request, *roles):
+    """(claims, None) or (None, error response), mirroring token_required/role_required."""
+    try:
+        # The denylist check is a Redis round trip when Redis is shared
+        claims, _ = await _cache_call(
+            authenticate,
+            request.headers.get("Authorization"),
+            flask_app.config["SECRET_KEY"]
+        )
+    except AuthError as e:
+        return None, json_response({"error": e.message}, 401)
+
+    if roles and claims["role"] not in roles:
+        return None, json_response({
+            "error": "Access denied",
+            "required_roles": list(roles),
+            "your_role": claims["role"]
+        }, 403)
+    return claims, None
+
+
+async def cached(request, tag, ttl, build):
+    """
+    response_cache.cached() for async routes: same keys, tags and stats, so
+    invalidations from the Flask write routes apply here too.
+    """
+    key = await _cache_call(
+        response_cache.key_for, tag, f"{request.url.path}?{request.url.query}"
+    )
+    hit = await _cache_call(response_cache.lookup, tag, key)
+    if hit is not None:
+        body, status, headers = hit
+        response = Response(body, status_code=status, headers=dict(headers))
+        response.headers["X-Cache"] = "HIT"
+        return response
+
+    response = await build()
+    if response.status_code == 200:
+        await _cache_call(
+            response_cache.store, key, response.body, 200, response.headers, ttl
+        )
+    response.headers["X-Cache"] = "MISS"
+    return response
+
+
+async def page_response(page):
+    rows = await fetch_all(page.sql, page.params)
+    rows, next_cursor = split_page(rows, page)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return json_response(rows, headers=headers)
+
+
+def handler(route):
+    """
+    Same error contract and /metrics accounting as the Flask routes;
+    `route` is the Flask rule, so both modes share metric labels.
+    """
+    def decorator(fn):
+        async def wrapped(request):
+            stats = QueryStats()
+            query_stats.set(stats)
+            request_metrics.started(route, request.method)
+            started = time.perf_counter()
+            response = None
+            try:
+                response = await fn(request)
+            except (InvalidCursorError, GeoQueryError, ScoreQueryError) as e:
+                response = json_response({"error": str(e)}, 400)
+            except PoolTimeoutError:
+                # From blocking helpers like ensure_fresh that use the Flask pool
+                response = json_response(
+                    {"error": "Database busy, please retry"}, 503, {"Retry-After": "1"}
+                )
+            except Exception as e:
+                response = json_response({"error": str(e)}, 500)
+            finally:
+                request_metrics.finished(
+                    route, request.method,
+                    response.status_code if response is not None else 500,
+                    time.perf_counter() - started,
+                    stats
+                )
+            return response
+        return wrapped
+    return decorator
+
+
+# ---------------- ASYNC ROUTES ----------------
+@handler("/inventory/<int:blood_bank_id>")
+async def get_inventory(request):
+    blood_bank_id = request.path_params["blood_bank_id"]
+
+    async def build():
+        await run_in_threadpool(ensure_expired)
+        inventory = await fetch_all(BANK_INVENTORY_SQL, (blood_bank_id,))
+        return json_response({
+            "blood_bank_id": blood_bank_id,
+            "inventory": inventory
+        })
+
+    return await cached(request, "inventory", 30, build)
+
+
+@handler("/blood-requests/<int:request_id>/match-donors")
+async def match_donors(request):
+    _, error = await authorize(request, "admin", "hospital")
+    if error:
+        return error
+
+    geo = parse_geo_query(request.query_params)
+    limit, min_score = parse_rank_query(request.query_params, geo.nearest)
+    request_data = await fetch_one(
+        MATCH_REQUEST_SQL, (request.path_params["request_id"],)
+    )
+    if not request_data:
+        return json_response({"error": "Request not found"}, 404)
+
+    if request_data["urgency"] != "emergency":
+        return json_response({"message": "Matching only for emergency requests"})
+
+    # Usually no-ops; when due they do blocking DB work, so keep them off the loop
+    await run_in_threadpool(ensure_eligibility_refreshed)
+    await run_in_threadpool(donor_index.ensure_fresh)
+    if geo.active:
+        bank = None
+        if geo.blood_bank_id is not None:
+            bank = await fetch_one(BANK_LOCATION_SQL, (geo.blood_bank_id,))
+        lat, lon = geo_center(geo, request_data, bank)
+        donors = donor_index.match_nearby(
+            lat, lon, request_data["blood_group"], geo.radius_km, geo.nearest,
+            limit, min_score
+        )
+    else:
+        donors = donor_index.top(
+            request_data["city"], request_data["blood_group"], limit, min_score
+        )
+
+    return json_response({"matched_donors": donors})
+
+
+@handler("/blood-requests")
+async def view_blood_requests(request):
+    _, error = await authorize(request, "admin", "hospital")
+    if error:
+        return error
+    return await page_response(blood_requests_page(request.query_params))
+
+
+@handler("/blood-requests/me")
+async def my_blood_requests(request):
+    claims, error = await authorize(request)
+    if error:
+        return error
+    return await page_response(
+        blood_requests_page(request.query_params, user_id=claims["user_id"])
+    )
+
+
+@handler("/donations/me")
+async def get_my_donations(request):
+    claims, error = await authorize(request, "donor")
+    if error:
+        return error
+    return await page_response(
+        donations_page(claims["user_id"], request.query_params)
+    )
+
+
+@handler("/admin/blood-banks")
+async def get_blood_banks(request):
+    _, error = await authorize(request, "admin")
+    if error:
+        return error
+    return await cached(
+        request, "blood_banks", 300,
+        lambda: page_response(blood_banks_page(request.query_params))
+    )
+
+
+routes = [
+    Route("/inventory/{blood_bank_id:int}", get_inventory, methods=["GET"]),
+    Route("/blood-requests/{request_id:int}/match-donors", match_donors, methods=["GET"]),
+    Route("/blood-requests", view_blood_requests, methods=["GET"]),
+    Route("/blood-requests/me", my_blood_requests, methods=["GET"]),
+    Route("/donations/me", get_my_donations, methods=["GET"]),
+    Route("/admin/blood-banks", get_blood_banks, methods=["GET"]),
+]
+
+async_app = Starlette(
+    routes=routes,
+    lifespan=lifespan,
+    middleware=[Middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Cache"]
+    )]
+)
+# Not asgiref's WsgiToAsgi: it runs every request on one shared thread
+wsgi_app = WSGIMiddleware(flask_app, workers=config.ASGI_WSGI_THREADS)
+
+
+# ---------------- DISPATCH ----------------
+async def app(scope, receive, send):
+    """Exact (path, method) matches go to the async routes, the rest to Flask."""
+    if scope["type"] == "lifespan":
+        return await async_app(scope, receive, send)
+
+    if scope["type"] == "http":
+        for route in routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return await async_app(scope, receive, send)
+
+    return await wsgi_app(scope, receive, send)
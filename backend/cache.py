@@ -0,0 +1,206 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, request
+
+import config
+
+
+# ---------------- BACKENDS ----------------
+class MemoryCache:
+    """Per-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def add(self, key, value, ttl):
+        """Set only if absent or expired; True when this call set it."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > time.monotonic():
+                return False
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def get_counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def info(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions
+            }
+
+
+class RedisCache:
+    """
+    Shared cache for multi-worker deployments, same interface as
+    MemoryCache. Size-bounding is Redis's job: run it with maxmemory and
+    maxmemory-policy allkeys-lru.
+    """
+
+    def __init__(self, url, prefix="bloodlink:cache:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.setex(self._prefix + key, int(max(ttl, 1)), pickle.dumps(value))
+
+    def add(self, key, value, ttl):
+        """Set only if absent; True when this call set it (SET NX)."""
+        return bool(self._client.set(
+            self._prefix + key, pickle.dumps(value), ex=int(max(ttl, 1)), nx=True
+        ))
+
+    def delete(self, key):
+        self._client.delete(self._prefix + key)
+
+    def incr(self, key):
+        return self._client.incr(self._prefix + "v:" + key)
+
+    def get_counter(self, key):
+        raw = self._client.get(self._prefix + "v:" + key)
+        return int(raw) if raw is not None else 0
+
+    def info(self):
+        return {"backend": "redis"}
+
+
+# ---------------- RESPONSE CACHE ----------------
+class ResponseCache:
+    """
+    Caches successful route responses under a tag. Invalidating a tag bumps
+    its version, which is part of every key, so stale entries are never
+    read again and simply age out.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def cached(self, tag, ttl, per_user=False):
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                key = self.key_for(
+                    tag, request.full_path,
+                    request.user["user_id"] if per_user else None
+                )
+                hit = self.lookup(tag, key)
+                if hit is not None:
+                    body, status, headers = hit
+                    response = Response(body, status=status, headers=headers)
+                    response.headers["X-Cache"] = "HIT"
+                    return response
+
+                response = fn(*args, **kwargs)
+
+                resp, status = response if isinstance(response, tuple) else (response, None)
+                if isinstance(resp, Response):
+                    status = status or resp.status_code
+                    if status == 200:
+                        self.store(key, resp.get_data(), status, resp.headers, ttl)
+                    resp.headers["X-Cache"] = "MISS"
+                return response
+            return wrapper
+        return decorator
+
+    # The pieces of cached(), for servers that are not Flask (asgi.py).
+    # `full_path` is the path plus "?" and the query string, as Flask has it.
+    def key_for(self, tag, full_path, user_id=None):
+        parts = [tag, str(self.backend.get_counter(tag)), full_path]
+        if user_id is not None:
+            parts.append(str(user_id))
+        return "|".join(parts)
+
+    def lookup(self, tag, key):
+        """(body, status, headers) cached under `key`, or None; counts the hit or miss."""
+        hit = self.backend.get(key)
+        self._count(tag, "hits" if hit is not None else "misses")
+        return hit
+
+    def store(self, key, body, status, headers, ttl):
+        headers = [
+            (name, value) for name, value in headers.items()
+            if name.lower() not in ("content-length", "x-cache")
+        ]
+        self.backend.set(key, (body, status, headers), ttl)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.incr(tag)
+            self._count(tag, "invalidations")
+
+    def _count(self, tag, name):
+        with self._lock:
+            counts = self._stats.setdefault(
+                tag, {"hits": 0, "misses": 0, "invalidations": 0}
+            )
+            counts[name] += 1
+
+    def stats(self):
+        with self._lock:
+            routes = {tag: dict(counts) for tag, counts in self._stats.items()}
+        return {"backend": self.backend.info(), "tags": routes}
+
+
+def _make_backend():
+    if config.CACHE_BACKEND == "redis":
+        return RedisCache(config.CACHE_REDIS_URL)
+    return MemoryCache(config.CACHE_MAX_ENTRIES)
+
+
+response_cache = ResponseCache(_make_backend())
@@ -0,0 +1,51 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ---------------- DATABASE POOL ----------------
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+# ---------------- RESPONSE CACHE ----------------
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+
+# ---------------- PASSWORD HASHING ----------------
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 32))
+
+# ---------------- ADMIN DASHBOARD ----------------
+DASHBOARD_TTL = int(os.getenv("DASHBOARD_TTL", 10))
+CRITICAL_STOCK_UNITS = int(os.getenv("CRITICAL_STOCK_UNITS", 10))
+LOW_STOCK_UNITS = int(os.getenv("LOW_STOCK_UNITS", 20))
+
+# ---------------- IDEMPOTENCY KEYS ----------------
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 86400))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", 10000))
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", 10))
+
+# ---------------- ASYNC SERVING (asgi.py) ----------------
+# Threads running the Flask routes behind the event loop; each open match
+# stream holds one for as long as it is connected
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", 32))
+
+# ---------------- AUTH ----------------
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+
+# ---------------- BACKGROUND JOBS ----------------
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+
+# ---------------- METRICS ----------------
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# ---------------- QUERY PROFILING ----------------
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 0))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", 200))
+QUERY_TRACES_KEPT = int(os.getenv("QUERY_TRACES_KEPT", 50))
@@ -0,0 +1,72 @@
+import datetime
+
+import config
+from stock_alerts import active_alerts
+
+# ---------------- ADMIN DASHBOARD SNAPSHOT ----------------
+# Everything AdminDashboard.jsx shows, read in one pass over small tables
+# and index-only counts. The route caches the result for
+# DASHBOARD_TTL seconds, shared by every admin, so polling dashboards
+# cost one cache read each.
+
+
+def stock_status(units):
+    if units <= config.CRITICAL_STOCK_UNITS:
+        return "critical"
+    if units <= config.LOW_STOCK_UNITS:
+        return "low"
+    return "healthy"
+
+
+def build_snapshot(cursor):
+    # Usable stock per group, across all banks
+    cursor.execute("""
+        SELECT blood_group, SUM(units_available) AS total_units
+        FROM inventory_aggregates
+        GROUP BY blood_group
+        ORDER BY blood_group
+    """)
+    stock = [
+        {
+            "blood_group": row["blood_group"],
+            "total_units": int(row["total_units"]),
+            "status": stock_status(int(row["total_units"]))
+        }
+        for row in cursor.fetchall()
+    ]
+
+    # Banks running out of a group, from the alert engine's active set
+    critical = active_alerts(cursor)
+
+    cursor.execute("""
+        SELECT status, urgency, COUNT(*) AS requests
+        FROM blood_requests
+        WHERE status IN ('pending', 'approved')
+        GROUP BY status, urgency
+    """)
+    open_requests = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT COUNT(*) AS donations, COALESCE(SUM(quantity_units), 0) AS units
+        FROM donation_history
+        WHERE donation_date = CURDATE()
+    """)
+    today = cursor.fetchone()
+
+    return {
+        "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "stock": stock,
+        "critical_alerts": critical,
+        "requests": {
+            "pending": sum(r["requests"] for r in open_requests
+                           if r["status"] == "pending"),
+            "approved": sum(r["requests"] for r in open_requests
+                            if r["status"] == "approved"),
+            "emergency_open": sum(r["requests"] for r in open_requests
+                                  if r["urgency"] == "emergency")
+        },
+        "donations_today": {
+            "donations": int(today["donations"]),
+            "units": int(today["units"])
+        }
+    }
@@ -1,14 +1,296 @@
 import mysql.connector
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from flask import g, has_app_context
+
+import config
+from metrics import instrument_cursor
 
 load_dotenv()
 
-def get_db_connection():
+
+def create_connection(database=None):
+    """
+    Unpooled connection, for long-lived holders such as the scheduler lock
+    and for scripts; `database` overrides the configured one.
+    """
     return mysql.connector.connect(
         host=os.getenv("host"),
         port=int(os.getenv("port")),
-        database=os.getenv("database"),
+        database=database or os.getenv("database"),
         user=os.getenv("user"),
         password=os.getenv("password")
     )
+
+
+def _close_quietly(raw):
+    try:
+        raw.close()
+    except Exception:
+        pass
+
+
+class PoolTimeoutError(Exception):
+    """No connection became available within the checkout timeout."""
+
+
+# ---------------- POOLED CONNECTION ----------------
+class PooledConnection:
+    """Wraps a raw MySQL connection; close() hands it back to the pool."""
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        # Inside a request, statements are counted and timed for /metrics
+        return instrument_cursor(self._raw.cursor(*args, **kwargs))
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        if has_app_context() and g.get("db_conn") is self:
+            g.pop("db_conn")
+        self._pool._release(self._raw, self._created_at)
+
+    def invalidate(self):
+        """Drop the connection instead of returning it, e.g. mid-way through a stream."""
+        if self._released:
+            return
+        self._released = True
+        if has_app_context() and g.get("db_conn") is self:
+            g.pop("db_conn")
+        self._pool._discard(self._raw)
+
+
+# ---------------- CONNECTION POOL ----------------
+class ConnectionPool:
+    """
+    Bounded pool: `size` connections are kept warm, up to `max_overflow`
+    extra ones are opened under bursts and closed again when returned.
+    Checkout blocks for at most `timeout` seconds.
+    """
+
+    def __init__(self, creator, size=5, max_overflow=10, timeout=10,
+                 recycle=1800, pre_ping=True):
+        self._creator = creator
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._open = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._invalidated = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+    def checkout(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        raw = created_at = None
+
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._idle:
+                        # LIFO: reuse the most recently returned connection
+                        raw, created_at = self._idle.pop()
+                        break
+                    if self._open < self.size + self.max_overflow:
+                        self._open += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"No database connection available after {self.timeout}s"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._in_use += 1
+
+        try:
+            if raw is None:
+                raw, created_at = self._new_connection()
+            else:
+                raw, created_at = self._validate(raw, created_at)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self._checkouts += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+
+        return PooledConnection(self, raw, created_at)
+
+    def _new_connection(self):
+        raw = self._creator()
+        with self._cond:
+            self._created += 1
+        return raw, time.monotonic()
+
+    def _validate(self, raw, created_at):
+        if self.recycle and time.monotonic() - created_at > self.recycle:
+            _close_quietly(raw)
+            with self._cond:
+                self._recycled += 1
+            return self._new_connection()
+
+        if self.pre_ping:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                _close_quietly(raw)
+                with self._cond:
+                    self._invalidated += 1
+                return self._new_connection()
+
+        return raw, created_at
+
+    def _release(self, raw, created_at):
+        # Roll back whatever an early return or exception left open
+        reusable = True
+        try:
+            if raw.unread_result or raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            reusable = False
+
+        discard = None
+        with self._cond:
+            self._in_use -= 1
+            if reusable and len(self._idle) < self.size:
+                self._idle.append((raw, created_at))
+            else:
+                self._open -= 1
+                discard = raw
+                if not reusable:
+                    self._invalidated += 1
+            self._cond.notify()
+
+        if discard is not None:
+            _close_quietly(discard)
+
+    def _discard(self, raw):
+        with self._cond:
+            self._in_use -= 1
+            self._open -= 1
+            self._invalidated += 1
+            self._cond.notify()
+        _close_quietly(raw)
+
+    def dispose(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for raw, _ in idle:
+            _close_quietly(raw)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "recycled": self._recycled,
+                "invalidated": self._invalidated,
+                "checkout_ms_avg": round(
+                    self._checkout_time_total / self._checkouts * 1000, 3
+                ) if self._checkouts else 0.0,
+                "checkout_ms_max": round(self._checkout_time_max * 1000, 3),
+                "pid": self.pid
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    # A forked worker must not share sockets with its parent
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                _pool = ConnectionPool(
+                    create_connection,
+                    size=config.DB_POOL_SIZE,
+                    max_overflow=config.DB_POOL_MAX_OVERFLOW,
+                    timeout=config.DB_POOL_TIMEOUT,
+                    recycle=config.DB_POOL_RECYCLE,
+                    pre_ping=config.DB_POOL_PRE_PING
+                )
+    return _pool
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+# ---------------- CHECKOUT ----------------
+def get_db_connection():
+    """
+    Inside a request the same pooled connection is reused until the route
+    closes it or the request ends; elsewhere every call checks one out.
+    """
+    if has_app_context():
+        conn = g.get("db_conn")
+        if conn is None:
+            conn = g.db_conn = get_pool().checkout()
+        return conn
+    return get_pool().checkout()
+
+
+@contextmanager
+def db_connection():
+    conn = get_pool().checkout()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _release_request_connection(exc=None):
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        conn.close()
+
+
+def init_app(app):
+    app.teardown_appcontext(_release_request_connection)
@@ -0,0 +1,244 @@
+import csv
+import datetime
+import io
+
+from donor_index import DONOR_COLUMNS
+from eligibility import next_eligible_date
+from inventory_aggregates import add_lots
+from rewards import badge_for, donation_points
+from rollups import donation_event, record as record_rollups
+
+MAX_BATCH_ROWS = 5000
+SHELF_LIFE_DAYS = 42
+
+
+# ---------------- PARSING ----------------
+def parse_batch(content_type, body_text, json_body):
+    """Raw rows from a CSV body or a JSON {"donations": [...]} / [...] body."""
+    if content_type and content_type.startswith("text/csv"):
+        return list(csv.DictReader(io.StringIO(body_text)))
+    if isinstance(json_body, dict):
+        json_body = json_body.get("donations")
+    if not isinstance(json_body, list):
+        raise ValueError("Expected a JSON list of donations or a text/csv body")
+    return json_body
+
+
+def _truthy(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y")
+    return bool(value)
+
+
+def validate_row(raw):
+    """Typed row or an error message; checks that need no database."""
+    if not isinstance(raw, dict):
+        return None, "row must be an object"
+    try:
+        donor_id = int(raw.get("donor_id"))
+        blood_bank_id = int(raw.get("blood_bank_id"))
+        quantity_units = int(raw.get("quantity_units"))
+    except (TypeError, ValueError):
+        return None, "donor_id, blood_bank_id and quantity_units must be integers"
+    if quantity_units <= 0:
+        return None, "quantity_units must be positive"
+
+    donation_date = datetime.date.today()
+    if raw.get("donation_date"):
+        try:
+            donation_date = datetime.date.fromisoformat(str(raw["donation_date"]))
+        except ValueError:
+            return None, "donation_date must be YYYY-MM-DD"
+        if donation_date > datetime.date.today():
+            return None, "donation_date is in the future"
+
+    return {
+        "donor_id": donor_id,
+        "blood_bank_id": blood_bank_id,
+        "quantity_units": quantity_units,
+        "donation_date": donation_date,
+        "emergency": _truthy(raw.get("emergency", False))
+    }, None
+
+
+def eligible_on(donor, day):
+    """Whether `donor` (with eligible_from) could give blood on `day`."""
+    return donor["eligible_from"] is None or donor["eligible_from"] <= day
+
+
+def _in_clause(values):
+    return ", ".join(["%s"] * len(values))
+
+
+# ---------------- INGESTION ----------------
+def ingest_donations(cursor, raw_rows):
+    """
+    Validate and record a whole batch with set-wise statements in the
+    caller's transaction. Bad rows are reported, not fatal. Returns
+    (accepted rows, errors); an accepted row whose donor may already give
+    blood again (an old, back-dated donation) carries that donor's
+    DONOR_COLUMNS row as "donor", for the match index.
+    """
+    errors = []
+    rows = []
+    for index, raw in enumerate(raw_rows):
+        row, error = validate_row(raw)
+        if error:
+            errors.append({"row": index, "error": error})
+        else:
+            row["row"] = index
+            rows.append(row)
+
+    if not rows:
+        return [], errors
+
+    # 1. Donors and banks for the whole batch, one query each
+    donor_ids = sorted({r["donor_id"] for r in rows})
+    cursor.execute(f"""
+        SELECT donor_id, blood_group, total_donations, eligible_from
+        FROM donors d
+        WHERE donor_id IN ({_in_clause(donor_ids)})
+        FOR UPDATE
+    """, donor_ids)
+    donors = {d["donor_id"]: d for d in cursor.fetchall()}
+
+    bank_ids = sorted({r["blood_bank_id"] for r in rows})
+    cursor.execute(f"""
+        SELECT blood_bank_id
+        FROM blood_banks
+        WHERE blood_bank_id IN ({_in_clause(bank_ids)})
+    """, bank_ids)
+    banks = {b["blood_bank_id"] for b in cursor.fetchall()}
+
+    # 2. Eligibility on the donation's own date, so a back-dated row cannot
+    # fall inside the interval after the donor's previous donation; a donor
+    # becomes ineligible after one donation
+    accepted = []
+    seen = set()
+    for row in rows:
+        donor = donors.get(row["donor_id"])
+        if donor is None:
+            error = "donor not found"
+        elif row["blood_bank_id"] not in banks:
+            error = "blood bank not found"
+        elif row["donor_id"] in seen:
+            error = "donor already donated earlier in this batch"
+        elif not eligible_on(donor, row["donation_date"]):
+            error = "donor was not eligible on donation_date"
+        else:
+            error = None
+
+        if error:
+            errors.append({"row": row["row"], "error": error})
+            continue
+
+        seen.add(row["donor_id"])
+        row["blood_group"] = donor["blood_group"]
+        row["points"] = donation_points(row["emergency"])
+        row["badge"] = badge_for(donor["total_donations"] + 1)
+        row["expiry_date"] = row["donation_date"] + datetime.timedelta(days=SHELF_LIFE_DAYS)
+        accepted.append(row)
+
+    if not accepted:
+        return [], sorted(errors, key=lambda e: e["row"])
+
+    # 3. History and inventory lots, batched
+    cursor.executemany("""
+        INSERT INTO donation_history
+        (donor_id, blood_bank_id, donation_date, quantity_units)
+        VALUES (%s, %s, %s, %s)
+    """, [
+        (r["donor_id"], r["blood_bank_id"], r["donation_date"], r["quantity_units"])
+        for r in accepted
+    ])
+
+    # Lots from donations older than the shelf life go in already expired,
+    # counted in units_total only, as expire_lots() would have left them
+    today = datetime.date.today()
+    for r in accepted:
+        r["usable"] = r["expiry_date"] >= today
+    cursor.executemany("""
+        INSERT INTO blood_inventory
+        (blood_bank_id, blood_group, units_available,
+         collection_date, expiry_date, status)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, [
+        (r["blood_bank_id"], r["blood_group"], r["quantity_units"],
+         r["donation_date"], r["expiry_date"],
+         "available" if r["usable"] else "expired")
+        for r in accepted
+    ])
+
+    for usable in (True, False):
+        add_lots(cursor, [
+            {
+                "blood_bank_id": r["blood_bank_id"],
+                "blood_group": r["blood_group"],
+                "units": r["quantity_units"]
+            }
+            for r in accepted if r["usable"] == usable
+        ], usable=usable)
+
+    # 4. Donor stats in one statement; the flag follows eligible_from, which
+    # is already past for donations older than the waiting period
+    for r in accepted:
+        r["eligible_from"] = next_eligible_date(r["donation_date"])
+        r["eligible"] = r["eligible_from"] <= today
+    ids = [r["donor_id"] for r in accepted]
+    cases = " ".join("WHEN %s THEN %s" for _ in accepted)
+    params = []
+    for r in accepted:
+        params += [r["donor_id"], r["donation_date"]]
+    for r in accepted:
+        params += [r["donor_id"], r["eligible_from"]]
+    for r in accepted:
+        params += [r["donor_id"], int(r["eligible"])]
+    for r in accepted:
+        params += [r["donor_id"], r["points"]]
+    for r in accepted:
+        params += [r["donor_id"], int(r["emergency"])]
+    cursor.execute(f"""
+        UPDATE donors
+        SET last_donation_date = CASE donor_id {cases} END,
+            eligible_from = CASE donor_id {cases} END,
+            eligible = CASE donor_id {cases} END,
+            points = points + CASE donor_id {cases} END,
+            total_donations = total_donations + 1,
+            emergency_donations = emergency_donations + CASE donor_id {cases} END
+        WHERE donor_id IN ({_in_clause(ids)})
+    """, params + ids)
+
+    eligible_ids = [r["donor_id"] for r in accepted if r["eligible"]]
+    if eligible_ids:
+        cursor.execute(f"""
+            SELECT {DONOR_COLUMNS}
+            FROM donors d
+            JOIN users u ON d.user_id = u.user_id
+            WHERE d.donor_id IN ({_in_clause(eligible_ids)})
+        """, eligible_ids)
+        eligible_donors = {d["donor_id"]: d for d in cursor.fetchall()}
+        for r in accepted:
+            if r["eligible"]:
+                r["donor"] = eligible_donors[r["donor_id"]]
+
+    # 5. Badges
+    badges = [(r["donor_id"], r["badge"]) for r in accepted if r["badge"]]
+    if badges:
+        cursor.executemany("""
+            INSERT INTO donor_badges (donor_id, badge_name)
+            VALUES (%s, %s)
+        """, badges)
+
+    # 6. Rollups, the last statement before the caller commits; back-dated
+    # donations count at the start of their day
+    now = datetime.datetime.now()
+    record_rollups(cursor, [
+        donation_event(
+            now if r["donation_date"] == now.date()
+            else datetime.datetime.combine(r["donation_date"], datetime.time()),
+            r["blood_bank_id"], r["blood_group"], r["quantity_units"]
+        )
+        for r in accepted
+    ])
+
+    return accepted, sorted(errors, key=lambda e: e["row"])
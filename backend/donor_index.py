@@ -0,0 +1,309 @@
+import bisect
+import heapq
+import threading
+import time
+from itertools import islice
+
+from db import db_connection
+from donor_scores import donor_score
+from geo_index import GeoGrid, coordinates
+
+# Donor groups a recipient can receive, best choice first.
+# O- goes last everywhere: it is the universal donor and always scarce.
+COMPATIBLE_DONORS = {
+    "O-": ["O-"],
+    "O+": ["O+", "O-"],
+    "A-": ["A-", "O-"],
+    "A+": ["A+", "A-", "O+", "O-"],
+    "B-": ["B-", "O-"],
+    "B+": ["B+", "B-", "O+", "O-"],
+    "AB-": ["AB-", "A-", "B-", "O-"],
+    "AB+": ["AB+", "AB-", "A+", "A-", "B+", "B-", "O+", "O-"],
+}
+
+DONOR_INDEX_MAX_AGE = 300  # seconds before a full rebuild from MySQL
+
+# What an index entry and its score are built from; d = donors, u = users
+DONOR_COLUMNS = """
+    d.donor_id, d.blood_group, u.full_name, u.phone, u.city,
+    u.latitude, u.longitude, d.last_donation_date, d.total_donations,
+    d.points, d.emergency_donations
+"""
+
+
+def normalize_city(city):
+    return (city or "").strip().casefold()
+
+
+class DonorIndex:
+    """
+    Eligible donors keyed by (city, blood_group), so matching is a dict
+    lookup instead of a donors/users join. Donors with coordinates are
+    also in a spatial grid for radius and nearest-K matching. Each entry
+    carries its donor score, and every bucket keeps its donors sorted by
+    score so the top K come from a merge of a few sorted lists. Kept current
+    by the write routes and rebuilt from MySQL when older than `max_age`,
+    which also picks up changes made by other worker processes and ages
+    the recency part of the scores.
+    """
+
+    def __init__(self, max_age=DONOR_INDEX_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        # Held by the one thread rebuilding; others keep the old snapshot
+        self._rebuild_lock = threading.Lock()
+        self._buckets = {}
+        self._ranked = {}
+        self._keys = {}
+        self._grid = GeoGrid()
+        self._loaded_at = None
+        self._listeners = []
+        # add()/remove() calls made while a rebuild reads MySQL, replayed on
+        # the new snapshot so it cannot bring back a donor removed meanwhile
+        self._pending = None
+
+    # ---------------- LOADING ----------------
+    def load(self, rows):
+        buckets = {}
+        keys = {}
+        grid = GeoGrid()
+        for row in rows:
+            key = (normalize_city(row["city"]), row["blood_group"])
+            buckets.setdefault(key, {})[row["donor_id"]] = self._entry(row)
+            keys[row["donor_id"]] = key
+            self._place(grid, row)
+        ranked = {
+            key: sorted(self._rank(entry) for entry in bucket.values())
+            for key, bucket in buckets.items()
+        }
+
+        with self._lock:
+            self._buckets = buckets
+            self._ranked = ranked
+            self._keys = keys
+            self._grid = grid
+            for op, arg in self._pending or ():
+                if op == "add":
+                    self._add(arg)
+                else:
+                    self._discard(arg)
+            self._pending = None
+            self._loaded_at = time.monotonic()
+
+        self._notify(None)
+
+    def rebuild(self):
+        with self._rebuild_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        # Caller holds _rebuild_lock
+        with self._lock:
+            self._pending = []
+        try:
+            rows = self._fetch_rows()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        self.load(rows)
+
+    @staticmethod
+    def _fetch_rows():
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"""
+                SELECT {DONOR_COLUMNS}
+                FROM donors d
+                JOIN users u ON d.user_id = u.user_id
+                WHERE d.eligible_from IS NULL OR d.eligible_from <= CURDATE()
+            """)
+            rows = cursor.fetchall()
+            cursor.close()
+        return rows
+
+    def _stale(self):
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at > self.max_age
+
+    def ensure_fresh(self):
+        """
+        Single-flight: one thread rebuilds a stale index while the others
+        go on matching against the previous snapshot. Only a cold index,
+        with nothing to serve yet, makes callers wait for the rebuild.
+        """
+        if not self._stale():
+            return
+        cold = self._loaded_at is None
+        if not self._rebuild_lock.acquire(blocking=cold):
+            return
+        try:
+            # Another thread may have finished a rebuild while we waited
+            if self._stale():
+                self._rebuild()
+        finally:
+            self._rebuild_lock.release()
+
+    # ---------------- UPDATES ----------------
+    def add(self, row):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(("add", row))
+            key, old_key = self._add(row)
+
+        self._notify({key, old_key} - {None})
+
+    def remove(self, donor_id):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(("remove", donor_id))
+            key = self._discard(donor_id)
+
+        if key is not None:
+            self._notify({key})
+
+    def _add(self, row):
+        key = (normalize_city(row["city"]), row["blood_group"])
+        old_key = self._discard(row["donor_id"])
+        entry = self._entry(row)
+        self._buckets.setdefault(key, {})[row["donor_id"]] = entry
+        bisect.insort(self._ranked.setdefault(key, []), self._rank(entry))
+        self._keys[row["donor_id"]] = key
+        self._place(self._grid, row)
+        return key, old_key
+
+    @staticmethod
+    def _place(grid, row):
+        point = coordinates(row.get("latitude"), row.get("longitude"))
+        if point is not None:
+            grid.add(row["donor_id"], row["blood_group"], *point)
+
+    def _discard(self, donor_id):
+        self._grid.remove(donor_id)
+        key = self._keys.pop(donor_id, None)
+        if key is None:
+            return None
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            entry = bucket.pop(donor_id, None)
+            if not bucket:
+                del self._buckets[key]
+                self._ranked.pop(key, None)
+            elif entry is not None:
+                ranked = self._ranked[key]
+                del ranked[bisect.bisect_left(ranked, self._rank(entry))]
+        return key
+
+    # ---------------- LISTENERS ----------------
+    def add_listener(self, callback):
+        """callback(keys) gets the changed (city, group) keys, or None for all."""
+        self._listeners.append(callback)
+
+    def _notify(self, keys):
+        # Called outside the index lock so listeners may call match()
+        for callback in self._listeners:
+            callback(keys)
+
+    # ---------------- MATCHING ----------------
+    @staticmethod
+    def keys_for(city, blood_group):
+        city = normalize_city(city)
+        return {
+            (city, donor_group)
+            for donor_group in COMPATIBLE_DONORS.get(blood_group, [blood_group])
+        }
+
+    def match(self, city, blood_group):
+        """Compatible eligible donors in `city`, exact group first."""
+        city = normalize_city(city)
+        matches = []
+        with self._lock:
+            for donor_group in COMPATIBLE_DONORS.get(blood_group, [blood_group]):
+                bucket = self._buckets.get((city, donor_group))
+                if not bucket:
+                    continue
+                for donor_id in sorted(bucket):
+                    donor = dict(bucket[donor_id])
+                    donor["exact_match"] = donor_group == blood_group
+                    matches.append(donor)
+        return matches
+
+    def top(self, city, blood_group, limit, min_score=None):
+        """
+        The `limit` best-scored compatible donors in `city`, best first.
+        A lazy heap merge over the per-group sorted buckets reads only
+        as many entries as it returns.
+        """
+        city = normalize_city(city)
+        groups = COMPATIBLE_DONORS.get(blood_group, [blood_group])
+        with self._lock:
+            merged = heapq.merge(*(
+                self._ranked.get((city, donor_group), ()) for donor_group in groups
+            ))
+            matches = []
+            for negative_score, donor_id in islice(merged, limit):
+                if min_score is not None and -negative_score < min_score:
+                    break
+                donor = dict(self._buckets[self._keys[donor_id]][donor_id])
+                donor["exact_match"] = donor["blood_group"] == blood_group
+                matches.append(donor)
+        return matches
+
+    def match_nearby(self, lat, lon, blood_group, radius_km=None, nearest=None,
+                     limit=None, min_score=None):
+        """
+        Compatible eligible donors around (lat, lon), each with distance_km.
+        With `nearest`: the closest ones (within `radius_km` if given),
+        nearest first. With only `radius_km`: the best-scored `limit`
+        donors within it, best first.
+        """
+        groups = COMPATIBLE_DONORS.get(blood_group, [blood_group])
+        with self._lock:
+            if nearest is None:
+                hits = self._grid.within(lat, lon, groups, radius_km)
+            elif radius_km is None:
+                hits = self._grid.nearest(lat, lon, groups, nearest)
+            else:
+                hits = self._grid.nearest(lat, lon, groups, nearest, radius_km)
+
+            candidates = []
+            for distance, donor_id in hits:
+                donor = self._buckets[self._keys[donor_id]][donor_id]
+                if min_score is None or donor["score"] >= min_score:
+                    candidates.append((distance, donor))
+            if nearest is None and limit is not None:
+                candidates = heapq.nlargest(
+                    limit, candidates, key=lambda hit: (hit[1]["score"], -hit[0])
+                )
+            elif limit is not None:
+                candidates = candidates[:limit]
+
+            matches = []
+            for distance, entry in candidates:
+                donor = dict(entry)
+                donor["exact_match"] = donor["blood_group"] == blood_group
+                donor["distance_km"] = round(distance, 2)
+                matches.append(donor)
+        return matches
+
+    def __len__(self):
+        with self._lock:
+            return len(self._keys)
+
+    @staticmethod
+    def _entry(row):
+        return {
+            "donor_id": row["donor_id"],
+            "full_name": row["full_name"],
+            "phone": row["phone"],
+            "blood_group": row["blood_group"],
+            "score": donor_score(row)
+        }
+
+    @staticmethod
+    def _rank(entry):
+        # Ascending sort puts the best score first, then the lowest id
+        return -entry["score"], entry["donor_id"]
+
+
+donor_index = DonorIndex()
@@ -0,0 +1,83 @@
+import datetime
+
+# ---------------- DONOR SCORING ----------------
+# Score in 0-100 from how likely a donor is to come in when called.
+# Each part is normalised to 0-1 before weighting.
+RECENCY_WEIGHT = 35
+EXPERIENCE_WEIGHT = 25
+RESPONSE_WEIGHT = 25
+ENGAGEMENT_WEIGHT = 15
+
+RECENCY_DAYS = 365       # donated longer ago than this: no recency credit
+EXPERIENCE_CAP = 10      # donations; matches the top badge
+ENGAGEMENT_CAP = 1500    # points
+
+DEFAULT_MATCH_LIMIT = 20
+MAX_MATCH_LIMIT = 200
+
+
+class ScoreQueryError(ValueError):
+    pass
+
+
+def donor_score(row, today=None):
+    """
+    Score for a donors row with last_donation_date, total_donations,
+    points and emergency_donations. The response rate is the share of
+    donations that answered an emergency, smoothed so one donation is
+    not a 100% rate.
+    """
+    today = today or datetime.date.today()
+    total = row.get("total_donations") or 0
+    last = row.get("last_donation_date")
+
+    recency = 0.0
+    if last is not None:
+        if isinstance(last, datetime.datetime):
+            last = last.date()
+        recency = max(0.0, 1 - (today - last).days / RECENCY_DAYS)
+    experience = min(total, EXPERIENCE_CAP) / EXPERIENCE_CAP
+    response = ((row.get("emergency_donations") or 0) + 1) / (total + 2)
+    engagement = min(row.get("points") or 0, ENGAGEMENT_CAP) / ENGAGEMENT_CAP
+
+    return round(
+        RECENCY_WEIGHT * recency
+        + EXPERIENCE_WEIGHT * experience
+        + RESPONSE_WEIGHT * response
+        + ENGAGEMENT_WEIGHT * engagement,
+        2
+    )
+
+
+def parse_rank_query(args, nearest=None):
+    """
+    (limit, min_score) from ?limit=&min_score=; limit is clamped like page
+    sizes. With ?nearest=N and no limit, the limit is N, so nearest is not
+    cut down to the default; an explicit limit still applies.
+
+    >>> parse_rank_query({})
+    (20, None)
+    >>> parse_rank_query({}, nearest=100)
+    (100, None)
+    >>> parse_rank_query({"limit": "5"}, nearest=100)
+    (5, None)
+    """
+    if nearest is not None and args.get("limit") in (None, ""):
+        limit = nearest
+    else:
+        try:
+            limit = int(args.get("limit", DEFAULT_MATCH_LIMIT))
+        except ValueError:
+            limit = DEFAULT_MATCH_LIMIT
+        limit = max(1, min(limit, MAX_MATCH_LIMIT))
+
+    min_score = args.get("min_score")
+    if min_score in (None, ""):
+        return limit, None
+    try:
+        min_score = float(min_score)
+    except ValueError:
+        raise ScoreQueryError("min_score must be a number")
+    if not 0 <= min_score <= 100:
+        raise ScoreQueryError("min_score must be between 0 and 100")
+    return limit, min_score
@@ -0,0 +1,79 @@
+import datetime
+import threading
+
+from db import db_connection
+from donor_index import DONOR_COLUMNS, donor_index
+
+ELIGIBILITY_DAYS = 42
+REFRESH_BATCH = 1000
+
+# A donor may give blood again once eligible_from has passed. This is the
+# source of truth; the eligible flag is a cache of it kept for old readers
+# and for the (eligible, eligible_from) index that finds donors to flip.
+ELIGIBLE_NOW = "(d.eligible_from IS NULL OR d.eligible_from <= CURDATE())"
+
+
+def next_eligible_date(donation_date):
+    return donation_date + datetime.timedelta(days=ELIGIBILITY_DAYS)
+
+
+def refresh_batch(cursor, limit=REFRESH_BATCH):
+    """
+    Flip the flag for donors whose waiting period has ended. Only rows
+    with eligible = 0 are scanned, i.e. donors who gave blood in the last
+    ELIGIBILITY_DAYS, never the whole table. Returns the flipped donors.
+    """
+    cursor.execute(f"""
+        SELECT {DONOR_COLUMNS}
+        FROM donors d
+        JOIN users u ON d.user_id = u.user_id
+        WHERE d.eligible = 0
+          AND d.eligible_from <= CURDATE()
+        ORDER BY d.eligible_from
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    """, (limit,))
+    donors = cursor.fetchall()
+    if not donors:
+        return []
+
+    cursor.execute(f"""
+        UPDATE donors
+        SET eligible = 1
+        WHERE donor_id IN ({", ".join(["%s"] * len(donors))})
+    """, [d["donor_id"] for d in donors])
+    return donors
+
+
+def refresh_eligibility():
+    """Run refresh batches until caught up; keeps the match index current."""
+    total = 0
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        while True:
+            donors = refresh_batch(cursor)
+            conn.commit()
+            for donor in donors:
+                donor_index.add(donor)
+            total += len(donors)
+            if len(donors) < REFRESH_BATCH:
+                break
+        cursor.close()
+    return total
+
+
+_refreshed_on = None
+_refresh_lock = threading.Lock()
+
+
+def ensure_eligibility_refreshed():
+    """At most one refresh per day per process, triggered by the first read."""
+    global _refreshed_on
+    today = datetime.date.today()
+    if _refreshed_on == today:
+        return
+    with _refresh_lock:
+        if _refreshed_on == today:
+            return
+        refresh_eligibility()
+        _refreshed_on = today
@@ -0,0 +1,192 @@
+import math
+from collections import namedtuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.195
+CELL_DEGREES = 0.1  # ~11 km of latitude
+MAX_RADIUS_KM = 500
+NEAREST_START_KM = 5
+
+
+class GeoQueryError(ValueError):
+    pass
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def coordinates(latitude, longitude):
+    """(lat, lon) as floats, or None if either is missing or out of range."""
+    if latitude is None or longitude is None:
+        return None
+    try:
+        lat, lon = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+# ---------------- GRID ----------------
+class GeoGrid:
+    """
+    Points bucketed into CELL_DEGREES squares, separately per blood group,
+    so a query only visits the cells around the point for the compatible
+    groups. Not locked: DonorIndex guards it with its own lock.
+    """
+
+    def __init__(self, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._lon_cells = int(round(360 / cell_degrees))
+        self._cells = {}
+        self._where = {}
+
+    def _cell(self, lat, lon):
+        return (
+            math.floor(lat / self.cell_degrees),
+            math.floor(lon / self.cell_degrees) % self._lon_cells
+        )
+
+    def add(self, point_id, group, lat, lon):
+        self.remove(point_id)
+        key = (group,) + self._cell(lat, lon)
+        self._cells.setdefault(key, {})[point_id] = (lat, lon)
+        self._where[point_id] = key
+
+    def remove(self, point_id):
+        key = self._where.pop(point_id, None)
+        if key is None:
+            return
+        cell = self._cells.get(key)
+        if cell is not None:
+            cell.pop(point_id, None)
+            if not cell:
+                del self._cells[key]
+
+    def __len__(self):
+        return len(self._where)
+
+    def _candidate_cells(self, lat, lon, groups, radius_km):
+        dlat = radius_km / KM_PER_DEGREE
+        rows = range(
+            math.floor((lat - dlat) / self.cell_degrees),
+            math.floor((lat + dlat) / self.cell_degrees) + 1
+        )
+        # Longitude degrees shrink towards the poles; widen the box to match
+        widest = math.cos(math.radians(min(90.0, abs(lat) + dlat)))
+        if widest < 1e-6 or radius_km / (KM_PER_DEGREE * widest) >= 180:
+            columns = range(self._lon_cells)
+        else:
+            dlon = radius_km / (KM_PER_DEGREE * widest)
+            columns = [
+                c % self._lon_cells for c in range(
+                    math.floor((lon - dlon) / self.cell_degrees),
+                    math.floor((lon + dlon) / self.cell_degrees) + 1
+                )
+            ]
+
+        box = len(rows) * len(columns) * len(groups)
+        if box > len(self._cells):
+            # A wide search on a sparse grid: walk the occupied cells instead
+            row_set, column_set, group_set = set(rows), set(columns), set(groups)
+            for key, cell in self._cells.items():
+                if key[0] in group_set and key[1] in row_set and key[2] in column_set:
+                    yield cell
+            return
+
+        for group in groups:
+            for row in rows:
+                for column in columns:
+                    cell = self._cells.get((group, row, column))
+                    if cell:
+                        yield cell
+
+    def within(self, lat, lon, groups, radius_km):
+        """[(distance_km, id)] for points of `groups` within the radius, nearest first."""
+        hits = []
+        for cell in self._candidate_cells(lat, lon, groups, radius_km):
+            for point_id, (plat, plon) in cell.items():
+                distance = haversine_km(lat, lon, plat, plon)
+                if distance <= radius_km:
+                    hits.append((distance, point_id))
+        hits.sort()
+        return hits
+
+    def nearest(self, lat, lon, groups, k, max_radius_km=MAX_RADIUS_KM):
+        """
+        The `k` nearest points within `max_radius_km`. Searches a doubling
+        radius: once it holds k points, nothing outside can be closer.
+        """
+        radius = min(NEAREST_START_KM, max_radius_km)
+        while True:
+            hits = self.within(lat, lon, groups, radius)
+            if len(hits) >= k or radius >= max_radius_km:
+                return hits[:k]
+            radius = min(radius * 2, max_radius_km)
+
+
+# ---------------- REQUEST PARSING ----------------
+class GeoQuery(namedtuple("GeoQuery", "radius_km nearest lat lon blood_bank_id")):
+    @property
+    def active(self):
+        """False for a plain city match."""
+        return self.radius_km is not None or self.nearest is not None
+
+
+def parse_geo_query(args):
+    """GeoQuery from ?radius_km=&nearest= and an optional lat/lon or blood_bank_id centre."""
+    def number(name, cast):
+        value = args.get(name)
+        if value in (None, ""):
+            return None
+        try:
+            return cast(value)
+        except ValueError:
+            raise GeoQueryError(f"{name} must be a number")
+
+    query = GeoQuery(
+        number("radius_km", float), number("nearest", int),
+        number("lat", float), number("lon", float),
+        number("blood_bank_id", int)
+    )
+    if query.radius_km is not None and not 0 < query.radius_km <= MAX_RADIUS_KM:
+        raise GeoQueryError(f"radius_km must be between 0 and {MAX_RADIUS_KM}")
+    if query.nearest is not None and not 0 < query.nearest <= 500:
+        raise GeoQueryError("nearest must be between 1 and 500")
+    if (query.lat is None) != (query.lon is None):
+        raise GeoQueryError("lat and lon must be given together")
+    if query.lat is not None and coordinates(query.lat, query.lon) is None:
+        raise GeoQueryError("lat/lon out of range")
+    return query
+
+
+def geo_center(query, request_data, bank=None):
+    """
+    Where to search from: explicit lat/lon, else the given blood bank,
+    else the requester's location. Raises GeoQueryError if none is known.
+    """
+    if query.lat is not None:
+        return query.lat, query.lon
+    source = bank if query.blood_bank_id is not None else request_data
+    point = coordinates(source["latitude"], source["longitude"]) if source else None
+    if point is None:
+        raise GeoQueryError(
+            "No coordinates to search from; pass lat and lon or a located blood_bank_id"
+        )
+    return point
+
+
+def location_from(data):
+    """(latitude, longitude) from a JSON body, both None if absent."""
+    latitude, longitude = data.get("latitude"), data.get("longitude")
+    if latitude is None and longitude is None:
+        return None, None
+    point = coordinates(latitude, longitude)
+    if point is None:
+        raise GeoQueryError("latitude and longitude must be given together and in range")
+    return point
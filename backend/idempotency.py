@@ -0,0 +1,226 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, jsonify, request
+
+import config
+from cache import RedisCache, response_cache
+
+MAX_KEY_LENGTH = 255
+REPLAY_HEADER = "Idempotent-Replayed"
+
+# begin() outcomes
+OWNER = "owner"        # first attempt: run the route, then complete() or release()
+REPLAY = "replay"      # finished earlier: send the stored response
+MISMATCH = "mismatch"  # key reused for a different request body
+BUSY = "busy"          # still running after the wait timeout
+
+
+class IdempotencyStore:
+    """
+    Responses of finished requests keyed by Idempotency-Key, kept for
+    `ttl` seconds and at most `max_entries`. A key being worked on is
+    marked in flight; duplicates wait on it and then replay its response.
+    Shared through Redis when the response cache uses it, otherwise per
+    process.
+    """
+
+    def __init__(self, ttl, max_entries, wait, backend=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait = wait
+        self._backend = backend
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"stored": 0, "replayed": 0, "waited": 0, "mismatched": 0, "busy": 0}
+
+    # ---------------- LIFECYCLE ----------------
+    def begin(self, key, fingerprint):
+        """(outcome, stored response or None) for a request carrying `key`."""
+        if self._backend is not None:
+            outcome, stored = self._begin_shared(key, fingerprint)
+        else:
+            outcome, stored = self._begin_local(key, fingerprint)
+        if outcome != OWNER:
+            self._count({REPLAY: "replayed", MISMATCH: "mismatched", BUSY: "busy"}[outcome])
+        return outcome, stored
+
+    def complete(self, key, fingerprint, stored):
+        self._count("stored")
+        if self._backend is not None:
+            self._backend.set(
+                "idem:" + key, {"fingerprint": fingerprint, "response": stored}, self.ttl
+            )
+            return
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return
+            entry["response"] = stored
+            entry["expires_at"] = time.monotonic() + self.ttl
+            self._data.move_to_end(key)
+            entry["done"].set()
+            self._evict()
+
+    def release(self, key):
+        """Forget an attempt that failed, so a retry runs the route again."""
+        if self._backend is not None:
+            self._backend.delete("idem:" + key)
+            return
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is not None:
+            entry["done"].set()
+
+    # ---------------- PER PROCESS ----------------
+    def _begin_local(self, key, fingerprint):
+        deadline = time.monotonic() + self.wait
+        waited = False
+        while True:
+            with self._lock:
+                entry = self._data.get(key)
+                if entry is not None and entry["expires_at"] <= time.monotonic():
+                    del self._data[key]
+                    entry = None
+                if entry is None:
+                    self._data[key] = {
+                        "fingerprint": fingerprint,
+                        "response": None,
+                        "done": threading.Event(),
+                        # In-flight entries are never evicted or expired early
+                        "expires_at": float("inf")
+                    }
+                    return OWNER, None
+                if entry["fingerprint"] != fingerprint:
+                    return MISMATCH, None
+                if entry["response"] is not None:
+                    return REPLAY, entry["response"]
+                done = entry["done"]
+
+            if not waited:
+                waited = True
+                self._count("waited")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not done.wait(remaining):
+                return BUSY, None
+
+    def _evict(self):
+        # Oldest finished entries first; in-flight ones have waiters
+        if len(self._data) <= self.max_entries:
+            return
+        for key in list(self._data):
+            if len(self._data) <= self.max_entries:
+                break
+            if self._data[key]["response"] is not None:
+                del self._data[key]
+
+    # ---------------- SHARED ----------------
+    def _begin_shared(self, key, fingerprint):
+        name = "idem:" + key
+        deadline = time.monotonic() + self.wait
+        waited = False
+        while True:
+            # The in-flight marker outlives the wait so a crashed worker's
+            # claim expires instead of blocking the key for the full TTL
+            if self._backend.add(name, {"fingerprint": fingerprint, "response": None},
+                                 self.wait + 30):
+                return OWNER, None
+            entry = self._backend.get(name)
+            if entry is not None:
+                if entry["fingerprint"] != fingerprint:
+                    return MISMATCH, None
+                if entry["response"] is not None:
+                    return REPLAY, entry["response"]
+            if not waited:
+                waited = True
+                self._count("waited")
+            if time.monotonic() >= deadline:
+                return BUSY, None
+            time.sleep(0.05)
+
+    # ---------------- STATS ----------------
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+            if self._backend is None:
+                stats["entries"] = len(self._data)
+                stats["in_flight"] = sum(
+                    1 for e in self._data.values() if e["response"] is None
+                )
+        stats.update({
+            "backend": "redis" if self._backend is not None else "memory",
+            "ttl": self.ttl,
+            "max_entries": self.max_entries
+        })
+        return stats
+
+
+idempotency_store = IdempotencyStore(
+    config.IDEMPOTENCY_TTL,
+    config.IDEMPOTENCY_MAX_KEYS,
+    config.IDEMPOTENCY_WAIT,
+    response_cache.backend if isinstance(response_cache.backend, RedisCache) else None
+)
+
+
+# ---------------- ROUTE DECORATOR ----------------
+def idempotent(fn):
+    """
+    Honour an Idempotency-Key header on a POST route; goes after
+    token_required, since keys are scoped per user. Responses below 500
+    are stored and replayed to retries with the same key and body; a
+    5xx or an exception frees the key for another attempt.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        client_key = request.headers.get("Idempotency-Key")
+        if not client_key:
+            return fn(*args, **kwargs)
+        if len(client_key) > MAX_KEY_LENGTH:
+            return jsonify({
+                "error": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"
+            }), 400
+
+        key = f"{request.user['user_id']}:{request.method} {request.path}:{client_key}"
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+
+        outcome, stored = idempotency_store.begin(key, fingerprint)
+        if outcome == REPLAY:
+            body, status, headers = stored
+            response = Response(body, status=status, headers=headers)
+            response.headers[REPLAY_HEADER] = "true"
+            return response
+        if outcome == MISMATCH:
+            return jsonify({
+                "error": "Idempotency-Key was already used for a different request"
+            }), 422
+        if outcome == BUSY:
+            return jsonify({
+                "error": "A request with this Idempotency-Key is still in progress"
+            }), 409, {"Retry-After": "1"}
+
+        try:
+            response = current_app.make_response(fn(*args, **kwargs))
+        except Exception:
+            idempotency_store.release(key)
+            raise
+
+        if response.status_code >= 500:
+            idempotency_store.release(key)
+        else:
+            headers = [
+                (name, value) for name, value in response.headers
+                if name not in ("Content-Length", "Set-Cookie")
+            ]
+            idempotency_store.complete(
+                key, fingerprint, (response.get_data(), response.status_code, headers)
+            )
+        return response
+    return wrapper
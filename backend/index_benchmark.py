@@ -0,0 +1,181 @@
+"""
+Before/after timings for the hot-query indexes (migration 0005):
+
+    python index_benchmark.py --database bloodlink_bench [--scale 1.0] [--json]
+
+Builds a scratch database at schema version 4, seeds it (about a million
+rows per large table at scale 1.0), times every hot query, applies 0005
+and times them again. The scratch database is dropped and recreated on
+every run, so it must not be the application database.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+from db import create_connection
+from migrate import migrate
+from query_log import plan_flags
+from queries import blood_banks_page, blood_requests_page, donations_page
+from seed_data import BLOOD_GROUPS, CITY_COUNT, city_name, recreate_database, seed
+
+INDEX_MIGRATION = 5
+
+
+# ---------------- HOT QUERIES ----------------
+# (name, query shape, params for a random draw) mirroring the SQL the
+# routes run; locking clauses are left out so runs do not block each other
+def hot_queries(layout):
+    def page(builder):
+        def build(rng):
+            query = builder(rng)
+            return query.sql, query.params
+        return build
+
+    return [
+        ("fefo_allocate", lambda rng: ("""
+            SELECT inventory_id, blood_bank_id, units_available, expiry_date
+            FROM blood_inventory
+            WHERE blood_group = %s
+              AND status = 'available'
+              AND expiry_date >= CURDATE()
+              AND units_available > 0
+            ORDER BY expiry_date ASC, inventory_id ASC
+            LIMIT 8
+        """, (rng.choice(BLOOD_GROUPS),))),
+        ("bank_stock", lambda rng: ("""
+            SELECT blood_group, SUM(units_available) AS total_units
+            FROM blood_inventory
+            WHERE blood_bank_id = %s
+              AND status = 'available'
+              AND expiry_date >= CURDATE()
+            GROUP BY blood_group
+        """, (rng.choice(layout.bank_ids),))),
+        ("expiry_sweep", lambda rng: ("""
+            SELECT inventory_id, blood_bank_id, blood_group, units_available
+            FROM blood_inventory
+            WHERE status = 'available'
+              AND expiry_date < CURDATE()
+            ORDER BY expiry_date ASC, inventory_id ASC
+            LIMIT 500
+        """, ())),
+        ("donor_match", lambda rng: ("""
+            SELECT d.donor_id, d.blood_group, u.full_name, u.phone
+            FROM donors d
+            JOIN users u ON d.user_id = u.user_id
+            WHERE u.city = %s
+              AND d.blood_group IN ('O-', 'O+')
+              AND d.eligible = 1
+        """, (city_name(rng.randrange(CITY_COUNT)),))),
+        ("my_blood_requests", page(lambda rng: blood_requests_page(
+            {}, user_id=rng.choice(layout.hospital_ids)))),
+        ("all_blood_requests", page(lambda rng: blood_requests_page({}))),
+        ("approved_requests", page(lambda rng: blood_requests_page(
+            {"status": "approved"}))),
+        ("my_donations", page(lambda rng: donations_page(
+            layout.donor_user_id(rng.choice(layout.donor_ids)), {}))),
+        ("banks_by_city", page(lambda rng: blood_banks_page(
+            {"city": city_name(rng.randrange(CITY_COUNT))}))),
+    ]
+
+
+# ---------------- MEASUREMENT ----------------
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(conn, layout, repeat, seed_value=7):
+    rng = random.Random(seed_value)
+    cursor = conn.cursor(dictionary=True)
+    results = {}
+    for name, build in hot_queries(layout):
+        sql, params = build(rng)
+        cursor.execute("EXPLAIN " + sql, params)
+        flags = plan_flags(cursor.fetchall())
+
+        for _ in range(2):  # warm the buffer pool
+            cursor.execute(sql, params)
+            cursor.fetchall()
+
+        timings = []
+        for _ in range(repeat):
+            sql, params = build(rng)
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        results[name] = {
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(percentile(timings, 0.95), 3),
+            "max_ms": round(max(timings), 3),
+            "flags": flags
+        }
+    cursor.close()
+    return results
+
+
+def report(before, after):
+    print(f"\n{'query':<20} {'before p50':>11} {'after p50':>10} {'speedup':>8}  "
+          f"{'before p95':>11} {'after p95':>10}  plan before -> after")
+    for name in before:
+        b, a = before[name], after[name]
+        speedup = b["p50_ms"] / a["p50_ms"] if a["p50_ms"] else float("inf")
+        plan = f"{'; '.join(b['flags']) or 'ok'} -> {'; '.join(a['flags']) or 'ok'}"
+        print(f"{name:<20} {b['p50_ms']:>9.2f}ms {a['p50_ms']:>8.2f}ms {speedup:>7.1f}x  "
+              f"{b['p95_ms']:>9.2f}ms {a['p95_ms']:>8.2f}ms  {plan}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database", required=True, help="scratch database name")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    log = (lambda *a: print(*a, file=sys.stderr)) if args.json else print
+
+    try:
+        recreate_database(args.database)
+    except ValueError as e:
+        print(e)
+        return 2
+
+    conn = create_connection(args.database)
+    try:
+        migrate(conn, target=INDEX_MIGRATION - 1, log=log)
+        layout = seed(conn, scale=args.scale, log=log)
+        cursor = conn.cursor()
+        cursor.execute("ANALYZE TABLE blood_inventory, donors, users, "
+                       "blood_requests, donation_history, blood_banks")
+        cursor.fetchall()
+        cursor.close()
+
+        log("measuring without the hot-query indexes")
+        before = measure(conn, layout, args.repeat)
+
+        migrate(conn, target=INDEX_MIGRATION, log=log)
+        log("measuring with the hot-query indexes")
+        after = measure(conn, layout, args.repeat)
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps({
+            "scale": args.scale,
+            "sizes": layout.sizes,
+            "repeat": args.repeat,
+            "before": before,
+            "after": after
+        }, indent=2))
+    else:
+        report(before, after)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
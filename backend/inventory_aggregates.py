@@ -0,0 +1,261 @@
+import datetime
+import threading
+import time
+
+from cache import response_cache
+from db import db_connection
+from stock_alerts import evaluate as evaluate_alerts
+
+EXPIRY_BATCH = 500
+
+# inventory_aggregates keeps two running sums per (blood bank, blood group):
+#   units_available - usable stock (status 'available'; lots past expiry
+#                     leave it when expire_lots() marks them 'expired'),
+#                     what GET /inventory/<bank_id> reports
+#   units_total     - units left across every lot, whatever its status,
+#                     what GET /inventory/summary has always reported
+
+
+# ---------------- WRITE PATHS ----------------
+def add_units(cursor, blood_bank_id, blood_group, units):
+    """A new lot entered stock."""
+    add_lots(cursor, [{
+        "blood_bank_id": blood_bank_id,
+        "blood_group": blood_group,
+        "units": units
+    }])
+
+
+def add_lots(cursor, lots, usable=True):
+    """
+    New lots entered stock; one upsert row per (bank, group). Lots that
+    are not `usable` (recorded already expired) add to units_total only.
+    """
+    deltas = {}
+    for lot in lots:
+        key = (lot["blood_bank_id"], lot["blood_group"])
+        deltas[key] = deltas.get(key, 0) + lot["units"]
+    if not deltas:
+        return
+
+    cursor.executemany("""
+        INSERT INTO inventory_aggregates
+        (blood_bank_id, blood_group, units_available, units_total)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            units_available = units_available + VALUES(units_available),
+            units_total = units_total + VALUES(units_total)
+    """, [
+        (bank, group, units if usable else 0, units)
+        for (bank, group), units in deltas.items()
+    ])
+    evaluate_alerts(cursor, deltas)
+
+
+def remove_units(cursor, lots, include_total):
+    """
+    Subtract lot-level changes. `lots` carry blood_bank_id, blood_group
+    and units; `include_total` is False when units leave usable stock
+    but stay in the lot (expiry).
+    """
+    deltas = {}
+    for lot in lots:
+        key = (lot["blood_bank_id"], lot["blood_group"])
+        deltas[key] = deltas.get(key, 0) + lot["units"]
+    if not deltas:
+        return
+
+    cursor.executemany(f"""
+        UPDATE inventory_aggregates
+        SET units_available = units_available - %s
+            {", units_total = units_total - %s" if include_total else ""}
+        WHERE blood_bank_id = %s AND blood_group = %s
+    """, [
+        (units, units, bank, group) if include_total else (units, bank, group)
+        for (bank, group), units in deltas.items()
+    ])
+    evaluate_alerts(cursor, deltas)
+
+
+def expire_lots(cursor, limit=EXPIRY_BATCH):
+    """
+    Mark up to `limit` past-expiry lots 'expired' and take their units out
+    of usable stock. Runs in the caller's transaction; returns the count.
+    """
+    cursor.execute("""
+        SELECT inventory_id, blood_bank_id, blood_group,
+               units_available AS units
+        FROM blood_inventory
+        WHERE status = 'available'
+          AND expiry_date < CURDATE()
+        ORDER BY expiry_date ASC, inventory_id ASC
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    """, (limit,))
+    lots = cursor.fetchall()
+    if not lots:
+        return 0
+
+    cursor.execute(f"""
+        UPDATE blood_inventory
+        SET status = 'expired'
+        WHERE inventory_id IN ({", ".join(["%s"] * len(lots))})
+    """, [lot["inventory_id"] for lot in lots])
+
+    remove_units(cursor, lots, include_total=False)
+    return len(lots)
+
+
+def sweep_expired(batch_size=EXPIRY_BATCH, pause=0):
+    """
+    Expire lots in small committed batches until none are left, so row
+    locks are held only briefly. Returns the number of lots expired.
+    """
+    total = 0
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        while True:
+            expired = expire_lots(cursor, batch_size)
+            conn.commit()
+            total += expired
+            if expired < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+        cursor.close()
+    if total:
+        response_cache.invalidate("inventory")
+    return total
+
+
+_expired_through = None
+_expiry_lock = threading.Lock()
+
+
+def ensure_expired():
+    """
+    Fallback for when the scheduler is off: run the expiry pass at most
+    once per day per process, on first read.
+    """
+    global _expired_through
+    today = datetime.date.today()
+    if _expired_through == today:
+        return
+    with _expiry_lock:
+        if _expired_through == today:
+            return
+        sweep_expired()
+        _expired_through = today
+
+
+# ---------------- READ PATHS ----------------
+BANK_INVENTORY_SQL = """
+    SELECT blood_group, units_available AS total_units
+    FROM inventory_aggregates
+    WHERE blood_bank_id = %s
+      AND units_available > 0
+    ORDER BY blood_group
+"""
+
+
+def read_bank_inventory(cursor, blood_bank_id):
+    cursor.execute(BANK_INVENTORY_SQL, (blood_bank_id,))
+    return cursor.fetchall()
+
+
+def read_summary(cursor):
+    cursor.execute("""
+        SELECT blood_group, SUM(units_total) AS total_units
+        FROM inventory_aggregates
+        GROUP BY blood_group
+        ORDER BY blood_group
+    """)
+    return cursor.fetchall()
+
+
+# ---------------- RECONCILIATION ----------------
+def reconcile(cursor, repair=True):
+    """
+    Recompute both sums from the raw lots (archived ones still count
+    towards units_total), report every (bank, group) that drifted and,
+    with `repair`, overwrite it with the true values. Usable stock is
+    status 'available' alone, as in the maintained sums. Taking past-expiry
+    lots out is left to expire_lots(); judging them here as well would let
+    the next sweep subtract them a second time.
+    """
+    # Lock the sums before reading the lots: a writer changes a lot first
+    # and its sum second, so the lot snapshot taken afterwards cannot hold
+    # a change whose sum is still pending
+    cursor.execute("""
+        SELECT blood_bank_id, blood_group, units_available, units_total
+        FROM inventory_aggregates
+        FOR UPDATE
+    """)
+    stored = {
+        (row["blood_bank_id"], row["blood_group"]): (
+            row["units_available"], row["units_total"]
+        )
+        for row in cursor.fetchall()
+    }
+
+    cursor.execute("""
+        SELECT blood_bank_id, blood_group,
+               SUM(usable) AS units_available,
+               SUM(units_available) AS units_total
+        FROM (
+            SELECT blood_bank_id, blood_group, units_available,
+                   CASE WHEN status = 'available'
+                        THEN units_available ELSE 0 END AS usable
+            FROM blood_inventory
+            UNION ALL
+            SELECT blood_bank_id, blood_group, units_available, 0
+            FROM blood_inventory_archive
+        ) lots
+        GROUP BY blood_bank_id, blood_group
+    """)
+    actual = {
+        (row["blood_bank_id"], row["blood_group"]): (
+            int(row["units_available"]), int(row["units_total"])
+        )
+        for row in cursor.fetchall()
+    }
+
+    drift = []
+    for key in sorted(set(actual) | set(stored), key=str):
+        expected = actual.get(key, (0, 0))
+        found = stored.get(key, (0, 0))
+        if expected != found:
+            drift.append({
+                "blood_bank_id": key[0],
+                "blood_group": key[1],
+                "expected": {"units_available": expected[0], "units_total": expected[1]},
+                "found": {"units_available": found[0], "units_total": found[1]}
+            })
+
+    if repair and drift:
+        cursor.executemany("""
+            INSERT INTO inventory_aggregates
+            (blood_bank_id, blood_group, units_available, units_total)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                units_available = VALUES(units_available),
+                units_total = VALUES(units_total)
+        """, [
+            (d["blood_bank_id"], d["blood_group"],
+             d["expected"]["units_available"], d["expected"]["units_total"])
+            for d in drift
+        ])
+
+    return drift
+
+
+def reconcile_inventory(repair=True):
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        drift = reconcile(cursor, repair=repair)
+        if repair:
+            # Also catches pairs whose thresholds changed in config
+            evaluate_alerts(cursor)
+        conn.commit()
+        cursor.close()
+    return drift
@@ -0,0 +1,88 @@
+import time
+
+from db import db_connection
+
+ARCHIVE_BATCH = 500
+ARCHIVE_COLUMNS = (
+    "inventory_id, blood_bank_id, blood_group, units_available, "
+    "collection_date, expiry_date, status"
+)
+
+
+def _candidates(cursor, limit):
+    """
+    Ids of archivable lots, read without locks so nothing is held on the
+    live lots FEFO allocation is locking. One indexed read per condition:
+    an OR of the two would walk the primary key.
+    """
+    cursor.execute("""
+        SELECT inventory_id
+        FROM blood_inventory
+        WHERE status = 'expired'
+        ORDER BY expiry_date, inventory_id
+        LIMIT %s
+    """, (limit,))
+    ids = [row["inventory_id"] for row in cursor.fetchall()]
+    if len(ids) < limit:
+        cursor.execute("""
+            SELECT inventory_id
+            FROM blood_inventory
+            WHERE units_available = 0
+            ORDER BY inventory_id
+            LIMIT %s
+        """, (limit,))
+        ids += [row["inventory_id"] for row in cursor.fetchall()]
+    return sorted(set(ids))[:limit]
+
+
+def archive_batch(cursor, limit=ARCHIVE_BATCH):
+    """
+    Move up to `limit` depleted or expired lots to blood_inventory_archive
+    in the caller's transaction. Aggregates are untouched: depleted lots
+    hold no units, and expired units were already taken out of usable
+    stock while units_total still counts them. Returns the count.
+    """
+    candidates = _candidates(cursor, limit)
+    if not candidates:
+        return 0
+
+    # Lock by primary key only, re-checking the condition: a lot may have
+    # changed since it was read, and lots held by a fulfill are skipped
+    cursor.execute(f"""
+        SELECT inventory_id
+        FROM blood_inventory
+        WHERE inventory_id IN ({", ".join(["%s"] * len(candidates))})
+          AND (status = 'expired' OR units_available = 0)
+        FOR UPDATE SKIP LOCKED
+    """, candidates)
+    ids = [row["inventory_id"] for row in cursor.fetchall()]
+    if not ids:
+        return 0
+
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(f"""
+        INSERT INTO blood_inventory_archive ({ARCHIVE_COLUMNS})
+        SELECT {ARCHIVE_COLUMNS}
+        FROM blood_inventory
+        WHERE inventory_id IN ({placeholders})
+    """, ids)
+    cursor.execute(f"""
+        DELETE FROM blood_inventory
+        WHERE inventory_id IN ({placeholders})
+    """, ids)
+    return len(ids)
+
+
+def archive_lots(batch_size=ARCHIVE_BATCH, pause=0.05):
+    total = 0
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        while True:
+            moved = archive_batch(cursor, batch_size)
+            conn.commit()
+            total += moved
+            if moved < batch_size:
+                break
+            time.sleep(pause)
+        cursor.close()
+    return total
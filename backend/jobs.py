@@ -0,0 +1,26 @@
+from eligibility import refresh_eligibility
+from inventory_aggregates import reconcile_inventory, sweep_expired
+from inventory_archive import archive_lots
+from scheduler import scheduler
+
+# ---------------- SCHEDULED JOBS ----------------
+
+
+@scheduler.every(300, name="expire_lots")
+def expire_lots_job():
+    return sweep_expired(batch_size=200, pause=0.05)
+
+
+@scheduler.every(3600, name="archive_lots")
+def archive_lots_job():
+    return archive_lots()
+
+
+@scheduler.every(600, name="refresh_eligibility")
+def refresh_eligibility_job():
+    return refresh_eligibility()
+
+
+@scheduler.every(86400, name="reconcile_inventory")
+def reconcile_inventory_job():
+    return len(reconcile_inventory(repair=True))
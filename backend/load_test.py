@@ -0,0 +1,379 @@
+"""
+Scenario load tests against the real routes:
+
+    python seed_data.py --database bloodlink_bench --scale 0.05
+    python load_test.py --database bloodlink_bench [--url http://localhost:5000]
+                        [--scenarios login_storm,match_polling] [--concurrency 16]
+                        [--duration 20] [--output run.json] [--compare base.json]
+
+Without --url the Flask app runs in-process (one test client per worker
+thread) against --database; with --url requests go over HTTP to a server
+that must itself be configured with that database. Results are JSON with
+throughput and p50/p95/p99 per endpoint, so two runs can be compared.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+
+import jwt
+
+# Load tests measure the routes, not background jobs; set before config loads
+os.environ.setdefault("SCHEDULER_ENABLED", "0")
+
+from db import create_connection  # noqa: E402
+from eligibility import ELIGIBLE_NOW  # noqa: E402
+from seed_data import SEED_PASSWORD  # noqa: E402
+
+SCENARIOS = ("login_storm", "match_polling", "donation_burst", "concurrent_fulfills")
+
+
+# ---------------- CLIENTS ----------------
+class InProcessClient:
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, token=None, body=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = self._client.open(path, method=method, json=body, headers=headers)
+        response.close()
+        return response.status_code
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self._base_url = base_url.rstrip("/")
+
+    def request(self, method, path, token=None, body=None):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(
+            self._base_url + path, data=data, headers=headers, method=method
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+
+# ---------------- RESULTS ----------------
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Recorder:
+    """Latencies and status codes per endpoint label, shared by all workers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(list)
+        self._statuses = defaultdict(Counter)
+
+    def record(self, label, status, seconds):
+        with self._lock:
+            self._latencies[label].append(seconds * 1000)
+            self._statuses[label][status] += 1
+
+    def summary(self, elapsed):
+        endpoints = {}
+        with self._lock:
+            for label, latencies in sorted(self._latencies.items()):
+                ordered = sorted(latencies)
+                statuses = self._statuses[label]
+                endpoints[label] = {
+                    "requests": len(ordered),
+                    "errors": sum(n for s, n in statuses.items() if s >= 500),
+                    "statuses": {str(s): n for s, n in sorted(statuses.items())},
+                    "throughput_rps": round(len(ordered) / elapsed, 2),
+                    "p50_ms": round(percentile(ordered, 0.50), 3),
+                    "p95_ms": round(percentile(ordered, 0.95), 3),
+                    "p99_ms": round(percentile(ordered, 0.99), 3),
+                    "max_ms": round(ordered[-1], 3)
+                }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "endpoints": endpoints
+        }
+
+
+# ---------------- FIXTURES ----------------
+class Fixtures:
+    """Ids and tokens drawn from the seeded database before a run."""
+
+    def __init__(self, conn, secret, pool_size=2000):
+        self.password = SEED_PASSWORD
+        cursor = conn.cursor(dictionary=True)
+
+        cursor.execute("""
+            SELECT email FROM users
+            WHERE role = 'donor' AND email LIKE %s
+            LIMIT %s
+        """, ("%@bench.bloodlink", pool_size))
+        self.login_emails = [r["email"] for r in cursor.fetchall()]
+
+        self.admin_tokens = self._staff_tokens(cursor, "admin", secret)
+        self.hospital_tokens = self._staff_tokens(cursor, "hospital", secret)
+
+        cursor.execute("""
+            SELECT request_id FROM blood_requests
+            WHERE urgency = 'emergency' AND status IN ('pending', 'approved')
+            LIMIT %s
+        """, (pool_size,))
+        self.emergency_request_ids = [r["request_id"] for r in cursor.fetchall()]
+
+        cursor.execute(f"""
+            SELECT u.user_id, u.email, u.role
+            FROM donors d
+            JOIN users u ON d.user_id = u.user_id
+            WHERE {ELIGIBLE_NOW}
+            LIMIT %s
+        """, (pool_size * 10,))
+        self.donor_tokens = [self._token(u, secret) for u in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT request_id FROM blood_requests
+            WHERE status = 'approved'
+            ORDER BY request_date
+            LIMIT %s
+        """, (pool_size,))
+        self.approved_request_ids = [r["request_id"] for r in cursor.fetchall()]
+
+        cursor.execute("SELECT blood_bank_id FROM blood_banks")
+        self.bank_ids = [r["blood_bank_id"] for r in cursor.fetchall()]
+        cursor.close()
+
+    @classmethod
+    def _staff_tokens(cls, cursor, role, secret, count=50):
+        cursor.execute("""
+            SELECT user_id, email, role FROM users
+            WHERE role = %s
+            LIMIT %s
+        """, (role, count))
+        return [cls._token(u, secret) for u in cursor.fetchall()]
+
+    @staticmethod
+    def _token(user, secret):
+        # Minted directly: setting up thousands of sessions through /login
+        # would benchmark bcrypt before the scenario even starts
+        return jwt.encode({
+            "user_id": user["user_id"],
+            "email": user["email"],
+            "role": user["role"],
+            "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=2)
+        }, secret, algorithm="HS256")
+
+
+class Pool:
+    """Thread-safe one-shot supply of ids; an exhausted pool ends the scenario."""
+
+    def __init__(self, items):
+        self._items = list(items)
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            return self._items.pop() if self._items else None
+
+
+# ---------------- SCENARIOS ----------------
+# Each returns a step(client, rng) -> (label, status) or None when its
+# supply of one-shot ids runs out
+def login_storm(fixtures):
+    def step(client, rng):
+        return "POST /login", client.request("POST", "/login", body={
+            "email": rng.choice(fixtures.login_emails),
+            "password": fixtures.password
+        })
+    return step
+
+
+def match_polling(fixtures):
+    tokens = fixtures.hospital_tokens + fixtures.admin_tokens
+
+    def step(client, rng):
+        request_id = rng.choice(fixtures.emergency_request_ids)
+        path = f"/blood-requests/{request_id}/match-donors"
+        label = "GET /blood-requests/<id>/match-donors"
+        if rng.random() < 0.5:
+            # Distance matching around a seeded bank's location
+            path += f"?nearest=25&blood_bank_id={rng.choice(fixtures.bank_ids)}"
+            label += "?nearest"
+        return label, client.request("GET", path, token=rng.choice(tokens))
+    return step
+
+
+def donation_burst(fixtures):
+    # A donor can give once per waiting period, so each token is used once
+    donors = Pool(fixtures.donor_tokens)
+
+    def step(client, rng):
+        token = donors.take()
+        if token is None:
+            return None
+        return "POST /donations", client.request("POST", "/donations", token=token, body={
+            "blood_bank_id": rng.choice(fixtures.bank_ids),
+            "quantity_units": 1,
+            "emergency": rng.random() < 0.1
+        })
+    return step
+
+
+def concurrent_fulfills(fixtures):
+    requests = Pool(fixtures.approved_request_ids)
+
+    def step(client, rng):
+        request_id = requests.take()
+        if request_id is None:
+            return None
+        return "POST /blood-requests/<id>/fulfill", client.request(
+            "POST", f"/blood-requests/{request_id}/fulfill",
+            token=rng.choice(fixtures.admin_tokens)
+        )
+    return step
+
+
+def run_scenario(step, make_client, concurrency, duration, seed):
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+
+    def worker(index):
+        client = make_client()
+        rng = random.Random(seed * 1000 + index)
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            outcome = step(client, rng)
+            if outcome is None:
+                return
+            label, status = outcome
+            recorder.record(label, status, time.perf_counter() - started)
+
+    started = time.monotonic()
+    threads = [
+        threading.Thread(target=worker, args=(i,), daemon=True)
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.summary(time.monotonic() - started)
+
+
+# ---------------- COMPARISON ----------------
+def compare(base, current):
+    """Per-endpoint throughput and p95 deltas against an earlier run."""
+    print(f"{'scenario / endpoint':<58} {'rps':>16} {'p95 ms':>20}")
+    for name, scenario in current["scenarios"].items():
+        old_scenario = base.get("scenarios", {}).get(name)
+        if not old_scenario:
+            continue
+        for label, now in scenario["endpoints"].items():
+            old = old_scenario["endpoints"].get(label)
+            if not old:
+                continue
+            print(f"{name + ' ' + label:<58} "
+                  f"{old['throughput_rps']:>7.1f} -> {now['throughput_rps']:<7.1f}"
+                  f"{old['p95_ms']:>9.1f} -> {now['p95_ms']:<9.1f}")
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BloodLink scenario load tests")
+    parser.add_argument("--database", required=True, help="seeded scratch database")
+    parser.add_argument("--url", help="running server; default runs the app in-process")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per scenario")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="earlier JSON results to diff against")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        print(f"unknown scenarios: {', '.join(sorted(unknown))}")
+        return 2
+    if args.database == os.getenv("database"):
+        print("refusing to load-test the application database")
+        return 2
+
+    # The in-process app's pool connects to the scratch database
+    os.environ["database"] = args.database
+
+    secret = os.getenv("SECRET_KEY", "dev-secret-key")
+    conn = create_connection(args.database)
+    try:
+        fixtures = Fixtures(conn, secret)
+    finally:
+        conn.close()
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)  # noqa: E731
+    else:
+        from app import app
+        make_client = lambda: InProcessClient(app)  # noqa: E731
+
+    scenarios = {
+        "login_storm": login_storm,
+        "match_polling": match_polling,
+        "donation_burst": donation_burst,
+        "concurrent_fulfills": concurrent_fulfills,
+    }
+    results = {
+        "revision": git_revision(),
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "target": args.url or "in-process",
+        "database": args.database,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "scenarios": {}
+    }
+    for name in names:
+        print(f"running {name}...", file=sys.stderr)
+        results["scenarios"][name] = run_scenario(
+            scenarios[name](fixtures), make_client,
+            args.concurrency, args.duration, args.seed
+        )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import json
+import threading
+from collections import deque
+
+from donor_index import donor_index
+
+HEARTBEAT_SECONDS = 15
+EVENT_BACKLOG = 64
+OPEN_STATUSES = ("pending", "approved")
+
+
+class MatchChannel:
+    """Shared match state for one emergency request, however many tabs watch it."""
+
+    def __init__(self, request_id, blood_group, city, status):
+        self.request_id = request_id
+        self.blood_group = blood_group
+        self.city = city
+        self.status = status
+        self.keys = donor_index.keys_for(city, blood_group)
+        self.donors = {}
+        self.version = 0
+        self.events = deque(maxlen=EVENT_BACKLOG)
+        self.subscribers = 0
+
+    @property
+    def closed(self):
+        return self.status not in OPEN_STATUSES
+
+    def snapshot(self):
+        return {
+            "request_id": self.request_id,
+            "status": self.status,
+            "matched_donors": list(self.donors.values())
+        }
+
+
+class MatchStreamHub:
+    """
+    Recomputes a channel once per donor-index change that touches its
+    (city, group) keys and fans the resulting delta out to every subscriber.
+    Per process: a status change made on another worker is not pushed, and
+    donor changes from other workers arrive only when the donor index is
+    rebuilt. A client that reconnects gets a snapshot with the status read
+    from MySQL.
+    """
+
+    def __init__(self, index):
+        self._index = index
+        self._cond = threading.Condition()
+        self._channels = {}
+        index.add_listener(self._on_index_change)
+
+    # ---------------- SUBSCRIPTION ----------------
+    def subscribe(self, request_id, blood_group, city, status):
+        with self._cond:
+            channel = self._channels.get(request_id)
+            if channel is None:
+                channel = MatchChannel(request_id, blood_group, city, status)
+                self._recompute(channel)
+                self._channels[request_id] = channel
+            elif channel.status != status:
+                # Changed on another worker since this channel was opened
+                channel.status = status
+                self._push(channel, "status", {"status": status})
+                self._cond.notify_all()
+            channel.subscribers += 1
+            return channel
+
+    def unsubscribe(self, channel):
+        with self._cond:
+            channel.subscribers -= 1
+            if channel.subscribers <= 0:
+                self._channels.pop(channel.request_id, None)
+
+    def snapshot(self, channel):
+        with self._cond:
+            return channel.version, channel.snapshot()
+
+    def wait(self, channel, version, timeout=HEARTBEAT_SECONDS):
+        """
+        Events after `version` as (version, name, payload) tuples, an empty
+        list on timeout, or None when the subscriber fell behind the backlog
+        and needs a fresh snapshot.
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: channel.version > version, timeout=timeout
+            )
+            if channel.version <= version:
+                return []
+            if not channel.events or channel.events[0][0] > version + 1:
+                return None
+            return [event for event in channel.events if event[0] > version]
+
+    # ---------------- CHANGES ----------------
+    def request_changed(self, request_id, status):
+        with self._cond:
+            channel = self._channels.get(request_id)
+            if channel is None or channel.status == status:
+                return
+            channel.status = status
+            self._push(channel, "status", {"status": status})
+            self._cond.notify_all()
+
+    def _on_index_change(self, keys):
+        with self._cond:
+            changed = False
+            for channel in self._channels.values():
+                if keys is None or channel.keys & keys:
+                    changed |= self._recompute(channel)
+            if changed:
+                self._cond.notify_all()
+
+    def _recompute(self, channel):
+        current = {
+            donor["donor_id"]: donor
+            for donor in self._index.match(channel.city, channel.blood_group)
+        }
+        added = [donor for donor_id, donor in current.items()
+                 if donor_id not in channel.donors]
+        removed = [donor_id for donor_id in channel.donors
+                   if donor_id not in current]
+        channel.donors = current
+        if not added and not removed:
+            return False
+        self._push(channel, "delta", {"added": added, "removed": removed})
+        return True
+
+    @staticmethod
+    def _push(channel, name, payload):
+        channel.version += 1
+        channel.events.append((channel.version, name, payload))
+
+
+def format_event(name, payload, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {name}")
+    lines.append(f"data: {json.dumps(payload, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def stream_matches(hub, channel):
+    """SSE generator: snapshot first, then deltas, heartbeats while idle."""
+    try:
+        version, snapshot = hub.snapshot(channel)
+        yield format_event("snapshot", snapshot, version)
+
+        while not channel.closed:
+            events = hub.wait(channel, version)
+            if events is None:
+                version, snapshot = hub.snapshot(channel)
+                yield format_event("snapshot", snapshot, version)
+                continue
+            if not events:
+                # Picks up changes made by other workers once the index ages out
+                try:
+                    donor_index.ensure_fresh()
+                except Exception:
+                    pass
+                yield ": heartbeat\n\n"
+                continue
+            for event_version, name, payload in events:
+                version = event_version
+                yield format_event(name, payload, event_version)
+    finally:
+        hub.unsubscribe(channel)
+
+
+match_hub = MatchStreamHub(donor_index)
@@ -0,0 +1,304 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+
+import config
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+# ---------------- PER-REQUEST DB STATS ----------------
+class QueryStats:
+    __slots__ = ("queries", "db_time", "rows", "profiler")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        # Per-statement hooks (query_log.RequestProfiler), only when profiling
+        self.profiler = None
+
+
+def current_query_stats():
+    """The running request's QueryStats, or None outside a request."""
+    if not has_request_context():
+        return None
+    return g.get("query_stats")
+
+
+class TimedCursor:
+    """
+    Delegates to a MySQL cursor, adding statement count, time spent in the
+    driver and rows fetched to the request's QueryStats.
+    """
+
+    def __init__(self, cursor, stats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._count_rows(1)
+            yield row
+
+    def _timed(self, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._stats.db_time += elapsed
+            if self._stats.profiler is not None:
+                self._stats.profiler.add_time(self, elapsed)
+
+    def _count_rows(self, count):
+        self._stats.rows += count
+        if self._stats.profiler is not None:
+            self._stats.profiler.add_rows(self, count)
+
+    def _begin(self, operation, params, many=False):
+        self._stats.queries += 1
+        if self._stats.profiler is not None:
+            self._stats.profiler.begin(self, operation, params, many)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._begin(operation, params)
+        return self._timed(self._cursor.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._begin(operation, seq_params, many=True)
+        return self._timed(self._cursor.executemany, operation, seq_params, *args, **kwargs)
+
+    def callproc(self, procname, *args, **kwargs):
+        self._begin(f"CALL {procname}", args[0] if args else None)
+        return self._timed(self._cursor.callproc, procname, *args, **kwargs)
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is not None:
+            self._count_rows(1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._timed(self._cursor.fetchmany, *args, **kwargs)
+        self._count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        self._count_rows(len(rows))
+        return rows
+
+    def close(self):
+        if self._stats.profiler is not None:
+            self._stats.profiler.end(self)
+        return self._cursor.close()
+
+
+def instrument_cursor(cursor):
+    stats = current_query_stats()
+    return TimedCursor(cursor, stats) if stats is not None else cursor
+
+
+# ---------------- AGGREGATES ----------------
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and three additions."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """Cumulative (le, count) pairs in Prometheus order."""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield _format_number(bound), cumulative
+        yield "+Inf", self.count
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "db_time", "queries", "rows", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.db_time = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.rows = 0
+        self.statuses = {}
+
+
+class RequestMetrics:
+    """
+    Per-(route, method) histograms and counters for the whole process.
+    Routes are labelled by their URL rule, not the raw path, so label
+    cardinality stays bounded by the number of routes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._in_flight = {}
+
+    def started(self, route, method):
+        key = (route, method)
+        with self._lock:
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+
+    def finished(self, route, method, status, duration, stats=None):
+        key = (route, method)
+        with self._lock:
+            self._in_flight[key] -= 1
+            metrics = self._routes.get(key)
+            if metrics is None:
+                metrics = self._routes[key] = RouteMetrics()
+            metrics.latency.observe(duration)
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            if stats is not None:
+                metrics.db_time.observe(stats.db_time)
+                metrics.queries.observe(stats.queries)
+                metrics.rows += stats.rows
+
+    def render(self, gauges=None, counters=None):
+        """
+        Prometheus text exposition (format 0.0.4). `gauges` and `counters`
+        map extra metric names to (help text, value).
+        """
+        with self._lock:
+            routes = sorted(self._routes.items())
+            in_flight = sorted(self._in_flight.items())
+            lines = []
+
+            _header(lines, "bloodlink_http_request_duration_seconds", "histogram",
+                    "Request latency by route")
+            for (route, method), m in routes:
+                _histogram(lines, "bloodlink_http_request_duration_seconds",
+                           m.latency, route=route, method=method)
+
+            _header(lines, "bloodlink_http_requests_total", "counter",
+                    "Responses by route and status code")
+            for (route, method), m in routes:
+                for status, count in sorted(m.statuses.items()):
+                    lines.append(_sample("bloodlink_http_requests_total", count,
+                                         route=route, method=method, status=status))
+
+            _header(lines, "bloodlink_http_requests_in_flight", "gauge",
+                    "Requests currently being served")
+            for (route, method), count in in_flight:
+                lines.append(_sample("bloodlink_http_requests_in_flight", count,
+                                     route=route, method=method))
+
+            _header(lines, "bloodlink_db_time_seconds", "histogram",
+                    "MySQL time per request")
+            for (route, method), m in routes:
+                if m.db_time.count:
+                    _histogram(lines, "bloodlink_db_time_seconds",
+                               m.db_time, route=route, method=method)
+
+            _header(lines, "bloodlink_db_queries_per_request", "histogram",
+                    "SQL statements per request")
+            for (route, method), m in routes:
+                if m.queries.count:
+                    _histogram(lines, "bloodlink_db_queries_per_request",
+                               m.queries, route=route, method=method)
+
+            _header(lines, "bloodlink_db_rows_total", "counter",
+                    "Rows fetched from MySQL")
+            for (route, method), m in routes:
+                if m.queries.count:
+                    lines.append(_sample("bloodlink_db_rows_total", m.rows,
+                                         route=route, method=method))
+
+        for kind, extra in (("gauge", gauges), ("counter", counters)):
+            for name, (help_text, value) in sorted((extra or {}).items()):
+                _header(lines, name, kind, help_text)
+                lines.append(_sample(name, value))
+
+        return "\n".join(lines) + "\n"
+
+
+# ---------------- EXPOSITION ----------------
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample(name, value, **labels):
+    if labels:
+        label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        return f"{name}{{{label_text}}} {_format_number(value)}"
+    return f"{name} {_format_number(value)}"
+
+
+def _header(lines, name, kind, help_text):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _histogram(lines, name, histogram, **labels):
+    for le, count in histogram.samples():
+        lines.append(_sample(f"{name}_bucket", count, **labels, le=le))
+    lines.append(_sample(f"{name}_sum", round(histogram.sum, 6), **labels))
+    lines.append(_sample(f"{name}_count", histogram.count, **labels))
+
+
+request_metrics = RequestMetrics()
+
+
+# ---------------- FLASK HOOKS ----------------
+def _route_label():
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+    g.query_stats = QueryStats()
+    g.metrics_key = (_route_label(), request.method)
+    request_metrics.started(*g.metrics_key)
+
+
+def _after_request(response):
+    g.response_status = response.status_code
+    return response
+
+
+def _teardown_request(exc=None):
+    # Runs after a streamed body is fully sent, so streams are timed end to end
+    key = g.pop("metrics_key", None)
+    if key is None:
+        return
+    request_metrics.finished(
+        key[0], key[1],
+        g.pop("response_status", 500),
+        time.perf_counter() - g.pop("request_started"),
+        g.pop("query_stats", None)
+    )
+
+
+def init_app(app):
+    if not config.METRICS_ENABLED:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
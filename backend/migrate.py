@@ -0,0 +1,185 @@
+"""
+Schema migrations:  python migrate.py [up [VERSION] | status | baseline VERSION]
+
+Migrations are database/migrations/NNNN_name.sql, applied in version
+order and recorded in schema_migrations with a checksum of the file.
+"""
+import datetime
+import hashlib
+import os
+import re
+import sys
+
+from db import create_connection
+
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "database", "migrations"
+)
+FILENAME = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+
+class MigrationError(Exception):
+    pass
+
+
+# ---------------- FILES ----------------
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, encoding="utf-8") as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+    def statements(self):
+        """Statements split on ';' at end of line; comment lines dropped."""
+        lines = [
+            line for line in self.sql.splitlines()
+            if not line.lstrip().startswith("--")
+        ]
+        return [
+            statement.strip()
+            for statement in re.split(r";\s*$", "\n".join(lines), flags=re.M)
+            if statement.strip()
+        ]
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = FILENAME.match(filename)
+        if match:
+            migrations.append(Migration(
+                int(match.group(1)), match.group(2), os.path.join(directory, filename)
+            ))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError("Two migration files share a version number")
+    return migrations
+
+
+# ---------------- STATE ----------------
+def ensure_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    ensure_table(cursor)
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return {version: checksum for version, checksum in cursor.fetchall()}
+
+
+def _record(cursor, migration):
+    cursor.execute("""
+        INSERT INTO schema_migrations (version, name, checksum)
+        VALUES (%s, %s, %s)
+    """, (migration.version, migration.name, migration.checksum))
+
+
+# ---------------- COMMANDS ----------------
+def migrate(conn, target=None, log=print):
+    """
+    Apply pending migrations up to `target` (default: all). MySQL commits
+    DDL implicitly, so a migration that fails half-way is not recorded and
+    must be fixed by hand before re-running. Returns applied versions.
+    """
+    cursor = conn.cursor()
+    applied = applied_versions(cursor)
+    done = []
+    for migration in load_migrations():
+        if target is not None and migration.version > target:
+            break
+        if migration.version in applied:
+            if applied[migration.version] != migration.checksum:
+                log(f"warning: {migration.version:04d}_{migration.name} "
+                    "changed after it was applied")
+            continue
+
+        log(f"applying {migration.version:04d}_{migration.name}")
+        started = datetime.datetime.now()
+        for statement in migration.statements():
+            try:
+                cursor.execute(statement)
+                if cursor.with_rows:
+                    cursor.fetchall()
+            except Exception as e:
+                conn.rollback()
+                raise MigrationError(
+                    f"{migration.version:04d}_{migration.name} failed: {e}"
+                ) from e
+        _record(cursor, migration)
+        conn.commit()
+        log(f"  done in {(datetime.datetime.now() - started).total_seconds():.1f}s")
+        done.append(migration.version)
+
+    cursor.close()
+    return done
+
+
+def baseline(conn, version):
+    """Record migrations up to `version` as applied without running them."""
+    cursor = conn.cursor()
+    applied = applied_versions(cursor)
+    marked = []
+    for migration in load_migrations():
+        if migration.version <= version and migration.version not in applied:
+            _record(cursor, migration)
+            marked.append(migration.version)
+    conn.commit()
+    cursor.close()
+    return marked
+
+
+def status(conn):
+    cursor = conn.cursor()
+    applied = applied_versions(cursor)
+    cursor.close()
+    return [
+        {
+            "version": m.version,
+            "name": m.name,
+            "applied": m.version in applied,
+            "modified": m.version in applied and applied[m.version] != m.checksum
+        }
+        for m in load_migrations()
+    ]
+
+
+def main(argv):
+    command = argv[0] if argv else "up"
+    conn = create_connection()
+    try:
+        if command == "up":
+            target = int(argv[1]) if len(argv) > 1 else None
+            applied = migrate(conn, target)
+            print(f"{len(applied)} migration(s) applied")
+        elif command == "status":
+            for row in status(conn):
+                state = "applied" if row["applied"] else "pending"
+                if row["modified"]:
+                    state += " (modified)"
+                print(f"{row['version']:04d}_{row['name']:<30} {state}")
+        elif command == "baseline" and len(argv) == 2:
+            marked = baseline(conn, int(argv[1]))
+            print(f"marked {len(marked)} migration(s) as applied")
+        else:
+            print(__doc__.strip())
+            return 2
+    except MigrationError as e:
+        print(f"error: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
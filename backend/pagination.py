@@ -0,0 +1,106 @@
+import base64
+import json
+
+from flask import jsonify, request
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+# ---------------- CURSORS ----------------
+def encode_cursor(values):
+    raw = json.dumps(values, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, size):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise InvalidCursorError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError("Invalid cursor")
+    return values
+
+
+# ---------------- QUERY BUILDING ----------------
+def page_args(key_size, default_order="desc", args=None):
+    """
+    limit, decoded cursor values (or None) and sort order from the query
+    string; `args` defaults to the current Flask request's.
+    """
+    args = request.args if args is None else args
+    try:
+        limit = int(args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    order = args.get("order", default_order).lower()
+    if order not in ("asc", "desc"):
+        raise InvalidCursorError("order must be asc or desc")
+
+    token = args.get("cursor")
+    values = decode_cursor(token, key_size + 1) if token else None
+    if values is not None:
+        # The cursor remembers the order it was issued for
+        if values[0] != order:
+            raise InvalidCursorError("cursor was issued for a different order")
+        values = values[1:]
+
+    return limit, values, order
+
+
+def keyset_condition(columns, values, order):
+    """Row-constructor comparison that resumes after `values` in `order`."""
+    op = "<" if order == "desc" else ">"
+    placeholders = ", ".join(["%s"] * len(columns))
+    return f"({', '.join(columns)}) {op} ({placeholders})", list(values)
+
+
+def filter_conditions(allowed, args=None):
+    """
+    WHERE fragments for the query-string filters in `allowed`,
+    a {param name: column} mapping.
+    """
+    args = request.args if args is None else args
+    clauses = []
+    params = []
+    for name, column in allowed.items():
+        value = args.get(name)
+        if value:
+            clauses.append(f"{column} = %s")
+            params.append(value)
+    return clauses, params
+
+
+def order_by(columns, order):
+    direction = "DESC" if order == "desc" else "ASC"
+    return ", ".join(f"{column} {direction}" for column in columns)
+
+
+# ---------------- RESPONSES ----------------
+def split_page(rows, page):
+    """
+    `rows` were fetched with LIMIT page.limit + 1; the extra row only tells
+    us there is a next page. Returns (rows, next cursor or None).
+    """
+    if len(rows) <= page.limit:
+        return rows, None
+    rows = rows[:page.limit]
+    return rows, encode_cursor([page.order] + list(page.key(rows[-1])))
+
+
+def page_response(rows, page):
+    """The body stays a plain list; the next-page token goes in X-Next-Cursor."""
+    rows, next_cursor = split_page(rows, page)
+
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
@@ -0,0 +1,136 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+import config
+from db import db_connection
+
+
+class HasherBusyError(Exception):
+    """Every hashing worker is busy and the queue is full."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated pool (bcrypt releases the GIL), so a
+    login storm occupies at most `workers` cores. At most `queue_depth`
+    more calls may wait; beyond that callers fail fast with HasherBusyError
+    instead of tying up request threads.
+    """
+
+    def __init__(self, rounds, workers, queue_depth):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="bcrypt"
+        )
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        self._lock = threading.Lock()
+        self._stats = {
+            op: {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "queue_ms": 0.0}
+            for op in ("hash", "verify")
+        }
+        self._rejected = 0
+        self._rehashed = 0
+
+    # ---------------- PUBLIC API ----------------
+    def hash(self, password):
+        hashed = self._run("hash", bcrypt.hashpw,
+                           password.encode("utf-8"), bcrypt.gensalt(self.rounds))
+        return hashed.decode("utf-8")
+
+    def verify(self, password, password_hash):
+        return self._run("verify", bcrypt.checkpw,
+                         password.encode("utf-8"), password_hash.encode("utf-8"))
+
+    def needs_rehash(self, password_hash):
+        # "$2b$12$..." -> cost 12
+        try:
+            return int(password_hash.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def rehash_in_background(self, user_id, password):
+        """Re-hash at the configured cost without delaying the login response."""
+        if not self._slots.acquire(blocking=False):
+            return
+
+        def task():
+            try:
+                hashed = bcrypt.hashpw(
+                    password.encode("utf-8"), bcrypt.gensalt(self.rounds)
+                ).decode("utf-8")
+                with db_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        "UPDATE users SET password_hash = %s WHERE user_id = %s",
+                        (hashed, user_id)
+                    )
+                    conn.commit()
+                    cursor.close()
+                with self._lock:
+                    self._rehashed += 1
+            except Exception:
+                pass
+            finally:
+                self._slots.release()
+
+        self._executor.submit(task)
+
+    def stats(self):
+        with self._lock:
+            ops = {}
+            for op, s in self._stats.items():
+                ops[op] = {
+                    "count": s["count"],
+                    "avg_ms": round(s["total_ms"] / s["count"], 3) if s["count"] else 0.0,
+                    "max_ms": round(s["max_ms"], 3),
+                    "avg_queue_ms": round(s["queue_ms"] / s["count"], 3) if s["count"] else 0.0
+                }
+            return {
+                "rounds": self.rounds,
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "rejected": self._rejected,
+                "rehashed": self._rehashed,
+                **ops
+            }
+
+    # ---------------- INTERNALS ----------------
+    def _run(self, op, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HasherBusyError("Too many password operations in progress")
+
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self._record(op, started - submitted, time.perf_counter() - started)
+
+        try:
+            return self._executor.submit(timed).result()
+        finally:
+            self._slots.release()
+
+    def _record(self, op, queued, elapsed):
+        with self._lock:
+            s = self._stats[op]
+            s["count"] += 1
+            s["total_ms"] += elapsed * 1000
+            s["max_ms"] = max(s["max_ms"], elapsed * 1000)
+            s["queue_ms"] += queued * 1000
+
+
+password_hasher = PasswordHasher(
+    config.BCRYPT_ROUNDS,
+    config.PASSWORD_HASH_WORKERS,
+    config.PASSWORD_HASH_QUEUE
+)
@@ -0,0 +1,109 @@
+from collections import namedtuple
+
+from pagination import filter_conditions, keyset_condition, order_by, page_args
+
+# SQL for the paginated list endpoints, shared by the Flask routes and the
+# ASGI handlers so both serve identical pages.
+
+PageQuery = namedtuple("PageQuery", "sql params limit order key")
+
+
+def _where(clauses):
+    return "WHERE " + " AND ".join(clauses) if clauses else ""
+
+
+def blood_banks_page(args=None):
+    limit, after, order = page_args(1, default_order="asc", args=args)
+    clauses, params = filter_conditions({"city": "bb.city"}, args)
+    if after:
+        condition, values = keyset_condition(["bb.blood_bank_id"], after, order)
+        clauses.append(condition)
+        params += values
+
+    sql = f"""
+        SELECT bb.*, u.full_name AS admin_name
+        FROM blood_banks bb
+        JOIN users u ON bb.admin_user_id = u.user_id
+        {_where(clauses)}
+        ORDER BY {order_by(["bb.blood_bank_id"], order)}
+        LIMIT %s
+    """
+    return PageQuery(
+        sql, params + [limit + 1], limit, order,
+        lambda b: [b["blood_bank_id"]]
+    )
+
+
+def blood_requests_page(args=None, user_id=None):
+    """All requests, or only `user_id`'s (without the user_id column)."""
+    limit, after, order = page_args(2, args=args)
+    clauses, params = filter_conditions({
+        "status": "status",
+        "urgency": "urgency",
+        "city": "city",
+        "blood_group": "blood_group"
+    }, args)
+    if user_id is not None:
+        clauses.insert(0, "user_id = %s")
+        params.insert(0, user_id)
+    if after:
+        condition, values = keyset_condition(
+            ["request_date", "request_id"], after, order
+        )
+        clauses.append(condition)
+        params += values
+
+    sql = f"""
+        SELECT request_id, {"" if user_id is not None else "user_id, "}blood_group,
+               quantity_units, urgency, city, status, request_date
+        FROM blood_requests
+        {_where(clauses)}
+        ORDER BY {order_by(["request_date", "request_id"], order)}
+        LIMIT %s
+    """
+    return PageQuery(
+        sql, params + [limit + 1], limit, order,
+        lambda r: [r["request_date"], r["request_id"]]
+    )
+
+
+def donations_page(user_id, args=None):
+    limit, after, order = page_args(2, args=args)
+    clauses, params = ["d.user_id = %s"], [user_id]
+    if after:
+        condition, values = keyset_condition(
+            ["dh.donation_date", "dh.donation_id"], after, order
+        )
+        clauses.append(condition)
+        params += values
+
+    sql = f"""
+        SELECT dh.donation_id, dh.donation_date, dh.quantity_units,
+               bb.name AS blood_bank_name, bb.city
+        FROM donation_history dh
+        JOIN donors d ON dh.donor_id = d.donor_id
+        JOIN blood_banks bb ON dh.blood_bank_id = bb.blood_bank_id
+        {_where(clauses)}
+        ORDER BY {order_by(["dh.donation_date", "dh.donation_id"], order)}
+        LIMIT %s
+    """
+    return PageQuery(
+        sql, params + [limit + 1], limit, order,
+        lambda h: [h["donation_date"], h["donation_id"]]
+    )
+
+
+# The requester's coordinates are the default centre for geo matching
+MATCH_REQUEST_SQL = """
+    SELECT br.blood_group, br.city, br.urgency, br.status,
+           u.latitude, u.longitude
+    FROM blood_requests br
+    LEFT JOIN users u ON br.user_id = u.user_id
+    WHERE br.request_id = %s
+"""
+
+BANK_LOCATION_SQL = """
+    SELECT latitude, longitude
+    FROM blood_banks
+    WHERE blood_bank_id = %s
+"""
@@ -0,0 +1,366 @@
+import datetime
+import logging
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from flask import current_app, g, request
+
+import config
+from metrics import QueryStats
+from tokens import AuthError, authenticate
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = "X-Query-Trace"
+EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+EXPLAIN_COOLDOWN = 600
+MAX_PARAM_LENGTH = 64
+MAX_TRACE_STATEMENTS = 500
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+# ---------------- STATEMENTS ----------------
+def _collapse(sql):
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def _loggable_params(sql, params, many):
+    """Bound parameters, shortened; anything next to a password is redacted."""
+    if params is None:
+        return None
+    if "password" in sql.lower():
+        return "[redacted]"
+    if many:
+        params = list(params)
+        return {"rows": len(params), "first": _loggable_params(sql, params[0], False)} \
+            if params else {"rows": 0}
+    if isinstance(params, dict):
+        return {k: _short(v) for k, v in params.items()}
+    return [_short(v) for v in params]
+
+
+def _short(value):
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, str) and len(value) > MAX_PARAM_LENGTH:
+        return value[:MAX_PARAM_LENGTH] + "..."
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+class Statement:
+    __slots__ = ("sql", "params", "many", "elapsed", "rows")
+
+    def __init__(self, sql, params, many):
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.elapsed = 0.0
+        self.rows = 0
+
+    def to_entry(self, route, method):
+        return {
+            "at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "route": route,
+            "method": method,
+            "duration_ms": round(self.elapsed * 1000, 3),
+            "rows": self.rows,
+            "sql": _collapse(self.sql),
+            "params": _loggable_params(self.sql, self.params, self.many),
+            "explain": None,
+            "flags": []
+        }
+
+
+# ---------------- EXPLAIN ----------------
+def _text(value):
+    return value.decode() if isinstance(value, (bytes, bytearray)) else value
+
+
+def plan_flags(plan):
+    """Warnings for an EXPLAIN result: full scans, filesorts, temp tables."""
+    flags = []
+    for row in plan:
+        table = row.get("table") or "?"
+        access = row.get("type")
+        extra = row.get("Extra") or ""
+        if access == "ALL":
+            flags.append(f"full table scan on {table} (~{row.get('rows')} rows)")
+        elif access == "index":
+            flags.append(f"full index scan on {table}")
+        if "Using filesort" in extra:
+            flags.append(f"filesort on {table}")
+        if "Using temporary" in extra:
+            flags.append(f"temporary table for {table}")
+    return flags
+
+
+class Explainer:
+    """
+    Runs EXPLAIN for slow statements on a background thread and its own
+    pooled connection, so the slow request is not made slower. A plan is
+    reused for EXPLAIN_COOLDOWN seconds per statement text, and work beyond
+    the queue bound is dropped.
+    """
+
+    def __init__(self, queue_size=100):
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.dropped = 0
+
+    def submit(self, entry, sql, params, lock):
+        if entry["sql"].split(" ", 1)[0].upper() not in EXPLAINABLE:
+            return
+
+        with self._lock:
+            cached = self._plans.get(entry["sql"])
+        if cached and time.monotonic() - cached[0] < EXPLAIN_COOLDOWN:
+            with lock:
+                entry["explain"], entry["flags"] = cached[1], cached[2]
+            return
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((entry, sql, params, lock))
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="explain", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        # Imported here: db imports metrics, which must not need the pool
+        from db import db_connection
+
+        while True:
+            entry, sql, params, lock = self._queue.get()
+            try:
+                with db_connection() as conn:
+                    cursor = conn.cursor(dictionary=True)
+                    cursor.execute("EXPLAIN " + sql, params)
+                    plan = [
+                        {k: _text(v) for k, v in row.items()}
+                        for row in cursor.fetchall()
+                    ]
+                    cursor.close()
+            except Exception as e:
+                plan, flags = None, [f"EXPLAIN failed: {e}"]
+            else:
+                flags = plan_flags(plan)
+                with self._lock:
+                    self._plans[entry["sql"]] = (time.monotonic(), plan, flags)
+                    while len(self._plans) > 256:
+                        self._plans.popitem(last=False)
+
+            with lock:
+                entry["explain"], entry["flags"] = plan, flags
+            if flags:
+                logger.warning("Slow query plan for %s: %s", entry["route"], "; ".join(flags))
+
+
+# ---------------- SLOW QUERY LOG ----------------
+class SlowQueryLog:
+    """The last `size` statements slower than the threshold, newest last."""
+
+    def __init__(self, threshold_ms, size):
+        self.threshold_ms = threshold_ms
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.explainer = Explainer()
+
+    @property
+    def enabled(self):
+        return self.threshold_ms > 0
+
+    def record(self, statement, route, method):
+        entry = statement.to_entry(route, method)
+        logger.warning(
+            "Slow query %.1f ms on %s %s (%s rows): %s params=%r",
+            entry["duration_ms"], method, route, entry["rows"],
+            entry["sql"], entry["params"]
+        )
+        with self._lock:
+            self._entries.append(entry)
+        if not statement.many:
+            self.explainer.submit(entry, statement.sql, statement.params, self._lock)
+
+    def entries(self):
+        with self._lock:
+            return [dict(e) for e in reversed(self._entries)]
+
+    def stats(self):
+        return {
+            "threshold_ms": self.threshold_ms,
+            "explains_dropped": self.explainer.dropped,
+            "entries": self.entries()
+        }
+
+
+class TraceStore:
+    """Recently captured per-request traces, by trace id."""
+
+    def __init__(self, size):
+        self._size = size
+        self._traces = OrderedDict()
+        # Also guards statement entries the explainer fills in later
+        self.lock = threading.Lock()
+
+    def put(self, trace_id, trace):
+        with self.lock:
+            self._traces[trace_id] = trace
+            while len(self._traces) > self._size:
+                self._traces.popitem(last=False)
+
+    def get(self, trace_id):
+        with self.lock:
+            trace = self._traces.get(trace_id)
+            if trace is None:
+                return None
+            return dict(trace, statements=[dict(s) for s in trace["statements"]])
+
+
+slow_query_log = SlowQueryLog(config.SLOW_QUERY_MS, config.SLOW_QUERY_LOG_SIZE)
+trace_store = TraceStore(config.QUERY_TRACES_KEPT)
+
+
+# ---------------- PER-REQUEST PROFILER ----------------
+class RequestProfiler:
+    """
+    Follows each statement from execute() through its fetches, so the
+    recorded time and row count cover the whole result, not just the
+    round trip that sent the query.
+    """
+
+    def __init__(self, route, method, threshold, trace=None, explain=False):
+        self.route = route
+        self.method = method
+        self.threshold = threshold
+        self.trace = trace
+        self.explain = explain
+        self._open = {}
+
+    def begin(self, cursor, sql, params, many):
+        self.end(cursor)
+        self._open[id(cursor)] = (cursor, Statement(sql, params, many))
+
+    def add_time(self, cursor, seconds):
+        item = self._open.get(id(cursor))
+        if item is not None:
+            item[1].elapsed += seconds
+
+    def add_rows(self, cursor, count):
+        item = self._open.get(id(cursor))
+        if item is not None:
+            item[1].rows += count
+
+    def end(self, cursor):
+        item = self._open.pop(id(cursor), None)
+        if item is None:
+            return
+        cursor, statement = item
+        if statement.rows == 0:
+            # Writes: affected rows
+            rowcount = getattr(cursor, "rowcount", -1)
+            statement.rows = rowcount if rowcount and rowcount > 0 else 0
+
+        if self.threshold and statement.elapsed * 1000 >= self.threshold:
+            slow_query_log.record(statement, self.route, self.method)
+
+        if self.trace is not None and len(self.trace) < MAX_TRACE_STATEMENTS:
+            entry = statement.to_entry(self.route, self.method)
+            self.trace.append(entry)
+            if self.explain and not statement.many:
+                slow_query_log.explainer.submit(
+                    entry, statement.sql, statement.params, trace_store.lock
+                )
+
+    def finish(self):
+        for cursor, _ in list(self._open.values()):
+            self.end(cursor)
+
+
+# ---------------- FLASK HOOKS ----------------
+def _trace_mode():
+    """'on' or 'explain' when an admin asked for a trace of this request."""
+    mode = request.headers.get(TRACE_HEADER, "").lower()
+    if mode not in ("1", "on", "explain"):
+        return None
+    try:
+        claims, _ = authenticate(
+            request.headers.get("Authorization"), current_app.config["SECRET_KEY"]
+        )
+    except AuthError:
+        return None
+    return mode if claims["role"] == "admin" else None
+
+
+def _before_request():
+    mode = _trace_mode()
+    if not slow_query_log.enabled and mode is None:
+        return
+
+    stats = g.get("query_stats")
+    if stats is None:
+        stats = g.query_stats = QueryStats()
+
+    rule = request.url_rule
+    stats.profiler = RequestProfiler(
+        rule.rule if rule is not None else "unmatched",
+        request.method,
+        slow_query_log.threshold_ms,
+        trace=[] if mode else None,
+        explain=mode == "explain"
+    )
+    if mode:
+        g.trace_id = uuid.uuid4().hex
+        g.trace_started = time.perf_counter()
+
+
+def _after_request(response):
+    trace_id = g.get("trace_id")
+    if trace_id:
+        response.headers["X-Query-Trace-Id"] = trace_id
+    return response
+
+
+def _teardown_request(exc=None):
+    stats = g.get("query_stats")
+    if stats is None or stats.profiler is None:
+        return
+    profiler = stats.profiler
+    profiler.finish()
+    stats.profiler = None
+
+    trace_id = g.pop("trace_id", None)
+    if trace_id:
+        trace_store.put(trace_id, {
+            "trace_id": trace_id,
+            "route": profiler.route,
+            "method": profiler.method,
+            "path": request.full_path,
+            "duration_ms": round((time.perf_counter() - g.pop("trace_started")) * 1000, 3),
+            "queries": stats.queries,
+            "db_time_ms": round(stats.db_time * 1000, 3),
+            "rows": stats.rows,
+            "statements": profiler.trace
+        })
+
+
+def init_app(app):
+    """Register after metrics.init_app, so both share the request's QueryStats."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,18 @@
+# ---------------- DONOR REWARDS ----------------
+BASE_POINTS = 100
+EMERGENCY_BONUS = 100
+
+BADGES = {
+    1: "First Drop",
+    3: "Lifesaver",
+    10: "Elite Donor",
+}
+
+
+def donation_points(emergency):
+    return BASE_POINTS + (EMERGENCY_BONUS if emergency else 0)
+
+
+def badge_for(total_donations):
+    """Badge unlocked by reaching exactly `total_donations`, if any."""
+    return BADGES.get(total_donations)
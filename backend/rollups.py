@@ -0,0 +1,382 @@
+"""
+Hourly and daily analytics rollups (see migration 0009):
+
+    python rollups.py backfill                      # whole history
+    python rollups.py rebuild --from 2025-01-01 [--to 2025-02-01]
+
+The write routes keep the rollups current; these commands recompute a
+window from donation_history, blood_requests and fulfillment_lines,
+replacing what is there. Run them over closed periods: writes landing in the window while
+it is rebuilt can be counted twice or not at all.
+"""
+import argparse
+import datetime
+import sys
+
+from db import create_connection
+
+MEASURES = (
+    "donations", "units_in", "units_out", "requests_normal",
+    "requests_emergency", "fulfilled", "fulfill_seconds"
+)
+GRANULARITIES = ("hour", "day")
+# Longest range one query may span; a year of days is 365 buckets per group
+MAX_RANGE_DAYS = {"hour": 92, "day": 3660}
+REBUILD_WINDOW_DAYS = 31
+
+
+class RollupQueryError(ValueError):
+    pass
+
+
+def bucket_start(at, granularity):
+    if granularity == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    return datetime.datetime.combine(at.date(), datetime.time())
+
+
+# ---------------- WRITE PATHS ----------------
+# An event is a dict with `at` (datetime), `blood_group`, optional
+# `blood_bank_id` and `city`, and any of MEASURES. Bank events without a
+# city get their bank's. Rows are kept per bank (city '') and per city
+# (blood_bank_id 0; city '' for events without one). Network totals are
+# summed from the city rows when read, so concurrent writes in different
+# cities never wait on a shared row.
+def _rows(events):
+    rows = {}
+    for event in events:
+        scopes = [(0, event.get("city") or "")]
+        if event.get("blood_bank_id"):
+            scopes.append((event["blood_bank_id"], ""))
+        for granularity in GRANULARITIES:
+            start = bucket_start(event["at"], granularity)
+            for bank, city in scopes:
+                key = (granularity, bank, city, start, event["blood_group"])
+                totals = rows.setdefault(key, dict.fromkeys(MEASURES, 0))
+                for name in MEASURES:
+                    totals[name] += event.get(name, 0)
+    # Primary key order, so concurrent writers lock rows in the same order
+    return [key + tuple(totals[name] for name in MEASURES)
+            for key, totals in sorted(rows.items())]
+
+
+def _bank_cities(cursor, events):
+    bank_ids = sorted({
+        e["blood_bank_id"] for e in events
+        if e.get("blood_bank_id") and not e.get("city")
+    })
+    if not bank_ids:
+        return
+    cursor.execute(f"""
+        SELECT blood_bank_id, city
+        FROM blood_banks
+        WHERE blood_bank_id IN ({", ".join(["%s"] * len(bank_ids))})
+    """, bank_ids)
+    cities = {row["blood_bank_id"]: row["city"] for row in cursor.fetchall()}
+    for event in events:
+        if event.get("blood_bank_id") and not event.get("city"):
+            event["city"] = cities.get(event["blood_bank_id"])
+
+
+def record(cursor, events):
+    """
+    Add `events` to the rollups in the caller's transaction; returns rows
+    touched. Call it as the transaction's last statement, so the row locks
+    it takes are held only until the commit.
+    """
+    if not events:
+        return 0
+    _bank_cities(cursor, events)
+    rows = _rows(events)
+    cursor.executemany(f"""
+        INSERT INTO analytics_rollups
+        (granularity, blood_bank_id, city, bucket_start, blood_group,
+         {", ".join(MEASURES)})
+        VALUES ({", ".join(["%s"] * (5 + len(MEASURES)))})
+        ON DUPLICATE KEY UPDATE
+            {", ".join(f"{m} = {m} + VALUES({m})" for m in MEASURES)}
+    """, rows)
+    return len(rows)
+
+
+def donation_event(at, blood_bank_id, blood_group, units):
+    return {
+        "at": at,
+        "blood_bank_id": blood_bank_id,
+        "blood_group": blood_group,
+        "donations": 1,
+        "units_in": units
+    }
+
+
+def request_event(at, city, blood_group, urgency):
+    key = "requests_emergency" if urgency == "emergency" else "requests_normal"
+    return {"at": at, "city": city, "blood_group": blood_group, key: 1}
+
+
+def fulfilled_event(at, request):
+    """
+    `request` has city, blood_group and request_date. Counted in the
+    requester's city; the units it took are units_out_event()s.
+    """
+    return {
+        "at": at,
+        "city": request["city"],
+        "blood_group": request["blood_group"],
+        "fulfilled": 1,
+        "fulfill_seconds": max(0, int((at - request["request_date"]).total_seconds()))
+    }
+
+
+def units_out_event(at, line):
+    """Units one fulfillment line took from its bank, counted in the bank's city."""
+    return {
+        "at": at,
+        "blood_bank_id": line["blood_bank_id"],
+        "blood_group": line["blood_group"],
+        "units_out": line["units"]
+    }
+
+
+# ---------------- RE-AGGREGATION ----------------
+def _hour(row):
+    return datetime.datetime.combine(row["day"], datetime.time(row["hour"]))
+
+
+def _raw_events(cursor, start, end):
+    """Events for [start, end) recomputed from the source tables."""
+    events = []
+
+    # Donations only have a date; rebuilt hourly rows land at midnight
+    cursor.execute("""
+        SELECT dh.donation_date, dh.blood_bank_id, bb.city, d.blood_group,
+               COUNT(*) AS donations, SUM(dh.quantity_units) AS units_in
+        FROM donation_history dh
+        JOIN donors d ON d.donor_id = dh.donor_id
+        JOIN blood_banks bb ON bb.blood_bank_id = dh.blood_bank_id
+        WHERE dh.donation_date >= %s AND dh.donation_date < %s
+        GROUP BY dh.donation_date, dh.blood_bank_id, bb.city, d.blood_group
+    """, (start.date(), end.date()))
+    for row in cursor.fetchall():
+        events.append({
+            "at": datetime.datetime.combine(row["donation_date"], datetime.time()),
+            "blood_bank_id": row["blood_bank_id"],
+            "city": row["city"],
+            "blood_group": row["blood_group"],
+            "donations": int(row["donations"]),
+            "units_in": int(row["units_in"])
+        })
+
+    cursor.execute("""
+        SELECT DATE(request_date) AS day, HOUR(request_date) AS hour,
+               city, blood_group,
+               SUM(urgency = 'emergency') AS requests_emergency,
+               SUM(urgency <> 'emergency') AS requests_normal
+        FROM blood_requests
+        WHERE request_date >= %s AND request_date < %s
+        GROUP BY day, hour, city, blood_group
+    """, (start, end))
+    for row in cursor.fetchall():
+        events.append({
+            "at": _hour(row),
+            "city": row["city"],
+            "blood_group": row["blood_group"],
+            "requests_emergency": int(row["requests_emergency"]),
+            "requests_normal": int(row["requests_normal"])
+        })
+
+    # Requests fulfilled before fulfillment_lines existed have no lines;
+    # their units stay with the requester's city, as they were recorded
+    cursor.execute("""
+        SELECT DATE(br.fulfilled_at) AS day, HOUR(br.fulfilled_at) AS hour,
+               br.city, br.blood_group,
+               COUNT(*) AS fulfilled,
+               SUM(CASE WHEN EXISTS (
+                       SELECT 1 FROM fulfillment_lines fl
+                       WHERE fl.request_id = br.request_id
+                   ) THEN 0 ELSE br.quantity_units END) AS units_out,
+               SUM(GREATEST(0, TIMESTAMPDIFF(SECOND, br.request_date, br.fulfilled_at)))
+                   AS fulfill_seconds
+        FROM blood_requests br
+        WHERE br.fulfilled_at >= %s AND br.fulfilled_at < %s
+        GROUP BY day, hour, br.city, br.blood_group
+    """, (start, end))
+    for row in cursor.fetchall():
+        events.append({
+            "at": _hour(row),
+            "city": row["city"],
+            "blood_group": row["blood_group"],
+            "fulfilled": int(row["fulfilled"]),
+            "units_out": int(row["units_out"]),
+            "fulfill_seconds": int(row["fulfill_seconds"])
+        })
+
+    cursor.execute("""
+        SELECT DATE(fl.fulfilled_at) AS day, HOUR(fl.fulfilled_at) AS hour,
+               fl.blood_bank_id, bb.city, fl.blood_group,
+               SUM(fl.units) AS units_out
+        FROM fulfillment_lines fl
+        JOIN blood_banks bb ON bb.blood_bank_id = fl.blood_bank_id
+        WHERE fl.fulfilled_at >= %s AND fl.fulfilled_at < %s
+        GROUP BY day, hour, fl.blood_bank_id, bb.city, fl.blood_group
+    """, (start, end))
+    for row in cursor.fetchall():
+        events.append({
+            "at": _hour(row),
+            "blood_bank_id": row["blood_bank_id"],
+            "city": row["city"],
+            "blood_group": row["blood_group"],
+            "units_out": int(row["units_out"])
+        })
+    return events
+
+
+def rebuild(conn, start, end, log=print):
+    """
+    Replace the rollups for days [start, end) with values recomputed from
+    the source tables, one committed window of REBUILD_WINDOW_DAYS at a
+    time. Returns the number of rollup rows written.
+    """
+    cursor = conn.cursor(dictionary=True)
+    written = 0
+    window_start = datetime.datetime.combine(start, datetime.time())
+    final = datetime.datetime.combine(end, datetime.time())
+    while window_start < final:
+        window_end = min(window_start + datetime.timedelta(days=REBUILD_WINDOW_DAYS), final)
+        cursor.execute("""
+            DELETE FROM analytics_rollups
+            WHERE bucket_start >= %s AND bucket_start < %s
+        """, (window_start, window_end))
+        rows = record(cursor, _raw_events(cursor, window_start, window_end))
+        conn.commit()
+        written += rows
+        log(f"  {window_start.date()} .. {window_end.date()}: {rows} rows")
+        window_start = window_end
+    cursor.close()
+    return written
+
+
+def history_start(conn):
+    """Earliest day with a donation or request, or None for an empty database."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT LEAST(
+            COALESCE((SELECT MIN(donation_date) FROM donation_history), CURDATE()),
+            COALESCE((SELECT DATE(MIN(request_date)) FROM blood_requests), CURDATE())
+        )
+    """)
+    (earliest,) = cursor.fetchone()
+    cursor.close()
+    return earliest
+
+
+# ---------------- READ PATH ----------------
+def _day(value, name):
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise RollupQueryError(f"{name} must be YYYY-MM-DD")
+
+
+def parse_range_query(args):
+    """Validated filters for query_series() from the query string."""
+    granularity = args.get("granularity", "day")
+    if granularity not in GRANULARITIES:
+        raise RollupQueryError("granularity must be hour or day")
+
+    end = _day(args["to"], "to") if args.get("to") else datetime.date.today()
+    start = (_day(args["from"], "from") if args.get("from")
+             else end - datetime.timedelta(days=29))
+    if start > end:
+        raise RollupQueryError("from must not be after to")
+    if (end - start).days >= MAX_RANGE_DAYS[granularity]:
+        raise RollupQueryError(
+            f"{granularity} rollups span at most {MAX_RANGE_DAYS[granularity]} days"
+        )
+
+    try:
+        blood_bank_id = int(args.get("blood_bank_id") or 0)
+    except ValueError:
+        raise RollupQueryError("blood_bank_id must be an integer")
+    city = (args.get("city") or "").strip()
+    if blood_bank_id and city:
+        raise RollupQueryError("Filter by blood_bank_id or city, not both")
+
+    return {
+        "granularity": granularity,
+        "from": start,
+        "to": end,
+        "blood_bank_id": blood_bank_id,
+        "city": city,
+        "blood_group": args.get("blood_group") or None
+    }
+
+
+def query_series(cursor, query):
+    """One point per non-empty bucket in [from, to], oldest first."""
+    params = [query["granularity"], query["blood_bank_id"]]
+    scope = "granularity = %s AND blood_bank_id = %s"
+    if query["blood_bank_id"] or query["city"]:
+        scope += " AND city = %s"
+        params.append(query["city"])
+    # else the whole network: every city row, summed below
+    params += [
+        datetime.datetime.combine(query["from"], datetime.time()),
+        datetime.datetime.combine(query["to"] + datetime.timedelta(days=1), datetime.time())
+    ]
+    group_filter = ""
+    if query["blood_group"]:
+        group_filter = "AND blood_group = %s"
+        params.append(query["blood_group"])
+
+    cursor.execute(f"""
+        SELECT bucket_start,
+               {", ".join(f"SUM({m}) AS {m}" for m in MEASURES)}
+        FROM analytics_rollups
+        WHERE {scope}
+          AND bucket_start >= %s AND bucket_start < %s
+          {group_filter}
+        GROUP BY bucket_start
+        ORDER BY bucket_start
+    """, params)
+
+    series = []
+    for row in cursor.fetchall():
+        point = {"bucket": row["bucket_start"].isoformat()}
+        for name in MEASURES:
+            point[name] = int(row[name])
+        seconds = point.pop("fulfill_seconds")
+        point["avg_fulfill_hours"] = (
+            round(seconds / point["fulfilled"] / 3600, 2) if point["fulfilled"] else None
+        )
+        series.append(point)
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analytics rollup maintenance")
+    parser.add_argument("command", choices=["backfill", "rebuild"])
+    parser.add_argument("--from", dest="start", type=datetime.date.fromisoformat)
+    parser.add_argument("--to", dest="end", type=datetime.date.fromisoformat,
+                        help="exclusive; default tomorrow")
+    args = parser.parse_args()
+
+    conn = create_connection()
+    try:
+        end = args.end or datetime.date.today() + datetime.timedelta(days=1)
+        if args.command == "backfill":
+            start = history_start(conn)
+        elif args.start is None:
+            print("rebuild needs --from")
+            return 2
+        else:
+            start = args.start
+        written = rebuild(conn, start, end)
+    finally:
+        conn.close()
+    print(f"{written} rollup rows written for {start} .. {end}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+
+from db import create_connection
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = "bloodlink_scheduler"
+
+
+class Job:
+    def __init__(self, name, interval, fn):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.next_run = 0.0
+        self.runs = 0
+        self.failures = 0
+        self.last_result = None
+        self.last_error = None
+        self.last_duration_ms = None
+
+    def status(self):
+        return {
+            "name": self.name,
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "last_duration_ms": self.last_duration_ms
+        }
+
+
+class Scheduler:
+    """
+    Runs periodic jobs in a daemon thread. Every worker process starts
+    one, but only the holder of the MySQL named lock LOCK_NAME (taken with
+    GET_LOCK on a dedicated connection) runs jobs; if that worker dies its
+    connection closes, the lock frees and another worker takes over.
+    """
+
+    def __init__(self, lock_name=LOCK_NAME, tick=1.0):
+        self.lock_name = lock_name
+        self.tick = tick
+        self._jobs = []
+        self._lock_conn = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def every(self, seconds, name=None):
+        def decorator(fn):
+            self._jobs.append(Job(name or fn.__name__, seconds, fn))
+            return fn
+        return decorator
+
+    # ---------------- LIFECYCLE ----------------
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="bloodlink-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._release_leadership()
+
+    @property
+    def is_leader(self):
+        return self._lock_conn is not None
+
+    def status(self):
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "leader": self.is_leader,
+            "jobs": [job.status() for job in self._jobs]
+        }
+
+    # ---------------- LEADER ELECTION ----------------
+    def _ensure_leadership(self):
+        if self._lock_conn is not None:
+            try:
+                self._lock_conn.ping(reconnect=False)
+                return True
+            except Exception:
+                logger.warning("Scheduler lost its lock connection")
+                self._release_leadership()
+
+        conn = None
+        try:
+            conn = create_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT GET_LOCK(%s, 0)", (self.lock_name,))
+            acquired = cursor.fetchone()[0] == 1
+            cursor.close()
+        except Exception as e:
+            logger.warning("Scheduler could not reach the database: %s", e)
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            return False
+
+        if acquired:
+            self._lock_conn = conn
+            logger.info("Scheduler leadership acquired")
+        else:
+            conn.close()
+        return acquired
+
+    def _release_leadership(self):
+        conn, self._lock_conn = self._lock_conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    # ---------------- LOOP ----------------
+    def _loop(self):
+        while not self._stop.is_set():
+            if self._ensure_leadership():
+                now = time.monotonic()
+                for job in self._jobs:
+                    if now >= job.next_run:
+                        self._run(job)
+                        job.next_run = time.monotonic() + job.interval
+            self._stop.wait(self.tick if self.is_leader else self.tick * 10)
+
+    def _run(self, job):
+        started = time.perf_counter()
+        try:
+            job.last_result = job.fn()
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            logger.exception("Scheduled job %s failed", job.name)
+        finally:
+            job.runs += 1
+            job.last_duration_ms = round((time.perf_counter() - started) * 1000, 3)
+
+
+scheduler = Scheduler()
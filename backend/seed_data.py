@@ -0,0 +1,295 @@
+"""
+Deterministic synthetic data for benchmarks and load tests:
+
+    python seed_data.py --database bloodlink_bench [--scale 0.05] [--seed 42]
+
+Recreates the given database, migrates it and fills it. Never point this
+at a database holding real data.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+
+import bcrypt
+
+import config
+from db import create_connection
+from inventory_aggregates import reconcile
+from migrate import migrate
+from rollups import history_start, rebuild
+from stock_alerts import evaluate as evaluate_alerts
+
+BLOOD_GROUPS = ["O+", "A+", "B+", "AB+", "O-", "A-", "B-", "AB-"]
+BLOOD_GROUP_WEIGHTS = [37, 28, 20, 5, 4, 3, 2, 1]
+CITY_COUNT = 40
+INSERT_BATCH = 5000
+
+# Every seeded account logs in with this password
+SEED_PASSWORD = "benchmark"
+
+# Row counts at scale 1.0; blood_inventory and donation_history are the
+# million-row tables
+BASE_SIZES = {
+    "blood_banks": 200,
+    "hospitals": 1000,
+    "donors": 200000,
+    "blood_requests": 500000,
+    "blood_inventory": 1000000,
+    "donation_history": 1000000,
+}
+
+
+def sizes_for(scale):
+    return {name: max(1, int(count * scale)) for name, count in BASE_SIZES.items()}
+
+
+def city_name(index):
+    return f"City {index:02d}"
+
+
+def city_center(index):
+    # Fixed pseudo-random spots spread over roughly 8-30N, 70-90E
+    rng = random.Random(index)
+    return rng.uniform(8, 30), rng.uniform(70, 90)
+
+
+def _near(rng, center, spread=0.25):
+    return (round(center[0] + rng.uniform(-spread, spread), 6),
+            round(center[1] + rng.uniform(-spread, spread), 6))
+
+
+def _has_column(cursor, table, column):
+    cursor.execute(f"SHOW COLUMNS FROM {table} LIKE %s", (column,))
+    return bool(cursor.fetchall())
+
+
+class SeedLayout:
+    """Id ranges of a seeded dataset, for picking realistic parameters."""
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.admin_ids = range(1, sizes["blood_banks"] + 1)
+        self.hospital_ids = range(
+            self.admin_ids.stop, self.admin_ids.stop + sizes["hospitals"]
+        )
+        self.donor_user_ids = range(
+            self.hospital_ids.stop, self.hospital_ids.stop + sizes["donors"]
+        )
+        self.bank_ids = range(1, sizes["blood_banks"] + 1)
+        self.donor_ids = range(1, sizes["donors"] + 1)
+
+    def email(self, user_id):
+        return f"user{user_id}@bench.bloodlink"
+
+    def donor_user_id(self, donor_id):
+        return self.donor_user_ids.start + donor_id - 1
+
+
+# ---------------- GENERATION ----------------
+def _cities(rng, count):
+    # Skewed, like real populations: a few big cities hold most users
+    weights = [1.0 / (i + 1) for i in range(CITY_COUNT)]
+    return rng.choices(range(CITY_COUNT), weights, k=count)
+
+
+def _insert(cursor, table, columns, rows, log):
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    batch = []
+    total = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == INSERT_BATCH:
+            cursor.executemany(sql, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        total += len(batch)
+    log(f"  {table}: {total} rows")
+
+
+def seed(conn, scale=1.0, seed=42, log=print):
+    """Fill an empty, migrated database. Returns the SeedLayout."""
+    rng = random.Random(seed)
+    sizes = sizes_for(scale)
+    layout = SeedLayout(sizes)
+    today = datetime.date.today()
+    # The configured cost, so logins against seeded users cost what real ones do
+    password_hash = bcrypt.hashpw(
+        SEED_PASSWORD.encode("utf-8"), bcrypt.gensalt(config.BCRYPT_ROUNDS)
+    ).decode("utf-8")
+    cursor = conn.cursor(dictionary=True)
+    # Bulk-load speed; everything is checked by the generator instead
+    cursor.execute("SET foreign_key_checks = 0, unique_checks = 0")
+
+    log(f"seeding at scale {scale}")
+    users = []
+    for user_id in layout.admin_ids:
+        users.append((user_id, "admin"))
+    for user_id in layout.hospital_ids:
+        users.append((user_id, "hospital"))
+    for user_id in layout.donor_user_ids:
+        users.append((user_id, "donor"))
+    # Coordinates once the geo migration is in; most users share theirs
+    geo = _has_column(cursor, "users", "latitude")
+    geo_columns = ["latitude", "longitude"] if geo else []
+
+    def located(city, share=0.7):
+        if not geo:
+            return ()
+        return _near(rng, city_center(city)) if rng.random() < share else (None, None)
+
+    cities = _cities(rng, len(users))
+    _insert(cursor, "users",
+            ["user_id", "full_name", "email", "password_hash", "role", "phone", "city"]
+            + geo_columns,
+            ((user_id, f"Bench User {user_id}", layout.email(user_id), password_hash,
+              role, f"9{user_id:09d}", city_name(cities[i])) + located(cities[i])
+             for i, (user_id, role) in enumerate(users)),
+            log)
+
+    _insert(cursor, "blood_banks",
+            ["blood_bank_id", "name", "city", "address", "contact_number", "admin_user_id"]
+            + geo_columns,
+            ((bank_id, f"Bench Bank {bank_id}", city_name(bank_id % CITY_COUNT),
+              f"{bank_id} Main Road", f"8{bank_id:09d}", layout.admin_ids[bank_id - 1])
+             + located(bank_id % CITY_COUNT, share=1.0)
+             for bank_id in layout.bank_ids),
+            log)
+
+    scored = _has_column(cursor, "donors", "emergency_donations")
+
+    def donor_rows():
+        for donor_id in layout.donor_ids:
+            last = None
+            if rng.random() < 0.6:
+                last = today - datetime.timedelta(days=rng.randint(1, 720))
+            eligible_from = last + datetime.timedelta(days=42) if last else None
+            total = rng.randint(0, 30)
+            row = (
+                donor_id, layout.donor_user_id(donor_id),
+                rng.choices(BLOOD_GROUPS, BLOOD_GROUP_WEIGHTS)[0],
+                int(eligible_from is None or eligible_from <= today),
+                last, eligible_from, total, rng.randint(0, 600)
+            )
+            yield row + ((rng.randint(0, total),) if scored else ())
+    _insert(cursor, "donors",
+            ["donor_id", "user_id", "blood_group", "eligible", "last_donation_date",
+             "eligible_from", "total_donations", "points"]
+            + (["emergency_donations"] if scored else []),
+            donor_rows(), log)
+
+    def inventory_rows():
+        for inventory_id in range(1, sizes["blood_inventory"] + 1):
+            collected = today - datetime.timedelta(days=rng.randint(0, 120))
+            expiry = collected + datetime.timedelta(days=42)
+            units = rng.choice([0, 1, 1, 2, 2, 3, 4, 5])
+            status = "expired" if expiry < today and rng.random() < 0.8 else "available"
+            yield (
+                inventory_id, rng.choice(layout.bank_ids),
+                rng.choices(BLOOD_GROUPS, BLOOD_GROUP_WEIGHTS)[0],
+                units, collected, expiry, status
+            )
+    _insert(cursor, "blood_inventory",
+            ["inventory_id", "blood_bank_id", "blood_group", "units_available",
+             "collection_date", "expiry_date", "status"],
+            inventory_rows(), log)
+
+    timed = _has_column(cursor, "blood_requests", "fulfilled_at")
+
+    def request_rows():
+        for request_id in range(1, sizes["blood_requests"] + 1):
+            requested = datetime.datetime.combine(
+                today - datetime.timedelta(days=rng.randint(0, 365)),
+                datetime.time(rng.randint(0, 23), rng.randint(0, 59))
+            )
+            status = rng.choices(["pending", "approved", "rejected", "fulfilled"],
+                                 [15, 10, 10, 65])[0]
+            row = (
+                request_id, rng.choice(layout.hospital_ids),
+                rng.choices(BLOOD_GROUPS, BLOOD_GROUP_WEIGHTS)[0],
+                rng.randint(1, 6),
+                "emergency" if rng.random() < 0.15 else "normal",
+                city_name(rng.randrange(CITY_COUNT)),
+                status, requested
+            )
+            if timed:
+                fulfilled_at = None
+                if status == "fulfilled":
+                    fulfilled_at = max(requested, min(
+                        requested + datetime.timedelta(minutes=rng.randint(10, 4320)),
+                        datetime.datetime.now().replace(microsecond=0)
+                    ))
+                row += (fulfilled_at,)
+            yield row
+    _insert(cursor, "blood_requests",
+            ["request_id", "user_id", "blood_group", "quantity_units", "urgency",
+             "city", "status", "request_date"]
+            + (["fulfilled_at"] if timed else []),
+            request_rows(), log)
+
+    _insert(cursor, "donation_history",
+            ["donation_id", "donor_id", "blood_bank_id", "donation_date", "quantity_units"],
+            ((donation_id, rng.choice(layout.donor_ids), rng.choice(layout.bank_ids),
+              today - datetime.timedelta(days=rng.randint(0, 730)), rng.randint(1, 2))
+             for donation_id in range(1, sizes["donation_history"] + 1)),
+            log)
+
+    cursor.execute("SET foreign_key_checks = 1, unique_checks = 1")
+    reconcile(cursor, repair=True)
+    conn.commit()
+    cursor.close()
+    return layout
+
+
+# ---------------- SCRATCH DATABASES ----------------
+def recreate_database(name):
+    """Drop and create `name`; refuses the application database."""
+    if name == os.getenv("database"):
+        raise ValueError("refusing to recreate the application database")
+    server = create_connection()
+    cursor = server.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+    cursor.execute(f"CREATE DATABASE `{name}`")
+    cursor.close()
+    server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a scratch database")
+    parser.add_argument("--database", required=True, help="scratch database name")
+    parser.add_argument("--scale", type=float, default=0.05,
+                        help="1.0 is about a million inventory lots and donations")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    try:
+        recreate_database(args.database)
+    except ValueError as e:
+        print(e)
+        return 2
+
+    conn = create_connection(args.database)
+    try:
+        migrate(conn)
+        layout = seed(conn, scale=args.scale, seed=args.seed)
+        print("aggregating analytics rollups")
+        rebuild(conn, history_start(conn),
+                datetime.date.today() + datetime.timedelta(days=1))
+        cursor = conn.cursor(dictionary=True)
+        evaluate_alerts(cursor)
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+    print(f"seeded {args.database}: {layout.sizes}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
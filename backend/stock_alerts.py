@@ -0,0 +1,158 @@
+import datetime
+
+import config
+
+# ---------------- STOCK ALERTS ----------------
+# Evaluated for the (bank, group) pairs an inventory change touched, right
+# after inventory_aggregates is updated and in the same transaction; the
+# aggregate row lock serialises evaluations of the same pair. Hysteresis:
+# an alert is raised at units <= low_water and only cleared at
+# units >= high_water, so a level hovering around one threshold does not
+# flap.
+
+
+class ThresholdError(ValueError):
+    pass
+
+
+def _pairs_clause(keys):
+    return (
+        "(ia.blood_bank_id, ia.blood_group) IN "
+        f"({', '.join(['(%s, %s)'] * len(keys))})"
+    ), [value for key in keys for value in key]
+
+
+def evaluate(cursor, keys=None):
+    """
+    Raise, update or clear alerts for the given (bank, group) pairs, or for
+    every pair when `keys` is None. The statements are written to be right
+    whatever stock_alerts currently holds, so no locking read of it is
+    needed: a pair at or below low_water is upserted, one at or above
+    high_water is moved to the history if present, and anything between
+    only refreshes an alert that is already raised. Returns the number of
+    pairs evaluated.
+    """
+    where, params = "", []
+    if keys is not None:
+        keys = sorted(set(keys))
+        if not keys:
+            return 0
+        where, params = _pairs_clause(keys)
+        where = "WHERE " + where
+
+    cursor.execute(f"""
+        SELECT ia.blood_bank_id, ia.blood_group, ia.units_available,
+               COALESCE(st.low_water, %s) AS low_water,
+               COALESCE(st.high_water, %s) AS high_water
+        FROM inventory_aggregates ia
+        LEFT JOIN stock_thresholds st
+               ON st.blood_bank_id = ia.blood_bank_id
+              AND st.blood_group = ia.blood_group
+        {where}
+        ORDER BY ia.blood_bank_id, ia.blood_group
+    """, [config.CRITICAL_STOCK_UNITS, config.LOW_STOCK_UNITS] + params)
+    rows = cursor.fetchall()
+
+    now = datetime.datetime.now().replace(microsecond=0)
+    low, recovered, between = [], [], []
+    for row in rows:
+        key = (row["blood_bank_id"], row["blood_group"])
+        units = row["units_available"]
+        levels = (row["low_water"], row["high_water"])
+        if units <= row["low_water"]:
+            low.append(key + (units, units) + levels + (now,))
+        elif units >= row["high_water"]:
+            recovered.append(key)
+        else:
+            between.append((units, units) + levels + key)
+
+    if low:
+        cursor.executemany("""
+            INSERT INTO stock_alerts
+            (blood_bank_id, blood_group, units_available, lowest_units,
+             low_water, high_water, raised_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                units_available = VALUES(units_available),
+                lowest_units = LEAST(lowest_units, VALUES(lowest_units)),
+                low_water = VALUES(low_water),
+                high_water = VALUES(high_water)
+        """, low)
+    if between:
+        cursor.executemany("""
+            UPDATE stock_alerts
+            SET units_available = %s,
+                lowest_units = LEAST(lowest_units, %s),
+                low_water = %s,
+                high_water = %s
+            WHERE blood_bank_id = %s AND blood_group = %s
+        """, between)
+    if recovered:
+        cursor.executemany("""
+            INSERT INTO stock_alert_history
+            (blood_bank_id, blood_group, lowest_units, raised_at, cleared_at)
+            SELECT blood_bank_id, blood_group, lowest_units, raised_at, %s
+            FROM stock_alerts
+            WHERE blood_bank_id = %s AND blood_group = %s
+        """, [(now,) + key for key in recovered])
+        cursor.executemany("""
+            DELETE FROM stock_alerts
+            WHERE blood_bank_id = %s AND blood_group = %s
+        """, recovered)
+
+    return len(rows)
+
+
+# ---------------- READS ----------------
+def active_alerts(cursor, blood_bank_id=None, blood_group=None):
+    """Raised alerts, lowest stock first; reads only the active-alert table."""
+    clauses, params = [], []
+    if blood_bank_id is not None:
+        clauses.append("sa.blood_bank_id = %s")
+        params.append(blood_bank_id)
+    if blood_group:
+        clauses.append("sa.blood_group = %s")
+        params.append(blood_group)
+
+    cursor.execute(f"""
+        SELECT sa.blood_bank_id, bb.name AS blood_bank_name, bb.city,
+               sa.blood_group, sa.units_available, sa.lowest_units,
+               sa.low_water, sa.high_water, sa.raised_at
+        FROM stock_alerts sa
+        JOIN blood_banks bb ON bb.blood_bank_id = sa.blood_bank_id
+        {"WHERE " + " AND ".join(clauses) if clauses else ""}
+        ORDER BY sa.units_available, sa.raised_at
+    """, params)
+    return cursor.fetchall()
+
+
+# ---------------- THRESHOLDS ----------------
+def parse_threshold(data):
+    """(blood_bank_id, blood_group, low_water, high_water) from a JSON body."""
+    try:
+        blood_bank_id = int(data.get("blood_bank_id"))
+        low_water = int(data.get("low_water"))
+        high_water = int(data.get("high_water"))
+    except (TypeError, ValueError):
+        raise ThresholdError(
+            "blood_bank_id, low_water and high_water must be integers"
+        )
+    blood_group = data.get("blood_group")
+    if not blood_group:
+        raise ThresholdError("blood_group is required")
+    if not 0 <= low_water < high_water:
+        raise ThresholdError("Need 0 <= low_water < high_water")
+    return blood_bank_id, blood_group, low_water, high_water
+
+
+def set_threshold(cursor, blood_bank_id, blood_group, low_water, high_water):
+    """Store a pair's thresholds and re-evaluate it under the new levels."""
+    cursor.execute("""
+        INSERT INTO stock_thresholds
+        (blood_bank_id, blood_group, low_water, high_water)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            low_water = VALUES(low_water),
+            high_water = VALUES(high_water)
+    """, (blood_bank_id, blood_group, low_water, high_water))
+    return evaluate(cursor, [(blood_bank_id, blood_group)])
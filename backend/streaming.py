@@ -0,0 +1,102 @@
+import csv
+import io
+import itertools
+
+from flask import Response, json, stream_with_context
+
+from db import get_pool
+
+CHUNK_SIZE = 500
+FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class UnsupportedFormatError(ValueError):
+    pass
+
+
+# ---------------- ROW SOURCE ----------------
+def iter_row_chunks(sql, params=(), chunk_size=CHUNK_SIZE):
+    """
+    Yield lists of at most `chunk_size` rows from an unbuffered cursor, so
+    MySQL streams the result instead of the driver loading it all.
+    Uses its own pooled connection; if the client goes away mid-stream the
+    connection is dropped rather than drained.
+    """
+    conn = get_pool().checkout()
+    finished = False
+    try:
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+        cursor.close()
+        finished = True
+    finally:
+        if finished:
+            conn.close()
+        else:
+            conn.invalidate()
+
+
+# ---------------- ENCODERS ----------------
+def _json_array(chunks):
+    yield "["
+    first = True
+    for rows in chunks:
+        body = ",".join(json.dumps(row) for row in rows)
+        yield body if first else "," + body
+        first = False
+    yield "]"
+
+
+def _ndjson(chunks):
+    for rows in chunks:
+        yield "".join(json.dumps(row) + "\n" for row in rows)
+
+
+def _csv(chunks):
+    buffer = io.StringIO()
+    writer = None
+    for rows in chunks:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+_ENCODERS = {"json": _json_array, "ndjson": _ndjson, "csv": _csv}
+
+
+def stream_query(sql, params=(), fmt="json", filename=None):
+    """Response that streams a query result as a JSON array, NDJSON or CSV."""
+    if fmt not in FORMATS:
+        raise UnsupportedFormatError(
+            f"format must be one of: {', '.join(FORMATS)}"
+        )
+
+    headers = {"X-Accel-Buffering": "no"}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+
+    chunks = iter_row_chunks(sql, params)
+    # Run the query before the response starts, so SQL errors are still a 500
+    first = next(chunks, None)
+    if first is not None:
+        chunks = itertools.chain([first], chunks)
+
+    body = _ENCODERS[fmt](chunks)
+    return Response(
+        stream_with_context(body),
+        mimetype=FORMATS[fmt],
+        headers=headers
+    )
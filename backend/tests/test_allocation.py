@@ -0,0 +1,157 @@
+import datetime
+
+import mysql.connector
+import pytest
+from mysql.connector import errorcode
+
+import allocation
+from allocation import InsufficientStockError, run_with_retries
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, **kwargs):
+        return FakeCursor()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeCursor:
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(allocation.time, "sleep", lambda seconds: None)
+
+
+def failing(*errors):
+    """work() that raises each of `errors` in turn, then returns "done"."""
+    errors = list(errors)
+
+    def work(cursor):
+        if errors:
+            raise errors.pop(0)
+        return "done"
+    return work
+
+
+def test_lock_conflicts_and_contention_are_counted_apart():
+    conn = FakeConnection()
+    work = failing(
+        mysql.connector.Error(errno=errorcode.ER_LOCK_DEADLOCK),
+        InsufficientStockError(5, 8, contended=True),
+        mysql.connector.Error(errno=errorcode.ER_LOCK_WAIT_TIMEOUT),
+    )
+    before = allocation.allocation_stats()
+
+    result, stats = run_with_retries(conn, work)
+
+    after = allocation.allocation_stats()
+    assert result == "done"
+    assert stats == {"attempts": 4, "retries": 3, "lock_conflicts": 2, "stock_contention": 1}
+    assert after["lock_conflicts"] - before["lock_conflicts"] == 2
+    assert after["stock_contention"] - before["stock_contention"] == 1
+    assert conn.rollbacks == 3 and conn.commits == 1
+
+
+def test_real_shortage_is_not_retried():
+    conn = FakeConnection()
+    with pytest.raises(InsufficientStockError):
+        run_with_retries(conn, failing(InsufficientStockError(5, 2)))
+    assert conn.rollbacks == 1
+
+
+def test_other_mysql_errors_are_not_retried():
+    conn = FakeConnection()
+    with pytest.raises(mysql.connector.Error):
+        run_with_retries(conn, failing(mysql.connector.Error(errno=errorcode.ER_DUP_ENTRY)))
+    assert conn.rollbacks == 1
+
+
+def test_retries_stop_at_max():
+    conn = FakeConnection()
+    deadlock = mysql.connector.Error(errno=errorcode.ER_LOCK_DEADLOCK)
+    with pytest.raises(mysql.connector.Error):
+        run_with_retries(conn, failing(*[deadlock] * 5), max_retries=2)
+    assert conn.rollbacks == 3
+
+
+# ---------------- BATCH PLANNING ----------------
+def lot(inventory_id, units, blood_group="O+", bank=1):
+    return {
+        "inventory_id": inventory_id, "blood_bank_id": bank,
+        "blood_group": blood_group, "units_available": units
+    }
+
+
+def req(request_id, units, urgency="normal", day=1, blood_group="O+"):
+    return {
+        "request_id": request_id, "blood_group": blood_group,
+        "quantity_units": units, "urgency": urgency,
+        "request_date": datetime.datetime(2026, 1, day)
+    }
+
+
+def by_id(outcomes):
+    return {o["request_id"]: o for o in outcomes}
+
+
+def test_lots_are_used_in_the_given_fefo_order():
+    outcomes, deductions = allocation.plan_batch([req(1, 5)], [lot(10, 3), lot(11, 4)])
+
+    assert by_id(outcomes)[1]["allocation"] == [
+        {"inventory_id": 10, "blood_bank_id": 1, "units": 3},
+        {"inventory_id": 11, "blood_bank_id": 1, "units": 2},
+    ]
+    assert sorted((d["inventory_id"], d["units"]) for d in deductions) == [(10, 3), (11, 2)]
+
+
+def test_emergencies_go_first_then_oldest():
+    requests = [req(1, 4, day=1), req(2, 4, urgency="emergency", day=3), req(3, 4, day=2)]
+
+    outcomes = by_id(allocation.plan_batch(requests, [lot(10, 8)])[0])
+
+    assert outcomes[2]["status"] == "fulfilled"
+    assert outcomes[1]["status"] == "fulfilled"
+    assert outcomes[3]["status"] == "insufficient_stock"
+
+
+def test_large_request_does_not_starve_smaller_ones():
+    requests = [req(1, 10, day=1), req(2, 3, day=2)]
+
+    outcomes = by_id(allocation.plan_batch(requests, [lot(10, 5)])[0])
+
+    assert outcomes[1]["status"] == "insufficient_stock"
+    assert outcomes[2]["status"] == "fulfilled"
+
+
+def test_groups_draw_only_from_their_own_lots():
+    requests = [req(1, 2, blood_group="A+"), req(2, 2)]
+    lots = [lot(10, 5, blood_group="O+"), lot(11, 5, blood_group="A+", bank=2)]
+
+    outcomes, deductions = allocation.plan_batch(requests, lots)
+
+    assert by_id(outcomes)[1]["allocation"][0]["inventory_id"] == 11
+    assert {(d["inventory_id"], d["blood_bank_id"], d["blood_group"]) for d in deductions} == {
+        (10, 1, "O+"), (11, 2, "A+")
+    }
+
+
+def test_deductions_are_summed_per_lot():
+    requests = [req(1, 2, day=1), req(2, 3, day=2)]
+
+    outcomes, deductions = allocation.plan_batch(requests, [lot(10, 6)])
+
+    assert [o["status"] for o in outcomes] == ["fulfilled", "fulfilled"]
+    assert deductions == [
+        {"inventory_id": 10, "blood_bank_id": 1, "blood_group": "O+", "units": 5}
+    ]
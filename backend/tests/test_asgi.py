@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+
+import asgi
+from cache import RedisCache, response_cache
+from db import PoolTimeoutError
+
+
+def call(route, headers=None):
+    app = Starlette(routes=[Route("/t", route)])
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/t", headers=headers)
+
+    return asyncio.run(go())
+
+
+def test_pool_timeout_is_503():
+    @asgi.handler("/t")
+    async def route(request):
+        raise PoolTimeoutError("no connection")
+
+    response = call(route)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_other_errors_stay_500():
+    @asgi.handler("/t")
+    async def route(request):
+        raise RuntimeError("boom")
+
+    assert call(route).status_code == 500
+
+
+@pytest.fixture
+def fake_authenticate(monkeypatch):
+    seen = {}
+
+    def authenticate(header, secret):
+        seen["thread"] = threading.current_thread()
+        if header != "Bearer good":
+            raise asgi.AuthError("Invalid token")
+        return {"user_id": 1, "role": "donor"}, "digest"
+
+    monkeypatch.setattr(asgi, "authenticate", authenticate)
+    return seen
+
+
+@asgi.handler("/t")
+async def admin_only(request):
+    _, error = await asgi.authorize(request, "admin")
+    return error or asgi.json_response({"ok": True})
+
+
+def test_authorize_maps_auth_errors(fake_authenticate):
+    assert call(admin_only).status_code == 401
+    assert call(admin_only, {"Authorization": "Bearer good"}).status_code == 403
+
+
+def test_denylist_check_leaves_event_loop_with_redis(fake_authenticate, monkeypatch):
+    # Never connects: only the backend's type decides where the call runs
+    monkeypatch.setattr(response_cache, "backend", RedisCache.__new__(RedisCache))
+
+    call(admin_only, {"Authorization": "Bearer good"})
+
+    assert fake_authenticate["thread"] is not threading.main_thread()
@@ -0,0 +1,75 @@
+import datetime
+
+from donation_ingest import ingest_donations
+
+
+class ScriptedCursor:
+    """
+    Answers SELECTs from the table they read (empty for any other) and
+    records every statement.
+    """
+
+    def __init__(self, donors, banks, indexed=()):
+        self.answers = {
+            "FROM donors d WHERE": donors,
+            "FROM blood_banks": banks,
+            "JOIN users": list(indexed)
+        }
+        self.statements = []
+        self._last = []
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        self.statements.append((sql, list(params)))
+        self._last = next((rows for part, rows in self.answers.items() if part in sql), [])
+
+    def executemany(self, sql, rows):
+        self.statements.append((" ".join(sql.split()), list(rows)))
+
+    def fetchall(self):
+        return self._last
+
+
+def donor_stats_update(cursor):
+    return next(p for sql, p in cursor.statements if sql.startswith("UPDATE donors"))
+
+
+def test_eligibility_follows_donation_date():
+    today = datetime.date.today()
+    old = today - datetime.timedelta(days=60)
+    donors = [
+        {"donor_id": 1, "blood_group": "O+", "total_donations": 0, "eligible_from": None},
+        {"donor_id": 2, "blood_group": "A+", "total_donations": 0, "eligible_from": None},
+    ]
+    indexed = {"donor_id": 2, "blood_group": "A+", "city": "Pune"}
+    cursor = ScriptedCursor(donors, [{"blood_bank_id": 5, "city": "Pune"}], [indexed])
+
+    accepted, errors = ingest_donations(cursor, [
+        {"donor_id": 1, "blood_bank_id": 5, "quantity_units": 1},
+        {"donor_id": 2, "blood_bank_id": 5, "quantity_units": 1,
+         "donation_date": old.isoformat()},
+    ])
+
+    assert errors == []
+    recent, back_dated = accepted
+    assert (recent["eligible"], back_dated["eligible"]) == (False, True)
+    assert "donor" not in recent
+    assert back_dated["donor"] == indexed
+
+    # eligible_from and eligible CASE parameters for donors 1 and 2
+    params = donor_stats_update(cursor)
+    assert params[4:8] == [1, today + datetime.timedelta(days=42),
+                           2, old + datetime.timedelta(days=42)]
+    assert params[8:12] == [1, 0, 2, 1]
+
+
+def test_no_donor_lookup_when_nobody_is_eligible_yet():
+    donors = [{"donor_id": 1, "blood_group": "O+", "total_donations": 3, "eligible_from": None}]
+    cursor = ScriptedCursor(donors, [{"blood_bank_id": 5, "city": "Pune"}])
+
+    accepted, _ = ingest_donations(cursor, [
+        {"donor_id": 1, "blood_bank_id": 5, "quantity_units": 2}
+    ])
+
+    assert accepted[0]["eligible"] is False
+    assert not any("JOIN users" in sql for sql, _ in cursor.statements)
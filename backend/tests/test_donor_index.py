@@ -0,0 +1,65 @@
+from donor_index import DonorIndex
+
+
+def donor(donor_id, city="Pune", blood_group="O+"):
+    return {
+        "donor_id": donor_id, "blood_group": blood_group, "full_name": f"Donor {donor_id}",
+        "phone": "", "city": city, "latitude": None, "longitude": None,
+        "last_donation_date": None, "total_donations": 0, "points": 0,
+        "emergency_donations": 0
+    }
+
+
+def matched_ids(index):
+    return {d["donor_id"] for d in index.match("Pune", "O+")}
+
+
+def test_remove_during_rebuild_is_not_undone():
+    index = DonorIndex()
+    index.load([donor(1), donor(2)])
+
+    def fetch_rows():
+        # Snapshot still has donor 1; the donation commits before load()
+        rows = [donor(1), donor(2)]
+        index.remove(1)
+        return rows
+
+    index._fetch_rows = fetch_rows
+    index.rebuild()
+
+    assert matched_ids(index) == {2}
+
+
+def test_add_during_rebuild_is_kept():
+    index = DonorIndex()
+    index.load([donor(1)])
+
+    def fetch_rows():
+        rows = [donor(1)]
+        index.add(donor(3))
+        return rows
+
+    index._fetch_rows = fetch_rows
+    index.rebuild()
+
+    assert matched_ids(index) == {1, 3}
+
+
+def test_updates_after_rebuild_are_not_replayed_again():
+    index = DonorIndex()
+    index.load([donor(1)])
+    index._fetch_rows = lambda: [donor(1)]
+    index.rebuild()
+
+    index.add(donor(2))
+    index.load([donor(1)])
+
+    assert matched_ids(index) == {1}
+
+
+def test_top_orders_by_score():
+    index = DonorIndex()
+    strong = dict(donor(1), total_donations=10, points=1500)
+    index.load([donor(2), strong])
+
+    assert [d["donor_id"] for d in index.top("Pune", "O+", 2, None)] == [1, 2]
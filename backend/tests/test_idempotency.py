@@ -0,0 +1,106 @@
+import pytest
+from flask import Flask, jsonify, request
+
+import idempotency
+from idempotency import BUSY, MISMATCH, OWNER, REPLAY, REPLAY_HEADER, IdempotencyStore
+
+
+def test_store_replays_completed_key():
+    store = IdempotencyStore(ttl=60, max_entries=10, wait=0)
+
+    assert store.begin("k", "a") == (OWNER, None)
+    store.complete("k", "a", (b"ok", 201, []))
+
+    assert store.begin("k", "a") == (REPLAY, (b"ok", 201, []))
+    assert store.begin("k", "b") == (MISMATCH, None)
+
+
+def test_store_reports_in_flight_key_as_busy():
+    store = IdempotencyStore(ttl=60, max_entries=10, wait=0)
+    store.begin("k", "a")
+
+    assert store.begin("k", "a") == (BUSY, None)
+
+
+def test_released_key_can_be_claimed_again():
+    store = IdempotencyStore(ttl=60, max_entries=10, wait=0)
+    store.begin("k", "a")
+    store.release("k")
+
+    assert store.begin("k", "a") == (OWNER, None)
+
+
+# ---------------- ROUTE DECORATOR ----------------
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(
+        idempotency, "idempotency_store", IdempotencyStore(ttl=60, max_entries=10, wait=0)
+    )
+    app = Flask(__name__)
+    calls = {"n": 0}
+    statuses = []
+
+    @app.before_request
+    def fake_user():
+        # Stands in for token_required
+        request.user = {"user_id": 1}
+
+    @app.route("/orders", methods=["POST"])
+    @idempotency.idempotent
+    def create_order():
+        calls["n"] += 1
+        status = statuses.pop(0) if statuses else 201
+        return jsonify({"call": calls["n"]}), status
+
+    client = app.test_client()
+    client.calls = calls
+    client.statuses = statuses
+    return client
+
+
+def post(client, key="abc", body=b"{}"):
+    return client.post("/orders", data=body, headers={"Idempotency-Key": key})
+
+
+def test_retry_replays_stored_response(client):
+    first = post(client)
+    second = post(client)
+
+    assert first.status_code == second.status_code == 201
+    assert second.get_json() == {"call": 1}
+    assert second.headers[REPLAY_HEADER] == "true"
+    assert REPLAY_HEADER not in first.headers
+    assert client.calls["n"] == 1
+
+
+def test_key_reused_with_other_body_is_rejected(client):
+    post(client)
+
+    assert post(client, body=b'{"x":1}').status_code == 422
+    assert client.calls["n"] == 1
+
+
+def test_server_error_frees_the_key(client):
+    client.statuses.append(503)
+
+    assert post(client).status_code == 503
+    retry = post(client)
+
+    assert retry.status_code == 201
+    assert retry.get_json() == {"call": 2}
+    assert REPLAY_HEADER not in retry.headers
+
+
+def test_client_error_is_replayed(client):
+    client.statuses.append(400)
+    post(client)
+
+    assert post(client).status_code == 400
+    assert client.calls["n"] == 1
+
+
+def test_requests_without_key_always_run(client):
+    client.post("/orders")
+    client.post("/orders")
+
+    assert client.calls["n"] == 2
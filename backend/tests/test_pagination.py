@@ -0,0 +1,57 @@
+import pytest
+
+from pagination import (
+    MAX_LIMIT, InvalidCursorError, decode_cursor, encode_cursor, page_args, split_page
+)
+from queries import PageQuery
+
+
+def test_cursor_round_trip():
+    values = ["desc", "2026-01-05 10:00:00", 42]
+
+    token = encode_cursor(values)
+
+    assert "=" not in token
+    assert decode_cursor(token, 3) == values
+
+
+@pytest.mark.parametrize("token", ["not base64!", encode_cursor({"a": 1}), "e30"])
+def test_malformed_cursor_is_rejected(token):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(token, 2)
+
+
+def test_cursor_with_wrong_size_is_rejected():
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(encode_cursor(["desc", 1]), 3)
+
+
+def test_page_args_strips_order_from_cursor():
+    token = encode_cursor(["asc", "2026-01-05", 7])
+
+    limit, values, order = page_args(2, args={"cursor": token, "order": "asc", "limit": "10"})
+
+    assert (limit, values, order) == (10, ["2026-01-05", 7], "asc")
+
+
+def test_cursor_from_other_order_is_rejected():
+    token = encode_cursor(["desc", "2026-01-05", 7])
+
+    with pytest.raises(InvalidCursorError):
+        page_args(2, args={"cursor": token, "order": "asc"})
+
+
+@pytest.mark.parametrize("raw, expected", [("0", 1), ("5000", MAX_LIMIT), ("abc", 50)])
+def test_limit_is_clamped(raw, expected):
+    assert page_args(1, args={"limit": raw})[0] == expected
+
+
+def test_split_page_cursor_resumes_after_last_row():
+    rows = [{"id": i} for i in (9, 8, 7)]
+    page = PageQuery("", [], 2, "desc", lambda row: (row["id"],))
+
+    kept, next_cursor = split_page(rows, page)
+
+    assert kept == rows[:2]
+    assert page_args(1, args={"cursor": next_cursor})[1] == [8]
+    assert split_page(rows[:2], page) == (rows[:2], None)
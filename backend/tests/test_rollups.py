@@ -0,0 +1,51 @@
+import datetime
+
+from rollups import MEASURES, _rows, fulfilled_event, units_out_event
+
+AT = datetime.datetime(2026, 3, 4, 10, 30)
+
+
+def totals(rows, granularity, bank, city=None):
+    out = dict.fromkeys(MEASURES, 0)
+    for row in rows:
+        if row[0] == granularity and row[1] == bank and (city is None or row[2] == city):
+            for name, value in zip(MEASURES, row[5:]):
+                out[name] += value
+    return out
+
+
+def fulfill_events():
+    request = {
+        "city": "Pune", "blood_group": "O+",
+        "request_date": AT - datetime.timedelta(hours=2)
+    }
+    lines = [
+        {"blood_bank_id": 1, "blood_group": "O+", "units": 3},
+        {"blood_bank_id": 2, "blood_group": "O+", "units": 2},
+    ]
+    out = [units_out_event(AT, line) for line in lines]
+    # record() fills these in from blood_banks
+    out[0]["city"], out[1]["city"] = "Pune", "Mumbai"
+    return [fulfilled_event(AT, request)] + out
+
+
+def test_units_out_are_counted_per_bank():
+    rows = _rows(fulfill_events())
+
+    assert totals(rows, "day", 1)["units_out"] == 3
+    assert totals(rows, "day", 2)["units_out"] == 2
+    assert totals(rows, "day", 1)["fulfilled"] == 0
+
+
+def test_cities_split_units_out_by_bank_and_count_the_request_once():
+    rows = _rows(fulfill_events())
+
+    pune = totals(rows, "hour", 0, "Pune")
+    mumbai = totals(rows, "hour", 0, "Mumbai")
+    network = totals(rows, "hour", 0)
+
+    assert (pune["units_out"], mumbai["units_out"]) == (3, 2)
+    assert (pune["fulfilled"], mumbai["fulfilled"]) == (1, 0)
+    assert network["units_out"] == 5
+    assert network["fulfilled"] == 1
+    assert network["fulfill_seconds"] == 7200
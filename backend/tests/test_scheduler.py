@@ -0,0 +1,60 @@
+import scheduler
+from scheduler import Scheduler
+
+
+class FakeCursor:
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+
+    def execute(self, sql, params=()):
+        if self.error:
+            raise self.error
+
+    def fetchone(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.closed = False
+
+    def cursor(self):
+        return self._cursor
+
+    def close(self):
+        self.closed = True
+
+
+def connect_to(monkeypatch, conn):
+    monkeypatch.setattr(scheduler, "create_connection", lambda: conn)
+
+
+def test_failed_lock_query_closes_connection(monkeypatch):
+    conn = FakeConnection(FakeCursor(error=RuntimeError("lost connection")))
+    connect_to(monkeypatch, conn)
+
+    assert Scheduler()._ensure_leadership() is False
+    assert conn.closed
+
+
+def test_lock_held_elsewhere_closes_connection(monkeypatch):
+    conn = FakeConnection(FakeCursor(result=(0,)))
+    connect_to(monkeypatch, conn)
+
+    assert Scheduler()._ensure_leadership() is False
+    assert conn.closed
+
+
+def test_leader_keeps_lock_connection(monkeypatch):
+    conn = FakeConnection(FakeCursor(result=(1,)))
+    connect_to(monkeypatch, conn)
+    jobs = Scheduler()
+
+    assert jobs._ensure_leadership() is True
+    assert not conn.closed
+    assert jobs.is_leader
@@ -0,0 +1,138 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+
+import config
+from cache import RedisCache, response_cache
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class VerifiedTokenCache:
+    """
+    LRU of already-verified JWT claims keyed by token digest. An entry
+    never outlives its token's `exp`, so expiry is still enforced by the
+    full decode once the entry is gone.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest):
+        with self._lock:
+            item = self._data.get(digest)
+            if item is None or item["exp"] <= time.time():
+                if item is not None:
+                    del self._data[digest]
+                self.misses += 1
+                return None
+            self._data.move_to_end(digest)
+            self.hits += 1
+            return item
+
+    def put(self, digest, claims):
+        if "exp" not in claims:
+            return
+        with self._lock:
+            self._data[digest] = claims
+            self._data.move_to_end(digest)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def discard(self, digest):
+        with self._lock:
+            self._data.pop(digest, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+class TokenDenylist:
+    """
+    Revoked token digests, each kept only until the token would have
+    expired anyway. Shared through Redis when the response cache uses it,
+    otherwise per process. Never LRU-evicted.
+    """
+
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._local = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, digest, exp):
+        ttl = exp - time.time()
+        if ttl <= 0:
+            return
+        if self._backend is not None:
+            self._backend.set("revoked:" + digest, True, ttl)
+            return
+        with self._lock:
+            self._local[digest] = exp
+            self._purge()
+
+    def is_revoked(self, digest):
+        if self._backend is not None:
+            return self._backend.get("revoked:" + digest) is not None
+        with self._lock:
+            exp = self._local.get(digest)
+            return exp is not None and exp > time.time()
+
+    def _purge(self):
+        now = time.time()
+        for digest in [d for d, exp in self._local.items() if exp <= now]:
+            del self._local[digest]
+
+
+token_cache = VerifiedTokenCache(config.TOKEN_CACHE_SIZE)
+token_denylist = TokenDenylist(
+    response_cache.backend if isinstance(response_cache.backend, RedisCache) else None
+)
+
+
+class AuthError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def authenticate(auth_header, secret):
+    """
+    (claims, digest) for a valid "Bearer <token>" header, or AuthError.
+    Shared by token_required and the ASGI handlers.
+    """
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise AuthError("Authorization header missing or invalid")
+
+    token = auth_header.split(" ")[1]
+    digest = token_digest(token)
+
+    if token_denylist.is_revoked(digest):
+        raise AuthError("Token revoked")
+
+    # Fast path: this exact token was verified before and has not expired
+    claims = token_cache.get(digest)
+    if claims is None:
+        try:
+            claims = jwt.decode(token, secret, algorithms=["HS256"])
+        except jwt.ExpiredSignatureError:
+            raise AuthError("Token expired")
+        except jwt.InvalidTokenError:
+            raise AuthError("Invalid token")
+        token_cache.put(digest, claims)
+
+    return claims, digest
@@ -0,0 +1,78 @@
+-- ---------------- BASE SCHEMA ----------------
+-- The tables the backend was written against. Primary keys, unique keys
+-- and foreign keys only; query-driven indexes come in later migrations.
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id INT AUTO_INCREMENT PRIMARY KEY,
+    full_name VARCHAR(100) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    role VARCHAR(20) NOT NULL,
+    phone VARCHAR(20),
+    city VARCHAR(100),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_users_email (email)
+);
+
+CREATE TABLE IF NOT EXISTS blood_banks (
+    blood_bank_id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(150) NOT NULL,
+    city VARCHAR(100) NOT NULL,
+    address VARCHAR(255),
+    contact_number VARCHAR(20),
+    admin_user_id INT NOT NULL,
+    CONSTRAINT fk_blood_banks_admin FOREIGN KEY (admin_user_id) REFERENCES users (user_id)
+);
+
+CREATE TABLE IF NOT EXISTS donors (
+    donor_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    blood_group VARCHAR(3) NOT NULL,
+    eligible TINYINT(1) NOT NULL DEFAULT 1,
+    last_donation_date DATE NULL,
+    total_donations INT NOT NULL DEFAULT 0,
+    points INT NOT NULL DEFAULT 0,
+    UNIQUE KEY uq_donors_user (user_id),
+    CONSTRAINT fk_donors_user FOREIGN KEY (user_id) REFERENCES users (user_id)
+);
+
+CREATE TABLE IF NOT EXISTS blood_inventory (
+    inventory_id INT AUTO_INCREMENT PRIMARY KEY,
+    blood_bank_id INT NOT NULL,
+    blood_group VARCHAR(3) NOT NULL,
+    units_available INT NOT NULL,
+    collection_date DATE,
+    expiry_date DATE,
+    status VARCHAR(20) NOT NULL DEFAULT 'available',
+    CONSTRAINT fk_inventory_bank FOREIGN KEY (blood_bank_id) REFERENCES blood_banks (blood_bank_id)
+);
+
+CREATE TABLE IF NOT EXISTS blood_requests (
+    request_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    blood_group VARCHAR(3) NOT NULL,
+    quantity_units INT NOT NULL,
+    urgency VARCHAR(20) NOT NULL DEFAULT 'normal',
+    city VARCHAR(100),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    request_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_requests_user FOREIGN KEY (user_id) REFERENCES users (user_id)
+);
+
+CREATE TABLE IF NOT EXISTS donation_history (
+    donation_id INT AUTO_INCREMENT PRIMARY KEY,
+    donor_id INT NOT NULL,
+    blood_bank_id INT NOT NULL,
+    donation_date DATE NOT NULL,
+    quantity_units INT NOT NULL,
+    CONSTRAINT fk_history_donor FOREIGN KEY (donor_id) REFERENCES donors (donor_id),
+    CONSTRAINT fk_history_bank FOREIGN KEY (blood_bank_id) REFERENCES blood_banks (blood_bank_id)
+);
+
+CREATE TABLE IF NOT EXISTS donor_badges (
+    badge_id INT AUTO_INCREMENT PRIMARY KEY,
+    donor_id INT NOT NULL,
+    badge_name VARCHAR(50) NOT NULL,
+    awarded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_badges_donor FOREIGN KEY (donor_id) REFERENCES donors (donor_id)
+);
@@ -0,0 +1,13 @@
+-- ---------------- INVENTORY AGGREGATES ----------------
+-- Running per-(bank, group) sums maintained by donate_blood, fulfillment
+-- and expiry. Populate or repair from blood_inventory with
+-- POST /admin/inventory/reconcile.
+CREATE TABLE IF NOT EXISTS inventory_aggregates (
+    blood_bank_id INT NOT NULL,
+    blood_group VARCHAR(3) NOT NULL,
+    units_available INT NOT NULL DEFAULT 0,
+    units_total INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (blood_bank_id, blood_group)
+);
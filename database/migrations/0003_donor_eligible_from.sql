@@ -0,0 +1,11 @@
+-- ---------------- COMPUTED ELIGIBILITY ----------------
+-- A donor may donate again once eligible_from has passed. The eligible
+-- flag is kept in sync incrementally; (eligible, eligible_from) lets the
+-- refresh find just the donors whose waiting period has ended.
+ALTER TABLE donors
+    ADD COLUMN eligible_from DATE NULL,
+    ADD INDEX idx_donors_eligible_from (eligible, eligible_from);
+
+UPDATE donors
+SET eligible_from = DATE_ADD(last_donation_date, INTERVAL 42 DAY)
+WHERE last_donation_date IS NOT NULL;
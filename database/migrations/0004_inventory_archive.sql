@@ -0,0 +1,14 @@
+-- ---------------- INVENTORY ARCHIVE ----------------
+-- Depleted and expired lots are moved here by the archive_lots job so
+-- blood_inventory only holds usable stock.
+CREATE TABLE IF NOT EXISTS blood_inventory_archive (
+    inventory_id INT PRIMARY KEY,
+    blood_bank_id INT NOT NULL,
+    blood_group VARCHAR(3) NOT NULL,
+    units_available INT NOT NULL,
+    collection_date DATE,
+    expiry_date DATE,
+    status VARCHAR(20),
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_archive_bank_group (blood_bank_id, blood_group)
+);
@@ -0,0 +1,55 @@
+-- ---------------- HOT QUERY INDEXES ----------------
+-- One index per query shape the backend actually runs. InnoDB appends the
+-- primary key to every secondary index, so "ORDER BY x, <pk>" tie-breakers
+-- used by FEFO and keyset pagination are covered without listing the pk.
+-- Built online (INPLACE, LOCK=NONE) so reads and writes continue meanwhile.
+
+-- blood_inventory
+--   FEFO allocation (allocation.allocate_fefo, fulfill-batch):
+--     WHERE blood_group = ? AND status = 'available' AND expiry_date >= CURDATE()
+--     ORDER BY expiry_date, inventory_id
+--   Per-bank stock (reconcile, bank dashboards):
+--     WHERE blood_bank_id = ? AND status = 'available' AND expiry_date >= ?
+--     GROUP BY blood_group
+--   Expiry sweep (inventory_aggregates.expire_lots):
+--     WHERE status = 'available' AND expiry_date < CURDATE() ORDER BY expiry_date
+ALTER TABLE blood_inventory
+    ADD INDEX idx_inventory_fefo (blood_group, status, expiry_date),
+    ADD INDEX idx_inventory_bank_stock (blood_bank_id, status, expiry_date, blood_group),
+    ADD INDEX idx_inventory_status_expiry (status, expiry_date),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- donors
+--   Emergency matching and the match index rebuild, by blood group:
+--     WHERE blood_group IN (...) AND eligible = 1
+ALTER TABLE donors
+    ADD INDEX idx_donors_group_eligible (blood_group, eligible),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- users
+--   Matching by city (joined from donors) and city filters
+ALTER TABLE users
+    ADD INDEX idx_users_city (city),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- blood_requests
+--   /blood-requests/me: WHERE user_id = ? ORDER BY request_date, request_id
+--   /blood-requests:    ORDER BY request_date, request_id (keyset pages)
+--   fulfill-batch and status filters: WHERE status = ? ORDER BY request_date
+ALTER TABLE blood_requests
+    ADD INDEX idx_requests_user_date (user_id, request_date),
+    ADD INDEX idx_requests_date (request_date),
+    ADD INDEX idx_requests_status_date (status, request_date),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- donation_history
+--   /donations/me: WHERE donor_id = ? ORDER BY donation_date, donation_id
+ALTER TABLE donation_history
+    ADD INDEX idx_history_donor_date (donor_id, donation_date),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- blood_banks
+--   ?city= filter on the bank lists
+ALTER TABLE blood_banks
+    ADD INDEX idx_banks_city (city),
+    ALGORITHM=INPLACE, LOCK=NONE;
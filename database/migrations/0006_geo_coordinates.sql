@@ -0,0 +1,10 @@
+-- ---------------- GEO COORDINATES ----------------
+-- Optional location of users (donors, hospitals) and blood banks, used by
+-- radius / nearest-K donor matching. NULL means "match by city only".
+ALTER TABLE users
+    ADD COLUMN latitude DECIMAL(9,6) NULL,
+    ADD COLUMN longitude DECIMAL(9,6) NULL;
+
+ALTER TABLE blood_banks
+    ADD COLUMN latitude DECIMAL(9,6) NULL,
+    ADD COLUMN longitude DECIMAL(9,6) NULL;
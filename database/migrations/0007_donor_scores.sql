@@ -0,0 +1,10 @@
+-- ---------------- DONOR SCORES ----------------
+-- Donations that answered an emergency, the response-rate input of the
+-- donor score. Backfilled from points: each donation earns 100 and an
+-- emergency one 100 more (see backend/rewards.py).
+ALTER TABLE donors
+    ADD COLUMN emergency_donations INT NOT NULL DEFAULT 0;
+
+UPDATE donors
+SET emergency_donations = GREATEST(0, LEAST(total_donations,
+        FLOOR((points - 100 * total_donations) / 100)));
@@ -0,0 +1,17 @@
+-- ---------------- DASHBOARD INDEXES ----------------
+-- The admin dashboard snapshot (backend/dashboard.py) is rebuilt every few
+-- seconds; both of its counting queries read only an index.
+
+-- blood_requests
+--   Open request counts:
+--     WHERE status IN ('pending', 'approved') GROUP BY status, urgency
+ALTER TABLE blood_requests
+    ADD INDEX idx_requests_status_urgency (status, urgency),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- donation_history
+--   Today's donations:
+--     WHERE donation_date = CURDATE()
+ALTER TABLE donation_history
+    ADD INDEX idx_history_date (donation_date, quantity_units),
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,33 @@
+-- ---------------- ANALYTICS ROLLUPS ----------------
+-- When a request was fulfilled, for fulfillment latency. Requests
+-- fulfilled before this migration keep NULL and are left out of rollups.
+ALTER TABLE blood_requests
+    ADD COLUMN fulfilled_at DATETIME NULL,
+    ADD INDEX idx_requests_fulfilled_at (fulfilled_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Hourly and daily sums per blood group at three scopes, kept by the
+-- write paths (backend/rollups.py):
+--   blood bank - blood_bank_id = <bank>, city = ''
+--   city       - blood_bank_id = 0,      city = <city>
+--   network    - blood_bank_id = 0,      city = ''
+-- Chart queries fix the scope and read one contiguous primary key range:
+--   WHERE granularity = ? AND blood_bank_id = ? AND city = ?
+--     AND bucket_start BETWEEN ? AND ?
+CREATE TABLE IF NOT EXISTS analytics_rollups (
+    granularity ENUM('hour', 'day') NOT NULL,
+    blood_bank_id INT NOT NULL,
+    city VARCHAR(100) NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    blood_group VARCHAR(3) NOT NULL,
+    donations INT NOT NULL DEFAULT 0,
+    units_in INT NOT NULL DEFAULT 0,
+    units_out INT NOT NULL DEFAULT 0,
+    requests_normal INT NOT NULL DEFAULT 0,
+    requests_emergency INT NOT NULL DEFAULT 0,
+    fulfilled INT NOT NULL DEFAULT 0,
+    fulfill_seconds BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, blood_bank_id, city, bucket_start, blood_group),
+    -- Re-aggregation clears a time window across every scope
+    INDEX idx_rollups_bucket (bucket_start)
+);
@@ -0,0 +1,40 @@
+-- ---------------- STOCK ALERTS ----------------
+-- Per-(bank, group) thresholds; pairs without a row use the configured
+-- defaults (CRITICAL_STOCK_UNITS / LOW_STOCK_UNITS). An alert is raised
+-- when usable units fall to low_water and cleared once they are back at
+-- high_water or above (backend/stock_alerts.py).
+CREATE TABLE IF NOT EXISTS stock_thresholds (
+    blood_bank_id INT NOT NULL,
+    blood_group VARCHAR(3) NOT NULL,
+    low_water INT NOT NULL,
+    high_water INT NOT NULL,
+    PRIMARY KEY (blood_bank_id, blood_group),
+    CONSTRAINT fk_thresholds_bank FOREIGN KEY (blood_bank_id)
+        REFERENCES blood_banks (blood_bank_id) ON DELETE CASCADE
+);
+
+-- Active alerts only: a row exists while the alert is raised, so reading
+-- alerts costs O(active alerts)
+CREATE TABLE IF NOT EXISTS stock_alerts (
+    blood_bank_id INT NOT NULL,
+    blood_group VARCHAR(3) NOT NULL,
+    units_available INT NOT NULL,
+    lowest_units INT NOT NULL,
+    low_water INT NOT NULL,
+    high_water INT NOT NULL,
+    raised_at DATETIME NOT NULL,
+    PRIMARY KEY (blood_bank_id, blood_group),
+    CONSTRAINT fk_alerts_bank FOREIGN KEY (blood_bank_id)
+        REFERENCES blood_banks (blood_bank_id) ON DELETE CASCADE
+);
+
+-- Cleared alerts, for looking back at shortages
+CREATE TABLE IF NOT EXISTS stock_alert_history (
+    alert_id INT AUTO_INCREMENT PRIMARY KEY,
+    blood_bank_id INT NOT NULL,
+    blood_group VARCHAR(3) NOT NULL,
+    lowest_units INT NOT NULL,
+    raised_at DATETIME NOT NULL,
+    cleared_at DATETIME NOT NULL,
+    INDEX idx_alert_history_bank (blood_bank_id, cleared_at)
+);
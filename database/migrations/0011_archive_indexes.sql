@@ -0,0 +1,11 @@
+-- ---------------- ARCHIVE INDEXES ----------------
+-- The archive_lots job (backend/inventory_archive.py) finds its candidates
+-- with one indexed read per condition instead of an OR that walks the
+-- primary key. Expired lots use idx_inventory_status_expiry from 0005.
+
+-- blood_inventory
+--   Depleted lots:
+--     WHERE units_available = 0 ORDER BY inventory_id
+ALTER TABLE blood_inventory
+    ADD INDEX idx_inventory_depleted (units_available),
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,40 @@
+-- ---------------- NETWORK ROLLUPS AT READ TIME ----------------
+-- Network totals are no longer stored: every write upserted the same
+-- (granularity, bucket, blood_group) network row, a lock all writers
+-- queued on. They are now the sum of the blood_bank_id = 0 rows, i.e. the
+-- city rows plus city = '' for events that had no city.
+
+-- Turn each stored network row into that city = '' remainder
+UPDATE analytics_rollups n
+JOIN (
+    SELECT granularity, bucket_start, blood_group,
+           SUM(donations) AS donations, SUM(units_in) AS units_in,
+           SUM(units_out) AS units_out, SUM(requests_normal) AS requests_normal,
+           SUM(requests_emergency) AS requests_emergency,
+           SUM(fulfilled) AS fulfilled, SUM(fulfill_seconds) AS fulfill_seconds
+    FROM analytics_rollups
+    WHERE blood_bank_id = 0 AND city <> ''
+    GROUP BY granularity, bucket_start, blood_group
+) c ON c.granularity = n.granularity
+   AND c.bucket_start = n.bucket_start
+   AND c.blood_group = n.blood_group
+SET n.donations = n.donations - c.donations,
+    n.units_in = n.units_in - c.units_in,
+    n.units_out = n.units_out - c.units_out,
+    n.requests_normal = n.requests_normal - c.requests_normal,
+    n.requests_emergency = n.requests_emergency - c.requests_emergency,
+    n.fulfilled = n.fulfilled - c.fulfilled,
+    n.fulfill_seconds = n.fulfill_seconds - c.fulfill_seconds
+WHERE n.blood_bank_id = 0 AND n.city = '';
+
+DELETE FROM analytics_rollups
+WHERE blood_bank_id = 0 AND city = ''
+  AND donations = 0 AND units_in = 0 AND units_out = 0
+  AND requests_normal = 0 AND requests_emergency = 0
+  AND fulfilled = 0 AND fulfill_seconds = 0;
+
+-- Network chart queries:
+--   WHERE granularity = ? AND blood_bank_id = 0 AND bucket_start BETWEEN ? AND ?
+ALTER TABLE analytics_rollups
+    ADD INDEX idx_rollups_scope_bucket (granularity, blood_bank_id, bucket_start),
+    ALGORITHM=INPLACE, LOCK=NONE;
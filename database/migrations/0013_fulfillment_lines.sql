@@ -0,0 +1,18 @@
+-- ---------------- FULFILLMENT LINES ----------------
+-- One row per lot a fulfilled request drew from, written in the fulfill
+-- transaction, so units_out can be rolled up per blood bank and rebuilt
+-- (backend/rollups.py). Lots are archived once empty or expired, so
+-- inventory_id is kept for reference only, without a foreign key.
+-- Requests fulfilled before this migration have no lines.
+CREATE TABLE IF NOT EXISTS fulfillment_lines (
+    line_id INT AUTO_INCREMENT PRIMARY KEY,
+    request_id INT NOT NULL,
+    inventory_id INT NOT NULL,
+    blood_bank_id INT NOT NULL,
+    blood_group VARCHAR(3) NOT NULL,
+    units INT NOT NULL,
+    fulfilled_at DATETIME NOT NULL,
+    -- Re-aggregation reads a time window
+    INDEX idx_fulfillment_lines_at (fulfilled_at),
+    INDEX idx_fulfillment_lines_request (request_id)
+);
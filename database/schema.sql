@@ -0,0 +1,11 @@
+-- ---------------- SCHEMA ----------------
+-- The schema is versioned: every change is a numbered file in
+-- database/migrations/, applied in order and recorded in the
+-- schema_migrations table. From the backend directory:
+--
+--   python migrate.py            apply pending migrations
+--   python migrate.py status     list applied and pending versions
+--   python migrate.py baseline 4 mark 0001-0004 applied without running them,
+--                                for databases set up before versioning
+--
+-- Never edit an applied migration; add a new one instead.
@@ -1,40 +1,130 @@
 import { useEffect, useState } from "react";
 
+const OPEN_STATUSES = ["pending", "approved"];
+const RETRY_MIN_MS = 1000;
+const RETRY_MAX_MS = 30000;
+
+// Resolves after `ms`, or straight away once the component unmounts
+const pause = (ms, signal) =>
+  new Promise((resolve) => {
+    const timer = setTimeout(resolve, ms);
+    signal.addEventListener("abort", () => {
+      clearTimeout(timer);
+      resolve();
+    });
+  });
+
 function EmergencyDonorMatch({ requestId }) {
   const [donors, setDonors] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [error, setError] = useState("");
 
   useEffect(() => {
-    const fetchMatches = async () => {
-      try {
-        const token = localStorage.getItem("token");
-
-        const res = await fetch(
-          `http://127.0.0.1:5000/blood-requests/${requestId}/match-donors`,
-          {
-            headers: {
-              Authorization: `Bearer ${token}`,
-            },
-          }
-        );
+    const controller = new AbortController();
+    let closed = false;
+
+    const applyEvent = (name, payload) => {
+      if (name === "snapshot") {
+        // Sent first on every connection, so a reconnect starts from scratch
+        setDonors(payload.matched_donors);
+        closed = !OPEN_STATUSES.includes(payload.status);
+      } else if (name === "delta") {
+        setDonors((current) => [
+          ...current.filter((d) => !payload.removed.includes(d.donor_id)),
+          ...payload.added,
+        ]);
+      } else if (name === "status") {
+        closed = !OPEN_STATUSES.includes(payload.status);
+      }
+      setError("");
+      setLoading(false);
+    };
 
-        const data = await res.json();
+    // Returns true when there is nothing to reconnect for
+    const streamOnce = async (onEvent) => {
+      const token = localStorage.getItem("token");
 
-        if (data.matched_donors) {
-          setDonors(data.matched_donors);
+      // 📡 Server pushes match changes; no polling needed
+      const res = await fetch(
+        `http://127.0.0.1:5000/blood-requests/${requestId}/match-stream`,
+        {
+          headers: {
+            Authorization: `Bearer ${token}`,
+          },
+          signal: controller.signal,
+        }
+      );
+
+      if (!res.ok) {
+        const body = await res.json().catch(() => ({}));
+        const message = body.error || `Match stream failed (${res.status})`;
+        // Auth and missing requests will not fix themselves by retrying
+        if ([400, 401, 403, 404].includes(res.status)) {
+          setError(message);
+          return true;
+        }
+        throw new Error(message);
+      }
+
+      if (!(res.headers.get("Content-Type") || "").startsWith("text/event-stream")) {
+        // Not an emergency request: no live matching
+        setDonors([]);
+        return true;
+      }
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) return closed;
+
+        buffer += decoder.decode(value, { stream: true });
+        const chunks = buffer.split("\n\n");
+        buffer = chunks.pop();
+
+        for (const chunk of chunks) {
+          let name = "message";
+          let data = "";
+          for (const line of chunk.split("\n")) {
+            if (line.startsWith("event: ")) name = line.slice(7);
+            if (line.startsWith("data: ")) data += line.slice(6);
+          }
+          if (data) {
+            onEvent();
+            applyEvent(name, JSON.parse(data));
+          }
         }
-      } catch (err) {
-        console.error("Match fetch failed", err);
-      } finally {
-        setLoading(false);
       }
     };
 
-    fetchMatches();
+    const streamMatches = async () => {
+      let delay = RETRY_MIN_MS;
+
+      while (!controller.signal.aborted) {
+        try {
+          // Any event means the connection is healthy again
+          const finished = await streamOnce(() => {
+            delay = RETRY_MIN_MS;
+          });
+          if (finished) break;
+          setError("Live updates interrupted, reconnecting...");
+        } catch (err) {
+          if (err.name === "AbortError") break;
+          console.error("Match stream failed", err);
+          setError(`${err.message}, reconnecting...`);
+        } finally {
+          setLoading(false);
+        }
+
+        await pause(delay, controller.signal);
+        delay = Math.min(delay * 2, RETRY_MAX_MS);
+      }
+    };
 
-    // 🔁 Live refresh every 15 seconds
-    const interval = setInterval(fetchMatches, 15000);
-    return () => clearInterval(interval);
+    streamMatches();
+    return () => controller.abort();
   }, [requestId]);
 
   if (loading) return <p className="muted">Matching donors...</p>;
@@ -42,7 +132,7 @@ function EmergencyDonorMatch({ requestId }) {
   if (donors.length === 0) {
     return (
       <p className="text-danger">
-        ⚠ No eligible donors found nearby yet
+        ⚠ {error || "No eligible donors found nearby yet"}
       </p>
     );
   }
@@ -72,8 +162,8 @@ function EmergencyDonorMatch({ requestId }) {
         </tbody>
       </table>
 
-      <p className="muted" style={{ marginTop: 8 }}>
-        Updated every 15 seconds
+      <p className={error ? "text-danger" : "muted"} style={{ marginTop: 8 }}>
+        {error || "Updates live as donors become available"}
       </p>
     </div>
   );
@@ -8,6 +8,7 @@ const LOW_THRESHOLD = 20;
 
 function AdminDashboard({ user }) {
   const [inventory, setInventory] = useState([]);
+  const [snapshot, setSnapshot] = useState(null);
   const [loadingInventory, setLoadingInventory] = useState(true);
   const [selectedBloodGroup, setSelectedBloodGroup] = useState(null);
 
@@ -17,12 +18,13 @@ function AdminDashboard({ user }) {
   };
 
   useEffect(() => {
-    const fetchInventory = async () => {
+    // One snapshot for stock, alerts and counts (cached server-side)
+    const fetchDashboard = async () => {
       try {
         const token = localStorage.getItem("token");
 
         const res = await fetch(
-          "http://127.0.0.1:5000/inventory/summary",
+          "http://127.0.0.1:5000/admin/dashboard",
           {
             headers: { Authorization: `Bearer ${token}` },
           }
@@ -30,7 +32,7 @@ function AdminDashboard({ user }) {
 
         const data = await res.json();
 
-        const enhanced = data.map((item) => {
+        const enhanced = data.stock.map((item) => {
           const units = Number(item.total_units);
           return {
             ...item,
@@ -40,14 +42,15 @@ function AdminDashboard({ user }) {
         });
 
         setInventory(enhanced);
+        setSnapshot(data);
       } catch (err) {
-        console.error("Inventory fetch failed", err);
+        console.error("Dashboard fetch failed", err);
       } finally {
         setLoadingInventory(false);
       }
     };
 
-    fetchInventory();
+    fetchDashboard();
   }, []);
 
   const hasCritical = inventory.some((i) => i.critical);
@@ -175,12 +178,26 @@ function AdminDashboard({ user }) {
           {/* RIGHT – 30% */}
           <div className="card">
             <h3>Quick Insights</h3>
-            <ul className="insights">
-              <li>🩸 Live blood inventory</li>
-              <li>🚨 Emergency requests highlighted</li>
-              <li>📍 City-based demand tracking</li>
-              <li>👥 Active donor pool</li>
-            </ul>
+            {snapshot ? (
+              <ul className="insights">
+                <li>⏳ {snapshot.requests.pending} pending requests</li>
+                <li>🚨 {snapshot.requests.emergency_open} open emergencies</li>
+                <li>
+                  🩸 {snapshot.donations_today.donations} donations today (
+                  {snapshot.donations_today.units} units)
+                </li>
+                <li>
+                  ⚠ {snapshot.critical_alerts.length} bank stock alerts
+                </li>
+              </ul>
+            ) : (
+              <ul className="insights">
+                <li>🩸 Live blood inventory</li>
+                <li>🚨 Emergency requests highlighted</li>
+                <li>📍 City-based demand tracking</li>
+                <li>👥 Active donor pool</li>
+              </ul>
+            )}
           </div>
         </div>
       </div>
@@ -3,26 +3,38 @@ import { useEffect, useState } from "react";
 function AllBloodRequests({ selectedBloodGroup, onClearFilter }) {
   const [requests, setRequests] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
 
   const token = localStorage.getItem("token");
 
-  const fetchRequests = async () => {
+  // 📄 Server returns one page; X-Next-Cursor points at the next one
+  const fetchRequests = async (cursor = null) => {
     setLoading(true);
 
-    const res = await fetch("http://127.0.0.1:5000/blood-requests", {
-      headers: {
-        Authorization: `Bearer ${token}`,
-      },
-    });
+    const params = new URLSearchParams();
+    if (selectedBloodGroup) params.set("blood_group", selectedBloodGroup);
+    if (cursor) params.set("cursor", cursor);
+
+    const res = await fetch(
+      `http://127.0.0.1:5000/blood-requests?${params}`,
+      {
+        headers: {
+          Authorization: `Bearer ${token}`,
+        },
+      }
+    );
 
     const data = await res.json();
-    if (res.ok) setRequests(data);
+    if (res.ok) {
+      setRequests((current) => (cursor ? [...current, ...data] : data));
+      setNextCursor(res.headers.get("X-Next-Cursor"));
+    }
     setLoading(false);
   };
 
   useEffect(() => {
     fetchRequests();
-  }, []);
+  }, [selectedBloodGroup]);
 
   const updateStatus = async (id, status) => {
     await fetch(`http://127.0.0.1:5000/blood-requests/${id}/status`, {
@@ -172,6 +184,16 @@ function AllBloodRequests({ selectedBloodGroup, onClearFilter }) {
           </tbody>
         </table>
       )}
+
+      {nextCursor && (
+        <button
+          className="small"
+          disabled={loading}
+          onClick={() => fetchRequests(nextCursor)}
+        >
+          Load more
+        </button>
+      )}
     </div>
   );
 }
@@ -2,24 +2,48 @@ import { useEffect, useState } from "react";
 
 function DonationHistory() {
   const [history, setHistory] = useState([]);
+  const [totals, setTotals] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+
+  const token = localStorage.getItem("token");
+
+  // 📄 Server returns one page; X-Next-Cursor points at the next one
+  const fetchHistory = async (cursor = null) => {
+    setLoading(true);
+
+    const params = new URLSearchParams();
+    if (cursor) params.set("cursor", cursor);
+
+    const res = await fetch(`http://127.0.0.1:5000/donations/me?${params}`, {
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    });
+
+    const data = await res.json();
+    if (res.ok) {
+      setHistory((current) => (cursor ? [...current, ...data] : data));
+      setNextCursor(res.headers.get("X-Next-Cursor"));
+    }
+    setLoading(false);
+  };
+
+  // 🏆 Totals come from the donor profile, not from the rows loaded so far
+  const fetchTotals = async () => {
+    const res = await fetch("http://127.0.0.1:5000/donors/me", {
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    });
+
+    const data = await res.json();
+    if (res.ok) setTotals(data);
+  };
 
   useEffect(() => {
-    const fetchHistory = async () => {
-      const token = localStorage.getItem("token");
-
-      const res = await fetch("http://127.0.0.1:5000/donations/me", {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
-
-      const data = await res.json();
-      if (res.ok) setHistory(data);
-      setLoading(false);
-    };
-
     fetchHistory();
+    fetchTotals();
   }, []);
 
   // 🔢 Simple reward logic (frontend)
@@ -29,23 +53,21 @@ function DonationHistory() {
     <div className="card">
       <h3>Donation History</h3>
 
-      {loading && <p>Loading donation history...</p>}
+      {loading && history.length === 0 && <p>Loading donation history...</p>}
 
       {!loading && history.length === 0 && (
         <p className="muted">You haven’t donated blood yet.</p>
       )}
 
-      {!loading && history.length > 0 && (
+      {history.length > 0 && (
         <>
           {/* 🏆 Summary */}
-          <div style={{ marginBottom: 12 }}>
-            <b>Total Donations:</b> {history.length} <br />
-            <b>Total Points:</b>{" "}
-            {history.reduce(
-              (sum, d) => sum + calculatePoints(d.quantity_units),
-              0
-            )}
-          </div>
+          {totals && (
+            <div style={{ marginBottom: 12 }}>
+              <b>Total Donations:</b> {totals.total_donations} <br />
+              <b>Total Points:</b> {totals.points}
+            </div>
+          )}
 
           <table>
             <thead>
@@ -85,6 +107,16 @@ function DonationHistory() {
             </tbody>
           </table>
 
+          {nextCursor && (
+            <button
+              className="small"
+              disabled={loading}
+              onClick={() => fetchHistory(nextCursor)}
+            >
+              Load more
+            </button>
+          )}
+
           {/* 🎖️ Badge hint */}
           <p className="muted" style={{ marginTop: 10 }}>
             🎖️ Keep donating to unlock badges like <b>First Drop</b>,{" "}
@@ -4,22 +4,31 @@ import EmergencyDonorMatch from "../components/EmergencyDonorMatch";
 function MyBloodRequests() {
   const [requests, setRequests] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+
+  // 📄 Server returns one page; X-Next-Cursor points at the next one
+  const fetchRequests = async (cursor = null) => {
+    setLoading(true);
+    const token = localStorage.getItem("token");
+
+    const params = new URLSearchParams();
+    if (cursor) params.set("cursor", cursor);
+
+    const res = await fetch(`http://127.0.0.1:5000/blood-requests/me?${params}`, {
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    });
+
+    const data = await res.json();
+    if (res.ok) {
+      setRequests((current) => (cursor ? [...current, ...data] : data));
+      setNextCursor(res.headers.get("X-Next-Cursor"));
+    }
+    setLoading(false);
+  };
 
   useEffect(() => {
-    const fetchRequests = async () => {
-      const token = localStorage.getItem("token");
-
-      const res = await fetch("http://127.0.0.1:5000/blood-requests/me", {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
-
-      const data = await res.json();
-      if (res.ok) setRequests(data);
-      setLoading(false);
-    };
-
     fetchRequests();
   }, []);
 
@@ -27,7 +36,7 @@ function MyBloodRequests() {
     <div className="card">
       <h3>My Blood Requests</h3>
 
-      {loading && <p>Loading your requests...</p>}
+      {loading && requests.length === 0 && <p>Loading your requests...</p>}
 
       {!loading && requests.length === 0 && (
         <p style={{ color: "#777" }}>
@@ -35,7 +44,7 @@ function MyBloodRequests() {
         </p>
       )}
 
-      {!loading && requests.length > 0 && (
+      {requests.length > 0 && (
         <table>
           <thead>
             <tr>
@@ -107,6 +116,16 @@ function MyBloodRequests() {
           </tbody>
         </table>
       )}
+
+      {nextCursor && (
+        <button
+          className="small"
+          disabled={loading}
+          onClick={() => fetchRequests(nextCursor)}
+        >
+          Load more
+        </button>
+      )}
     </div>
   );
 }